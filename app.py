@@ -2,13 +2,30 @@ import os
 import pandas as pd
 import asyncio
 import json
-from huggingface_hub import AsyncInferenceClient
 import gradio as gr
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
-from tools.magic import see_saw_mechanism, save_generated_files
+from tools.llm import chat_completion, chat_completion_stream, hf_generation, close_clients, run_with_clients
+from tools.cache import start_cache_run, cache_stats
+from tools.usage import track_usage, start_usage_run, usage_metrics
+from tools.routing import LLM_ROUTING, routed_call, start_routing_run, routing_stats
+from tools.dependency_graph import (
+    build_dependency_graph, schedule_waves, is_directory, resolve_imports, mentioned_files, reference_graph
+)
+from tools.context import build_context, CONTEXT_TOKEN_BUDGET
+from tools.tracing import span, traced, traced_step, start_trace_run, export_trace
+from tools.journal import RunJournal, JOURNAL_DIR
+from tools.jobs import JobManager, FINISHED_STATES
+from tools.workspace import Workspace, WorkspaceLogHandler, current_workspace, default_workspace, in_workspace
+from tools.explorer import explorer_for
+from tools.packaging import PACKAGE_EXCLUDE, build_archive
+from tools.persistence import file_writer, start_persistence_run, persistence_stats
+from tools.magic import see_saw_mechanism, save_generated_files, make_stream_writer
+from tools.static_check import check_compatibility, check_contract
+from tools.skeleton import (
+    SKELETON_SCOPE, build_skeleton_prompt, parse_skeleton, build_implementation_prompt, build_reconciliation_prompt
+)
 #from utils.evaluation import main as evaluation_main  # Import the evaluation script
 from utils.evaluation import main as evaluation
 
@@ -18,35 +35,43 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 HF_API_KEY = os.getenv("HF_API_KEY")
 # --- Utility Functions ---
 
-# Set the base folder for the generated project
+# Each Gradio session and job works in its own workspace (see tools.workspace);
+# outside of them, the generated project goes to the default workspace, ./generated
 current_directory = os.getcwd()
 project_name = "generated"
-path_project = os.path.join(current_directory, project_name)
-os.makedirs(path_project, exist_ok=True)  # Ensure the folder exists
+path_project = default_workspace.path
 
 import logging
 import os
 
-# Set up logging
-log_file_path = os.path.join(path_project, "generation.log")
-# Set up logging
+# Set up logging: records go to the log file of the current workspace
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
     handlers=[
         logging.StreamHandler(),  # Log to console
-        logging.FileHandler(log_file_path, mode="w"),  # Log to a single file
+        WorkspaceLogHandler(),  # Log to the workspace's log file
     ],
 )
 
-def read_log_file():
+def read_log_file(workspace: Workspace = None):
+    """
+    Read and return the contents of the log file of a workspace (defaults to the current one).
+    """
+    workspace = workspace or current_workspace()
+    return workspace.read_log() or "No logs available."
+
+
+def session_workspace(request: gr.Request = None) -> Workspace:
     """
-    Read and return the contents of the log file.
+    Return the workspace of a Gradio session (the default workspace outside of one).
+
+    Args:
+        request: The request of the Gradio event.
     """
-    if os.path.exists(log_file_path):
-        with open(log_file_path, "r") as log_file:
-            return log_file.read()
-    return "No logs available."
+    if request is None or not request.session_hash:
+        return default_workspace
+    return Workspace.for_session(request.session_hash)
 
 
 
@@ -59,44 +84,61 @@ async def generate_code_hf(prompt: str) -> str:
 
     Returns:
         Generated code.
+
+    Raises:
+        Exception: If the request still fails after the rate limiter's retries.
     """
-    client = AsyncInferenceClient(HF_API_KEY)
     try:
-        response = await client.post(
-            model="codellama/CodeLlama-34b-Instruct-hf",
-            inputs=prompt,
-            parameters={"do_sample": True, "max_new_tokens": 512, "return_full_text": False},
+        response = await hf_generation(
+            prompt, parameters={"do_sample": True, "max_new_tokens": 512, "return_full_text": False}
         )
         return response.get("generated_text", "").strip()
     except Exception as e:
-        return f"Error: {e}"
-# Load the API key from the .env file
-client = OpenAI(api_key=OPENAI_API_KEY)
-async def generate_code(prompt: str) -> str:
+        logging.error(f"Error generating code: {e}")
+        raise
+
+async def generate_code(prompt: str, on_chunk=None, role: str = "dependency") -> str:
     """
     Generate code using OpenAI's GPT-4o API based on the provided prompt.
 
     Args:
         prompt: The prompt describing the required file or update.
+        on_chunk: Optional callback; when given, the completion is streamed and
+            `on_chunk` is called with every new piece of text.
+        role: Role of the call, which selects its model (see tools.routing).
 
     Returns:
         Generated code.
+
+    Raises:
+        Exception: If the request still fails after the rate limiter's retries.
     """
+    system_prompt = "You are a code generator application. Simply return the raw code content based on requests."
     try:
-        # Create a chat completion using OpenAI's GPT-4o model
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a code generator application. Simply return the raw code content based on requests."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        if on_chunk is not None:
+            parts = []
+            with routed_call(role) as model:
+                stream = chat_completion_stream(prompt, system_prompt=system_prompt, model=model)
+                try:
+                    async for delta in stream:
+                        parts.append(delta)
+                        on_chunk(delta)
+                finally:
+                    # Close the stream now (not at garbage collection) to free its rate-limiter slot
+                    await stream.aclose()
+            return "".join(parts).strip()
+
+        # Create a chat completion with the model routed for this role
+        with routed_call(role) as model:
+            completion = await chat_completion(prompt, system_prompt=system_prompt, model=model)
         # Extract and return the generated code from the completion
         return completion.choices[0].message.content.strip()
     except Exception as e:
-        # Return an error message in case of failure
-        return f"Error: {e}"
+        # Fail the file instead of saving the error message as its content
+        logging.error(f"Error generating code: {e}")
+        raise
 
+@traced("file_write", name=lambda file_path, content: file_path)
 def save_file(file_path: str, content: str):
     """
     Save content to a file.
@@ -105,18 +147,15 @@ def save_file(file_path: str, content: str):
         file_path: The file path where content will be saved.
         content: Content to save.
     """
-    full_path = os.path.join(path_project, file_path.lstrip("./"))
+    full_path = current_workspace().file_path(file_path)
 
     # Check if the path is a directory and create it
     if full_path.endswith("/") or os.path.basename(full_path) == "":
         os.makedirs(full_path, exist_ok=True)
         return  # No file to write if it's a directory
-    # Ensure the parent directory exists
-    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-    # Write the file content
-    with open(full_path, "w", encoding="utf-8") as file:
-        file.write(content)
+    # Queue the write: the background writer writes the file atomically, and only its
+    # latest content when it is saved again before being written (see tools.persistence)
+    file_writer.write(full_path, content)
 
 def load_file(file_path: str) -> str:
     """
@@ -136,7 +175,8 @@ def load_file(file_path: str) -> str:
 
 def create_metadata(tree: list) -> pd.DataFrame:
     """
-    Create a DataFrame for project metadata.
+    Create a DataFrame for project metadata and store the tree in the workspace's
+    project store.
 
     Args:
         tree: A list of dictionaries with project structure.
@@ -145,14 +185,13 @@ def create_metadata(tree: list) -> pd.DataFrame:
         A DataFrame containing file paths and descriptions.
     """
     df = pd.DataFrame(tree)
-    os.makedirs(path_project, exist_ok=True)
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    df.to_pickle(metadata_path)
+    current_workspace().store.set_tree(df.to_dict(orient="records"))
     return df
 
 
 import re
 
+@traced("extract_code")
 def extract_markdown_code(llm_output: str) -> str:
     """
     Extracts all code blocks from the LLM output, enclosed in triple backticks.
@@ -325,12 +364,300 @@ import time
 import logging
 import pandas as pd
 
-async def build_project(df: pd.DataFrame):
+def build_file_prompt(path: str, description: str, dependency_files: dict) -> str:
+    """
+    Create the generation prompt of a project file.
+
+    Args:
+        path: Path of the file to generate.
+        description: Purpose of the file.
+        dependency_files: Mapping of path to code (or interface summary) of the files
+            given as context.
+
+    Returns:
+        The prompt.
+    """
+    dependency_code = "\n".join([f"### Dependency: {dep}\n{code}" for dep, code in dependency_files.items()])
+
+    # Create a prompt with the dependency code (if any)
+    prompt = (
+        f"You are building a project. The following dependencies have been written:\n\n"
+        f"{dependency_code}\n\n"
+        f"Now create or update the file at '{path}' based on its purpose:\n{description}\n\n"
+        f"If the file is a main application, ensure it calls all dependencies correctly. "
+        "Output only the code required for this file. Do not include explanations, comments, or additional context. "
+        "Simply return the raw code content."
+    )
+
+    # Extract the file extension
+    _, extension = os.path.splitext(path)
+
+    # Modify the prompt for specific extensions
+    if extension == ".md":
+        prompt += " Please create a professional README of this project."
+    return prompt
+
+
+async def generate_project_file(path: str, description: str, dependency_files: dict,
+                                stream: bool = False, on_progress=None, prompt: str = None, role: str = None):
+    """
+    Generate and save a single project file.
+
+    Args:
+        path: Path of the file to generate.
+        description: Purpose of the file.
+        dependency_files: Mapping of path to code of the files given as context.
+        stream: Whether to stream the file to disk while it is generated.
+        on_progress: Optional function (path, content, done) called with streaming progress.
+        prompt: Prompt to use instead of the one built from `dependency_files`.
+        role: Role of the call (see tools.routing); by default "main" for main files
+            and "dependency" for the others.
+
+    Returns:
+        tuple: The generated code and the metrics of this iteration (without its number).
+    """
+    prompt = prompt or build_file_prompt(path, description, dependency_files)
+    file_type = "main" if "main" in description.lower() else "dependency"
+
+    # Generate code for the current file
+    logging.info(f"Generating file: {path}")
+    iteration_start_time = time.perf_counter()  # Start iteration timer
+    on_chunk = make_stream_writer(path, save_file, on_progress) if stream else None
+    with track_usage() as call_usage:
+        generated_code = await generate_code(prompt, on_chunk=on_chunk, role=role or file_type)
+    logging.info(f"Token usage for {path}: {call_usage['total_tokens']}")
+
+    generated_code = extract_markdown_code(generated_code)
+
+    # Save the generated code and record it in the project store
+    save_file(path, generated_code)
+    current_workspace().store.queue_files({path: generated_code})
+    if on_progress:
+        on_progress(path, generated_code, True)
+
+    return generated_code, {
+        "type": file_type,
+        **usage_metrics(call_usage),
+        "execution_time": time.perf_counter() - iteration_start_time
+    }
+
+
+def load_existing_files(paths: list) -> dict:
+    """
+    Load the files of a previous generation that are still on disk.
+
+    Args:
+        paths: Project tree paths.
+
+    Returns:
+        dict: Mapping of path to content for the files that exist.
+    """
+    existing_files = {}
+    workspace = current_workspace()
+    file_writer.flush()
+    for path in paths:
+        full_path = workspace.file_path(path)
+        if os.path.isfile(full_path):
+            existing_files[path] = load_file(full_path)
+    return existing_files
+
+
+def select_context(path: str, description: str, files: dict, existing_files: dict, tree_paths: list,
+                   context_mode: str = "full", token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """
+    Select the context of a file's generation prompt among previously generated files.
+
+    Args:
+        path: Path of the file to generate.
+        description: Purpose of the file.
+        files: Mapping of path to code of the candidate context files.
+        existing_files: Mapping of path to content of files from a previous generation.
+        tree_paths: All file paths of the project tree.
+        context_mode: "full" gives every file in full. "summary" gives in full only the
+            files the new file directly imports (imports of its previous version on
+            disk, files named in its description) and an interface summary of the
+            others, within `token_budget` tokens.
+        token_budget: Maximum number of context tokens in "summary" mode.
+
+    Returns:
+        tuple: The context (mapping of path to text) and its stats (see build_context).
+    """
+    if context_mode != "summary":
+        return build_context(files, full_paths=files, token_budget=None)
+    imported = mentioned_files(description, [p for p in tree_paths if p != path])
+    if path in existing_files:
+        imported |= resolve_imports(path, existing_files[path], tree_paths)
+    return build_context(files, full_paths=imported, token_budget=token_budget)
+
+
+async def generate_project_skeleton(tree: list, journal: RunJournal = None):
+    """
+    Generate the interface skeleton of the whole project in a single call.
+
+    Args:
+        tree: Project tree entries with 'path' and 'description' keys.
+        journal: Optional run journal. The skeleton is recorded in it, and a skeleton it
+            already holds is reused instead of generated again.
+
+    Returns:
+        tuple: Mapping of path to skeleton code, and the metrics of the skeleton
+            iteration (the resumed ones when it comes from the journal).
+    """
+    scope = journal.scope(SKELETON_SCOPE) if journal is not None else None
+    if scope is not None:
+        resumed = scope.state()
+        if resumed["revision"] is not None:
+            logging.info("Reusing the journaled project skeleton")
+            return json.loads(resumed["revision"]), resumed["iterations"]
+
+    logging.info("Generating the project skeleton")
+    start_time = time.perf_counter()
+    with track_usage() as call_usage:
+        response = await generate_code(build_skeleton_prompt(tree), role="planning")
+    skeletons = parse_skeleton(response, [item["path"] for item in tree])
+    logging.info(f"Skeleton covers {len(skeletons)} files, token usage: {call_usage['total_tokens']}")
+    metrics = [{
+        "type": "skeleton",
+        **usage_metrics(call_usage),
+        "skeleton_files": len(skeletons),
+        "context_tokens": 0,
+        "full_context_tokens": 0,
+        "execution_time": time.perf_counter() - start_time
+    }]
+    if scope is not None:
+        scope.record_revision(json.dumps(skeletons), metrics)
+    return skeletons, metrics
+
+
+def find_contract_issues(tree: list, files: dict, skeletons: dict):
+    """
+    Statically check the implemented files against the skeleton and each other.
+
+    Each file is compared with its skeleton (see check_contract) and with every
+    implemented file it references (see check_compatibility); pairs the checks cannot
+    decide are left out.
+
+    Args:
+        tree: Project tree entries with 'path' and 'description' keys.
+        files: Mapping of path to implemented code.
+        skeletons: Mapping of path to skeleton code.
+
+    Returns:
+        tuple: Mapping of path to its issues (files without issues left out), the
+            number of decided file pairs, and the number of compatible ones.
+    """
+    tree_paths = [item["path"] for item in tree if not is_directory(item["path"])]
+    graph = reference_graph(tree, files)
+    issues = {}
+    checked_pairs, compatible_pairs = 0, 0
+    seen = set()
+    for path, code in files.items():
+        file_issues = check_contract(path, skeletons[path], code) if skeletons.get(path) else None
+        file_issues = list(file_issues or [])
+        for other in sorted(graph.get(path, ())):
+            pair = frozenset((path, other))
+            if other not in files or pair in seen:
+                continue
+            seen.add(pair)
+            compatible, reason = check_compatibility(path, code, other, files[other], tree_paths)
+            if compatible is None:
+                continue
+            checked_pairs += 1
+            if compatible:
+                compatible_pairs += 1
+            else:
+                file_issues.append(reason)
+        if file_issues:
+            issues[path] = file_issues
+    return issues, checked_pairs, compatible_pairs
+
+
+async def reconcile_project(tree: list, files: dict, skeletons: dict, stream: bool = False, on_progress=None,
+                            concurrency: int = None, context_budget: int = None, scope=None):
+    """
+    Fix, in one parallel pass, the implemented files that drifted from the contract.
+
+    Args:
+        tree: Project tree entries with 'path' and 'description' keys.
+        files: Mapping of path to implemented code, updated with the fixed files.
+        skeletons: Mapping of path to skeleton code.
+        stream: Whether to stream each fixed file to disk while it is generated.
+        on_progress: Optional function (path, content, done) called with streaming progress.
+        concurrency: Maximum number of files fixed at once (None or 0 for no limit).
+        context_budget: Token budget of each fix's context (None for no limit).
+        scope: Optional journal scope the fixed files are recorded in.
+
+    Returns:
+        tuple: The metrics of the reconciliation iterations, and the alignment of the
+            project after the pass (percentage of decided file pairs found compatible).
+    """
+    descriptions = {item["path"]: item["description"] for item in tree}
+    issues, _, _ = find_contract_issues(tree, files, skeletons)
+    graph = reference_graph(tree, files)
+    semaphore = asyncio.Semaphore(concurrency if concurrency else max(1, len(issues)))
+
+    async def reconcile(path):
+        async with semaphore:
+            references = {other: files[other] for other in sorted(graph.get(path, ())) if other in files}
+            context, context_stats = build_context(references, full_paths=references, token_budget=context_budget)
+            if skeletons.get(path):
+                context[f"{path} (interface)"] = skeletons[path]
+            prompt = build_reconciliation_prompt(path, descriptions[path], files[path], issues[path], context)
+            logging.info(f"Reconciling {path}: {issues[path]}")
+            code, metric = await generate_project_file(path, descriptions[path], context, stream, on_progress,
+                                                       prompt=prompt, role="correction")
+            metric.update({
+                "type": "reconciliation",
+                "issues": len(issues[path]),
+                "context_tokens": context_stats["context_tokens"],
+                "full_context_tokens": context_stats["full_context_tokens"],
+            })
+            if scope is not None:
+                scope.record_file(path, code, [metric])
+            return code, metric
+
+    metrics = []
+    paths = list(issues)
+    outcomes = await asyncio.gather(*[reconcile(path) for path in paths], return_exceptions=True)
+    for path, outcome in zip(paths, outcomes):
+        if isinstance(outcome, Exception):
+            logging.error(f"Failed to reconcile {path}: {outcome}")
+            continue
+        files[path], metric = outcome
+        metrics.append({"path": path, **metric})
+
+    remaining, checked_pairs, compatible_pairs = find_contract_issues(tree, files, skeletons)
+    if remaining:
+        logging.warning(f"Contract issues left after reconciliation: {remaining}")
+    alignment = compatible_pairs / checked_pairs * 100 if checked_pairs else 100.0
+    return metrics, alignment
+
+
+async def build_project(df: pd.DataFrame, stream: bool = False, on_progress=None,
+                        schedule: str = "sequential", concurrency: int = None,
+                        context_mode: str = "full", context_budget: int = None, journal: RunJournal = None):
     """
     Build the project dynamically, updating dependencies and main files iteratively.
 
     Args:
         df: DataFrame containing the project structure.
+        stream: Whether to stream each file to disk while it is generated.
+        on_progress: Optional function (path, content, done) called with streaming progress.
+        schedule: "sequential" generates files one at a time in tree order, each with every
+            previously generated file as context. "waves" builds a dependency graph of the
+            tree (directories, descriptions and imports of files already on disk) and
+            generates all files whose prerequisites are done concurrently, each with only
+            its prerequisites as context. "skeleton" first generates the interface skeleton
+            of the whole tree in one call, then implements every file concurrently
+            against it, and finally fixes in one pass the files that drifted from it
+            (see reconcile_project).
+        concurrency: Maximum number of files generated at once in "waves" and
+            "skeleton" modes (None or 0 for no limit).
+        context_mode: "full" or "summary" context of each prompt (see select_context).
+        context_budget: Token budget of the context in "summary" mode (None or 0 for
+            CONTEXT_TOKEN_BUDGET).
+        journal: Optional run journal. Every finished file is recorded in it, and files
+            it already holds are reused instead of generated again.
 
     Returns:
         Metrics for the standard approach.
@@ -344,8 +671,131 @@ async def build_project(df: pd.DataFrame):
     iteration_metrics = []  # List to store metrics for each iteration
     iteration = 1  # Initialize iteration counter
 
+    # Files finished by a previous run of the journal, in tree order
+    scope = journal.scope() if journal is not None else None
+    if scope is not None:
+        resumed = scope.state()
+        for path in df["path"]:
+            if path in resumed["files"]:
+                generated_files[path] = resumed["files"][path]
+                save_file(path, generated_files[path])
+        for metric in resumed["iterations"]:
+            iteration_metrics.append({"iteration": iteration, **metric})
+            iteration += 1
+        if generated_files:
+            logging.info(f"Resuming the build after {len(generated_files)} finished files")
+            current_workspace().store.queue_files(generated_files)
+    failed_files = []  # Files whose generation failed after the retries
+    run_usage = start_usage_run()  # Provider-reported usage of every call of the run
+
     # Start execution timer
-    start_time = time.time()
+    start_time = time.perf_counter()
+
+    tree_paths = [path for path in df["path"] if not is_directory(path)]
+    existing_files = load_existing_files(tree_paths) if schedule == "waves" or context_mode == "summary" else {}
+    context_budget = context_budget or CONTEXT_TOKEN_BUDGET
+
+    async def generate_with_context(path, description, candidates):
+        context, context_stats = select_context(
+            path, description, candidates, existing_files, tree_paths, context_mode, context_budget
+        )
+        generated_code, metric = await generate_project_file(path, description, context, stream, on_progress)
+        metric["context_tokens"] = context_stats["context_tokens"]
+        metric["full_context_tokens"] = context_stats["full_context_tokens"]
+        if scope is not None:
+            scope.record_file(path, generated_code, [metric])
+        return generated_code, metric
+
+    if schedule == "waves":
+        tree = df.to_dict(orient="records")
+        for item in tree:
+            # Skip directories; ensure they exist
+            if is_directory(item["path"]):
+                os.makedirs(current_workspace().file_path(item["path"]), exist_ok=True)
+        descriptions = {item["path"]: item["description"] for item in tree if not is_directory(item["path"])}
+        order = list(descriptions)
+        graph = build_dependency_graph(tree, existing_files=existing_files)
+        waves = schedule_waves(graph, order)
+        semaphore = asyncio.Semaphore(concurrency if concurrency else max(1, len(order)))
+
+        async def generate_in_wave(path):
+            async with semaphore:
+                context = {dep: generated_files[dep] for dep in order if dep in graph[path] and dep in generated_files}
+                return await generate_with_context(path, descriptions[path], context)
+
+        for wave_number, wave in enumerate(waves, start=1):
+            wave = [path for path in wave if path not in generated_files]
+            if not wave:
+                continue
+            logging.info(f"Generating wave {wave_number}/{len(waves)}: {wave}")
+            outcomes = await asyncio.gather(*[generate_in_wave(path) for path in wave], return_exceptions=True)
+            for path, outcome in zip(wave, outcomes):
+                if isinstance(outcome, Exception):
+                    logging.error(f"Failed to generate {path}: {outcome}")
+                    failed_files.append(path)
+                    continue
+                generated_code, metric = outcome
+                generated_files[path] = generated_code
+                iteration_metrics.append({"iteration": iteration, "wave": wave_number, **metric})
+                iteration += 1  # Increment iteration counter
+        pending_files = []
+
+    alignment = 100.0  # Always 100% since no validation occurs
+    reconciliation_metrics = []
+    if schedule == "skeleton":
+        tree = df.to_dict(orient="records")
+        for item in tree:
+            # Skip directories; ensure they exist
+            if is_directory(item["path"]):
+                os.makedirs(current_workspace().file_path(item["path"]), exist_ok=True)
+        tree = [item for item in tree if not is_directory(item["path"])]
+        skeletons, skeleton_metrics = await generate_project_skeleton(tree, journal)
+        for metric in skeleton_metrics:
+            iteration_metrics.append({"iteration": iteration, **metric})
+            iteration += 1
+        graph = reference_graph(tree, skeletons)
+        pending = [item for item in tree if item["path"] not in generated_files]
+        semaphore = asyncio.Semaphore(concurrency if concurrency else max(1, len(pending)))
+
+        async def implement(path, description):
+            async with semaphore:
+                # Every file is written against the frozen skeleton of the others
+                others = {other: code for other, code in skeletons.items() if other != path}
+                if context_mode == "summary":
+                    context, context_stats = build_context(others, full_paths=graph.get(path, set()),
+                                                           token_budget=context_budget)
+                else:
+                    context, context_stats = build_context(others, full_paths=others, token_budget=None)
+                prompt = build_implementation_prompt(path, description, skeletons.get(path, ""), context)
+                generated_code, metric = await generate_project_file(path, description, context, stream,
+                                                                     on_progress, prompt=prompt)
+                metric["context_tokens"] = context_stats["context_tokens"]
+                metric["full_context_tokens"] = context_stats["full_context_tokens"]
+                if scope is not None:
+                    scope.record_file(path, generated_code, [metric])
+                return generated_code, metric
+
+        logging.info(f"Implementing {len(pending)} files against the skeleton")
+        outcomes = await asyncio.gather(*[implement(item["path"], item["description"]) for item in pending],
+                                        return_exceptions=True)
+        for item, outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                logging.error(f"Failed to generate {item['path']}: {outcome}")
+                failed_files.append(item["path"])
+                continue
+            generated_code, metric = outcome
+            generated_files[item["path"]] = generated_code
+            iteration_metrics.append({"iteration": iteration, **metric})
+            iteration += 1
+
+        reconciliation_metrics, alignment = await reconcile_project(
+            tree, generated_files, skeletons, stream, on_progress, concurrency,
+            context_budget if context_mode == "summary" else None, scope
+        )
+        for metric in reconciliation_metrics:
+            iteration_metrics.append({"iteration": iteration, **metric})
+            iteration += 1
+        pending_files = []
 
     while pending_files:
         file_info = pending_files.pop(0)
@@ -353,61 +803,52 @@ async def build_project(df: pd.DataFrame):
 
         # Skip directories; ensure they exist
         if path.endswith("/") or os.path.basename(path) == "":
-            os.makedirs(os.path.join("./", path.lstrip("./")), exist_ok=True)
+            os.makedirs(current_workspace().file_path(path), exist_ok=True)
             continue
+        if path in generated_files:
+            continue  # Finished in the resumed run
 
         # Build dependency files first
-        dependencies = [dep for dep in generated_files.keys() if dep != path]
-        dependency_code = "\n".join([f"### Dependency: {dep}\n{generated_files[dep]}" for dep in dependencies])
-
-        # Create a prompt with the dependency code (if any)
-        prompt = (
-            f"You are building a project. The following dependencies have been written:\n\n"
-            f"{dependency_code}\n\n"
-            f"Now create or update the file at '{path}' based on its purpose:\n{description}\n\n"
-            f"If the file is a main application, ensure it calls all dependencies correctly. "
-            "Output only the code required for this file. Do not include explanations, comments, or additional context. "
-            "Simply return the raw code content."
-        )
-
-        # Extract the file extension
-        _, extension = os.path.splitext(path)
-
-        # Modify the prompt for specific extensions
-        if extension == ".md":
-            prompt += " Please create a professional README of this project."
-
-        # Generate code for the current file
-        logging.info(f"Generating file: {path}")
-        iteration_start_time = time.time()  # Start iteration timer
-        generated_code = await generate_code(prompt)
-        token_usage_single = len(generated_code.split())  # Token usage for this iteration
-        token_usage_standard += token_usage_single  # Update total token usage
-        logging.info(f"Token usage for iteration {iteration}: {token_usage_single}")
-
-        generated_code = extract_markdown_code(generated_code)
+        dependencies = {dep: generated_files[dep] for dep in generated_files.keys() if dep != path}
+        try:
+            generated_code, metric = await generate_with_context(path, description, dependencies)
+        except Exception as e:
+            logging.error(f"Failed to generate {path}: {e}")
+            failed_files.append(path)
+            continue
         generated_files[path] = generated_code
 
-        # Save the generated code
-        save_file(path, generated_code)
-
         # Append metrics for this iteration
-        iteration_metrics.append({
-            "iteration": iteration,
-            "type": "main" if "main" in description.lower() else "dependency",
-            "token_usage": token_usage_single,
-            "execution_time": time.time() - iteration_start_time
-        })
+        iteration_metrics.append({"iteration": iteration, **metric})
 
         iteration += 1  # Increment iteration counter
 
+    if failed_files:
+        current_workspace().store.queue_files(dict.fromkeys(failed_files), "failed")
+
     # End execution timer
-    execution_time_total = time.time() - start_time
+    execution_time_total = time.perf_counter() - start_time
+    token_usage_standard = run_usage["total_tokens"]
+    context_tokens_total = sum(metric["context_tokens"] for metric in iteration_metrics)
+    full_context_tokens_total = sum(metric["full_context_tokens"] for metric in iteration_metrics)
 
     # Create the final metrics dictionary
     metrics_standard = {
         "token_usage_total": token_usage_standard,
-        "alignment": 100.0,  # Always 100% since no validation occurs
+        "prompt_tokens_total": run_usage["prompt_tokens"],
+        "completion_tokens_total": run_usage["completion_tokens"],
+        "cached_tokens_total": run_usage["cached_tokens"],
+        "cost_total": run_usage["cost"],
+        "context_tokens_total": context_tokens_total,
+        "full_context_tokens_total": full_context_tokens_total,
+        # Share of the full-source context saved by interface summaries
+        "context_reduction": (1 - context_tokens_total / full_context_tokens_total) * 100
+        if full_context_tokens_total > 0 else 0,
+        "throttle_time_total": run_usage["throttle_time"],
+        "retries_total": run_usage["retries"],
+        "failed_files": failed_files,
+        "reconciled_files_total": len(reconciliation_metrics),
+        "alignment": alignment,
         "execution_time_total": execution_time_total,
         "iterations": iteration_metrics
     }
@@ -475,32 +916,18 @@ import shutil
 import os
 import logging
 
+@in_workspace
 def clean_generated_folder():
     """
-    Deletes the 'generated' folder and its contents except for the log file,
+    Deletes the contents of the current workspace except for the log file,
     and truncates the log file contents instead of removing it.
 
     Returns:
         Status message.
     """
-    log_file_path = os.path.join(path_project, "generation.log")
-
     try:
-        # Clean the log file by truncating its contents
-        if os.path.exists(log_file_path):
-            with open(log_file_path, "w") as log_file:
-                log_file.truncate(0)
-            logging.info("Log file cleaned successfully.")
-
-        # Delete the rest of the generated folder
-        for item in os.listdir(path_project):
-            item_path = os.path.join(path_project, item)
-            if item_path != log_file_path:  # Skip the log file
-                if os.path.isdir(item_path):
-                    shutil.rmtree(item_path)
-                else:
-                    os.remove(item_path)
-
+        current_workspace().clean()
+        logging.info("Log file cleaned successfully.")
         return "Generated folder cleaned successfully, log file retained."
     except Exception as e:
         return f"Error in cleaning the generated folder: {str(e)}"
@@ -529,6 +956,8 @@ def format_project_tree(tree):
 
 
 
+@traced_step
+@in_workspace
 async def step_1(instruction: str, framework: str):
     """
     Step 1: Generate the project tree using the instruction and framework.
@@ -551,7 +980,7 @@ async def step_1(instruction: str, framework: str):
     print("First prompt:", tree_prompt)
 
     # Generate project tree
-    tree = await generate_code(tree_prompt)
+    tree = await generate_code(tree_prompt, role="planning")
     print("AI :", tree)
     # Clean and extract JSON
     tree = clean_and_extract_json(tree)
@@ -573,13 +1002,12 @@ async def step_2_old():
     Returns:
         Generation status.
     """
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    df = pd.read_pickle(metadata_path)
+    df = default_workspace.store.dataframe()
     return await build_project(df)
 
 async def step_2_new1(use_see_saw: bool):
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    df = pd.read_pickle(metadata_path)
+    store = default_workspace.store
+    df = store.dataframe()
     project_tree = df.to_dict(orient="records")
     if use_see_saw:
         generated_files = await see_saw_mechanism(project_tree)
@@ -589,8 +1017,8 @@ async def step_2_new1(use_see_saw: bool):
         return await build_project(df)
 
 async def step_2_new2(use_see_saw: bool):
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    df = pd.read_pickle(metadata_path)
+    store = default_workspace.store
+    df = store.dataframe()
     project_tree = df.to_dict(orient="records")
     
     if use_see_saw:
@@ -600,10 +1028,8 @@ async def step_2_new2(use_see_saw: bool):
         # Save the generated files
         save_generated_files(generated_files)
         
-        # Update the metadata DataFrame with the generated files
-        updated_paths = [{"path": path, "description": "Generated by See-Saw"} for path in generated_files.keys()]
-        updated_df = pd.DataFrame(updated_paths)
-        updated_df.to_pickle(metadata_path)  # Save updated metadata
+        # Update the status of the generated files in the project store
+        store.update_files(generated_files)
         
         return "See-Saw Mechanism Applied: Files Generated and Metadata Updated."
     else:
@@ -611,9 +1037,8 @@ async def step_2_new2(use_see_saw: bool):
         return await build_project(df)
 
 async def step_2_new3(use_see_saw: bool):
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    validated_metadata_path = os.path.join(path_project, "validated_metadata.pkl")
-    df = pd.read_pickle(metadata_path)
+    store = default_workspace.store
+    df = store.dataframe()
     project_tree = df.to_dict(orient="records")
     
     if use_see_saw:
@@ -623,17 +1048,15 @@ async def step_2_new3(use_see_saw: bool):
         # Save the generated files
         save_generated_files(generated_files)
         
-        # Update the metadata DataFrame with the generated files
-        updated_paths = [{"path": path, "description": "Generated by See-Saw"} for path in generated_files.keys()]
-        updated_df = pd.DataFrame(updated_paths)
-        updated_df.to_pickle(metadata_path)  # Save updated metadata
+        # Update the status of the generated files in the project store
+        store.update_files(generated_files)
         
-        # Create `validated_metadata.pkl` for Step 3
-        updated_df["validation"] = updated_df["path"].apply(
-            lambda x: os.path.exists(os.path.join(path_project, x.lstrip("./"))) 
-                      and os.path.getsize(os.path.join(path_project, x.lstrip("./"))) > 0
-        )
-        updated_df.to_pickle(validated_metadata_path)  # Save validated metadata
+        # Record the validation results for Step 3
+        store.set_validation({
+            path: os.path.exists(os.path.join(path_project, path.lstrip("./")))
+                  and os.path.getsize(os.path.join(path_project, path.lstrip("./"))) > 0
+            for path in generated_files
+        })
         
         return "See-Saw Mechanism Applied: Files Generated and Metadata Updated."
     else:
@@ -646,9 +1069,8 @@ async def step_2_new4(use_see_saw: bool):
     """
     Generate project files with or without the See-Saw mechanism.
     """
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    validated_metadata_path = os.path.join(path_project, "validated_metadata.pkl")
-    df = pd.read_pickle(metadata_path)
+    store = default_workspace.store
+    df = store.dataframe()
     project_tree = df.to_dict(orient="records")
 
     if use_see_saw:
@@ -659,17 +1081,15 @@ async def step_2_new4(use_see_saw: bool):
         # Save the generated files
         save_generated_files(generated_files)
         
-        # Update the metadata DataFrame with the generated files
-        updated_paths = [{"path": path, "description": "Generated by See-Saw"} for path in generated_files.keys()]
-        updated_df = pd.DataFrame(updated_paths)
-        updated_df.to_pickle(metadata_path)  # Save updated metadata
+        # Update the status of the generated files in the project store
+        store.update_files(generated_files)
         
-        # Create `validated_metadata.pkl` for Step 3
-        updated_df["validation"] = updated_df["path"].apply(
-            lambda x: os.path.exists(os.path.join(path_project, x.lstrip("./"))) 
-                      and os.path.getsize(os.path.join(path_project, x.lstrip("./"))) > 0
-        )
-        updated_df.to_pickle(validated_metadata_path)  # Save validated metadata
+        # Record the validation results for Step 3
+        store.set_validation({
+            path: os.path.exists(os.path.join(path_project, path.lstrip("./")))
+                  and os.path.getsize(os.path.join(path_project, path.lstrip("./"))) > 0
+            for path in generated_files
+        })
         
         status = "See-Saw Mechanism Applied: Files Generated and Metadata Updated."
     else:
@@ -694,8 +1114,8 @@ async def step_2_partially(use_see_saw: bool):
         "standard": {"token_usage": 0, "alignment": 0, "execution_time": 0},
     }
 
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    df = pd.read_pickle(metadata_path)
+    store = default_workspace.store
+    df = store.dataframe()
     project_tree = df.to_dict(orient="records")
 
     if use_see_saw:
@@ -731,9 +1151,48 @@ async def step_2_partially(use_see_saw: bool):
     # Return separate outputs for metrics and logs
     return metrics, log_content
 
-async def step_2(use_see_saw: bool):
+@traced_step
+@in_workspace
+async def step_2(use_see_saw: bool, concurrency: int = None, use_cache: bool = True,
+                 stream: bool = False, on_progress=None, main_concurrency: int = None,
+                 schedule: str = "sequential", context_mode: str = "full", context_budget: int = None,
+                 validation_batch_size: int = None, correction_mode: str = "rewrite", resume: bool = False,
+                 static_check: bool = False, validation_depth: int = None, routing: str = None):
     """
     Generate project files with or without the See-Saw mechanism.
+
+    Args:
+        use_see_saw: Whether to use the See-Saw mechanism.
+        concurrency: Maximum number of files generated in parallel: dependencies per main
+            file with See-Saw, files per wave with the "waves" schedule, files implemented
+            at once with the "skeleton" schedule. None or 0 keeps the See-Saw phase
+            sequential and leaves the standard schedules unbounded.
+        use_cache: Whether LLM responses may be served from the response cache.
+            False bypasses the cache for this run.
+        stream: Whether to stream files to disk while they are generated.
+        on_progress: Optional function (path, content, done) called with streaming progress.
+        main_concurrency: Maximum number of main files whose See-Saw loops run in parallel.
+            None or 0 processes main files one after another.
+        schedule: Schedule of the standard build, "sequential", "waves" or "skeleton"
+            (see build_project).
+        context_mode: Context of the standard build's prompts, "full" sources or interface
+            "summary" (see select_context).
+        context_budget: Token budget of the "summary" context (None or 0 for the default).
+        validation_batch_size: Number of dependencies the See-Saw validator checks per
+            request. None, 0 or 1 validates each dependency with its own request.
+        correction_mode: How the See-Saw validator corrects the main code: "rewrite" returns
+            the whole file, "patch" returns edits applied locally (see correct_main_code).
+        resume: Whether to continue the previous run of the same mode and project tree
+            from its journal, skipping the work it finished. Otherwise a new journal starts.
+        static_check: Whether See-Saw checks each dependency statically first (imports and
+            call signatures) and only asks the LLM validator when the check finds a mismatch
+            or cannot decide.
+        validation_depth: Reference hops (imports and file references) from a See-Saw main
+            file within which dependencies are validated; the other files are generated
+            without validation. None or 0 validates every file.
+        routing: Model routing profile, "single" or "tiered" (see tools.routing); None for
+            the LLM_ROUTING default.
+        workspace: Workspace to generate into (defaults to the current workspace).
     """
     global token_usage_standard, dependency_checks, aligned_dependencies
 
@@ -760,9 +1219,25 @@ async def step_2(use_see_saw: bool):
         }
     }
 
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    df = pd.read_pickle(metadata_path)
+    workspace = current_workspace()
+    store = workspace.store
+    # Store calls wait on SQLite locks: run them off the event loop
+    df = await asyncio.to_thread(store.dataframe)
     project_tree = df.to_dict(orient="records")
+    if not resume:
+        await asyncio.to_thread(store.reset_files)
+
+    # Count cache hits and misses of this run only
+    start_cache_run(enabled=use_cache)
+    # Collect the spans of this run for the latency summary
+    trace = start_trace_run("step_2")
+    # Route each role's calls to its model tier and count usage and latency per tier
+    start_routing_run(routing)
+    # Count the file writes of this run (bytes and latency of the background writer)
+    start_persistence_run()
+    # Record progress so an interrupted run can be resumed
+    journal = RunJournal.open("seesaw" if use_see_saw else "standard", project_tree, resume=resume,
+                              journal_dir=os.path.join(JOURNAL_DIR, workspace.id))
 
     if use_see_saw:
         logging.info("See-Saw mechanism enabled.")
@@ -770,7 +1245,12 @@ async def step_2(use_see_saw: bool):
 
         # Run the See-Saw mechanism
         try:
-            status, generated_files, seesaw_metrics = await see_saw_mechanism(project_tree)
+            status, generated_files, seesaw_metrics = await see_saw_mechanism(
+                project_tree, concurrency=concurrency, stream=stream, on_progress=on_progress,
+                main_concurrency=main_concurrency, validation_batch_size=validation_batch_size,
+                correction_mode=correction_mode, journal=journal, static_check=static_check,
+                validation_depth=validation_depth
+            )
             print("seesaw_metrics",seesaw_metrics)
             metrics["seesaw"] = seesaw_metrics
             logging.info(status)
@@ -782,13 +1262,29 @@ async def step_2(use_see_saw: bool):
         logging.info("Default generation mechanism.")
         # Run the standard build process
         try:
-            status, standard_metrics = await build_project(df)
+            status, standard_metrics = await build_project(
+                df, stream=stream, on_progress=on_progress, schedule=schedule, concurrency=concurrency,
+                context_mode=context_mode, context_budget=context_budget, journal=journal
+            )
             print("standard_metrics",standard_metrics)
             metrics["standard"] = standard_metrics
             logging.info(status)
         except Exception as e:
             logging.error(f"Error in Standard mechanism: {e}")
             raise ValueError("build_project did not return the expected tuple (status, metrics)")
+    metrics["seesaw" if use_see_saw else "standard"]["cache"] = cache_stats()
+    # p50/p95/p99 durations per span type; the run's full trace goes to the workspace
+    metrics["seesaw" if use_see_saw else "standard"]["latency"] = trace.summary()
+    export_trace(trace, workspace.trace_path)
+    metrics["seesaw" if use_see_saw else "standard"]["routing"] = routing_stats()
+    # The run is finished once its files and journal are on disk (waited for off the event loop)
+    await asyncio.to_thread(file_writer.flush)
+    await asyncio.to_thread(journal.flush)
+    await asyncio.to_thread(store.flush)
+    metrics["seesaw" if use_see_saw else "standard"]["persistence"] = persistence_stats()
+    await asyncio.to_thread(store.record_run, "seesaw" if use_see_saw else "standard",
+                            metrics["seesaw" if use_see_saw else "standard"])
+    logging.info(f"LLM response cache: {cache_stats()}")
     # Combine logs for display
     log_content = read_log_file()
     # Return separate outputs for metrics and logs
@@ -803,49 +1299,62 @@ def step_3_old():
         Validation results.
     """
     # Define paths for metadata and validated metadata in the 'generated' folder
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    validated_metadata_path = os.path.join(path_project, "validated_metadata.pkl")
+    store = default_workspace.store
 
-    # Load the metadata DataFrame
-    df = pd.read_pickle(metadata_path)
+    # Load the project tree
+    df = store.dataframe()
 
     # Validate each file's existence and size in the 'generated' folder
     df["validation"] = df["path"].apply(lambda x: os.path.exists(os.path.join(path_project, x.lstrip("./"))) 
                                         and os.path.getsize(os.path.join(path_project, x.lstrip("./"))) > 0)
     
-    # Save the updated DataFrame with validation results
-    df.to_pickle(validated_metadata_path)
+    # Save the validation results
+    store.set_validation(dict(zip(df["path"], df["validation"])))
 
     # Return the validation results as a subset of the DataFrame
     return df[["path", "validation"]]
 
+@traced_step
+@in_workspace
 def step_3():
     """
     Step 3: Validate the generated files.
     """
-    metadata_path = os.path.join(path_project, "metadata.pkl")
-    validated_metadata_path = os.path.join(path_project, "validated_metadata.pkl")
+    workspace = current_workspace()
+    file_writer.flush()
+    workspace.store.flush()
 
-    # Load metadata
-    df = pd.read_pickle(metadata_path)
+    # Load the project tree
+    df = workspace.store.dataframe()
 
     # Validate each file's existence
     df["validation"] = df["path"].apply(
-        lambda x: os.path.exists(os.path.join(path_project, x.lstrip("./"))) 
-                  and os.path.getsize(os.path.join(path_project, x.lstrip("./"))) > 0
+        lambda x: os.path.exists(workspace.file_path(x))
+                  and os.path.getsize(workspace.file_path(x)) > 0
     )
 
-    # Save updated validation metadata
-    df.to_pickle(validated_metadata_path)
+    # Save the validation results (one transaction, no full rewrite)
+    workspace.store.set_validation(dict(zip(df["path"], df["validation"])))
 
     # Return validation results
     return df[["path", "validation"]]
 
 
-def step_4():
+@traced_step
+@in_workspace
+def step_4(include: list = None, exclude: list = None):
     """
     Step 4: Create a Dockerfile for the project and save the project in a zip file.
 
+    The archive is rebuilt incrementally: unchanged files keep their compressed data
+    from the previous archive and the others are compressed in parallel (see
+    tools.packaging.build_archive).
+
+    Args:
+        include: Glob patterns of the files to package (None for every file).
+        exclude: Glob patterns of the files to leave out (None for PACKAGE_EXCLUDE:
+            the log, the trace, the project store and pickles).
+
     Returns:
         A tuple containing the status message and the path to the zip file for download.
     """
@@ -859,18 +1368,31 @@ def step_4():
     """
     save_file("./Dockerfile", dockerfile_content.strip())
     
-    # Path for the zip file
-    zip_file_path = os.path.join(current_directory, f"{project_name}.zip")
+    # Path for the zip file, next to the workspace
+    workspace = current_workspace()
+    zip_file_path = workspace.archive_path
     
     try:
+        # Package only once every queued write (including the Dockerfile) is on disk
+        with span("flush", "file_writer"):
+            file_writer.flush()
         # Create a zip file of the project
-        shutil.make_archive(base_name=path_project, format='zip', root_dir=path_project)
-        return f"Dockerfile created and project saved as a zip file.", zip_file_path
+        with span("zip", os.path.basename(zip_file_path)) as attributes:
+            stats = build_archive(workspace.path, zip_file_path, include=include, exclude=exclude)
+            attributes.update(stats)
+        logging.info(f"Packaged {zip_file_path}: {stats}")
+        return (
+            f"Dockerfile created and project saved as a zip file "
+            f"({stats['files']} files, {stats['reused']} reused, {stats['compressed']} compressed, "
+            f"{stats['seconds']:.2f}s).",
+            zip_file_path,
+        )
     except Exception as e:
         # If zipping fails, return an error message and None for the file path
         return f"Error in zipping the project: {str(e)}", None
 
 # Define the Step 5 function
+@traced_step
 def step_5(metrics):
     """
     Perform evaluation and save metrics to CSV files.
@@ -909,8 +1431,9 @@ def load_generated_data(base_path, output_pickle):
     Returns:
         pd.DataFrame: DataFrame containing the paths and content.
     """
-    # Run the display_and_store_directory_content utility
-    display_and_store_directory_content(base_path)
+    file_writer.flush()
+    # Run the display_and_store_directory_content utility (only changed files are read again)
+    display_and_store_directory_content(base_path, output_pickle, quiet=True)
 
     # Load the generated pickle file into a DataFrame
     try:
@@ -924,17 +1447,31 @@ def load_generated_data(base_path, output_pickle):
         raise ValueError(f"Error loading pickle file: {e}")
 
 
-# Load data from the generated directory
-BASE_PATH = "./generated/generated"
-OUTPUT_PICKLE = "./extraction/generated.pkl"
-
+@in_workspace
 def update_explorer():
     """
-    Load the generated data and prepare file choices for the dropdown.
+    Index the generated files of the current workspace and prepare file choices for
+    the dropdown. Only file metadata is read; content is loaded when a file is viewed.
+    """
+    file_writer.flush()
+    return explorer_for(current_workspace().files_root).refresh()
+
+
+@in_workspace
+def read_explorer_file(file_path: str) -> str:
     """
-    df = load_generated_data(BASE_PATH, OUTPUT_PICKLE)
-    file_choices = df["path"].tolist()  # Extract file paths for the dropdown
-    return df, file_choices
+    Return the content of a file of the current workspace's explorer (see tools.explorer).
+
+    Args:
+        file_path: Path of the file, relative to the generated project.
+
+    Returns:
+        str: Content of the file or an error message if unavailable.
+    """
+    try:
+        return explorer_for(current_workspace().files_root).read(file_path)
+    except Exception as e:
+        return f"Error loading file content: {e}"
 
 
 def display_file_content(file_path,df_generated):
@@ -956,6 +1493,117 @@ def display_file_content(file_path,df_generated):
     except Exception as e:
         return f"Error loading file content: {e}"
 
+def format_stream_progress(progress: dict) -> str:
+    """
+    Format the per-file progress of a streaming generation for display.
+
+    Args:
+        progress: Mapping of file path to (characters received, done flag).
+
+    Returns:
+        str: One line per file, finished files marked as done.
+    """
+    done_count = sum(1 for _, done in progress.values() if done)
+    lines = [f"Generating... {done_count}/{len(progress)} files written"]
+    for path, (size, done) in progress.items():
+        lines.append(f"{'[done]' if done else '[....]'} {path} ({size} chars)")
+    return "\n".join(lines)
+
+
+async def run_step_2_job(on_progress=None, save_metrics: bool = False, workspace: str = None, **params) -> dict:
+    """
+    Run Step 2 as a background job (see step_2_jobs) and return its metrics.
+
+    Args:
+        on_progress: Function (path, content, done) the job manager passes to report progress.
+        save_metrics: Whether to save the metrics for evaluation once the run is done.
+        workspace: Directory of the workspace to generate into (defaults to the default workspace).
+        **params: Arguments of step_2.
+
+    Returns:
+        dict: The metrics of the run.
+    """
+    try:
+        metrics, _ = await step_2(on_progress=on_progress if params.get("stream") else None,
+                                  workspace=Workspace(workspace) if workspace else None, **params)
+    finally:
+        # The job's event loop ends with the job
+        await close_clients()
+    if save_metrics:
+        try:
+            logging.info("Saving metrics for evaluation...")
+            evaluation(metrics)  # Call the evaluation function
+            logging.info("Metrics saved successfully.")
+        except Exception as e:
+            logging.error(f"Error saving metrics: {e}")
+    return metrics
+
+
+# Step 2 runs are queued and served by a pool of workers (JOB_WORKERS)
+step_2_jobs = JobManager(run_step_2_job)
+# Minimum delay between two progress updates of a followed job (seconds)
+JOB_UPDATE_INTERVAL = float(os.getenv("JOB_UPDATE_INTERVAL", "0.5"))
+
+
+def format_job_status(job: dict) -> str:
+    """
+    Format the state of a Step 2 job for display.
+
+    Args:
+        job: Job state returned by step_2_jobs.status.
+
+    Returns:
+        str: Status line, queue position or error, and the per-file progress.
+    """
+    lines = [f"Job {job['id']}: {job['status']}"]
+    if job.get("queue_position"):
+        lines.append(f"Position in queue: {job['queue_position']}")
+    if job.get("error"):
+        lines.append(f"Error: {job['error']}")
+    if job["progress"]:
+        lines.append(format_stream_progress(job["progress"]))
+    return "\n".join(lines)
+
+
+def follow_step_2_job(job_id: str):
+    """
+    Stream the progress of a Step 2 job until it finishes.
+
+    Args:
+        job_id: The job id.
+
+    Yields:
+        tuple: Status text, logs, token usage, alignment, execution time and the job id.
+    """
+    job_id = (job_id or "").strip()
+    version = -1
+    workspace = None  # Workspace of the job, whose log is shown
+    while True:
+        job = step_2_jobs.wait(job_id, version, timeout=JOB_UPDATE_INTERVAL * 10)
+        if job is None:
+            yield f"Unknown job: {job_id}", "", "", "", "", job_id
+            return
+        if workspace is None and job["params"].get("workspace"):
+            workspace = Workspace(job["params"]["workspace"])
+        if job["status"] in FINISHED_STATES:
+            break
+        version = job["version"]
+        yield format_job_status(job), read_log_file(workspace), "", "", "", job_id
+        time.sleep(JOB_UPDATE_INTERVAL)
+
+    if job["status"] != "succeeded":
+        yield format_job_status(job), read_log_file(workspace), "", "", "", job_id
+        return
+    metric_data = job["result"]["seesaw" if job["params"]["use_see_saw"] else "standard"]
+    yield (
+        "Files generated successfully!",
+        read_log_file(workspace),
+        metric_data["token_usage_total"],
+        metric_data["alignment"],
+        metric_data["execution_time_total"],
+        job_id,
+    )
+
 # --- Gradio Interface ---
 def app():
     with gr.Blocks() as interface:
@@ -974,8 +1622,12 @@ def app():
             )
             tree_output = gr.Textbox(label="Generated Project Tree")
             generate_tree_button = gr.Button("Generate Project Tree")
+            # Each browser session works in its own workspace
+            async def run_step_1(instruction, framework, request: gr.Request):
+                return await step_1(instruction, framework, workspace=session_workspace(request))
+
             generate_tree_button.click(
-                step_1, inputs=[instruction_input, framework_dropdown], outputs=tree_output
+                run_step_1, inputs=[instruction_input, framework_dropdown], outputs=tree_output
             )
 
        # with gr.Tab("Step 2: Generate Files"):
@@ -998,6 +1650,21 @@ def app():
             # Checkbox to enable/disable See-Saw Mechanism
             use_see_saw = gr.Checkbox(label="Enable See-Saw Mechanism", value=False)
             save_metrics = gr.Checkbox(label="Enable Save Metrics", value=False)
+            concurrency = gr.Number(label="Concurrent Dependencies (0 = sequential)", value=0, precision=0)
+            main_concurrency = gr.Number(label="Concurrent Main Files (0 = sequential)", value=0, precision=0)
+            schedule = gr.Radio(choices=["sequential", "waves", "skeleton"], value="sequential", label="Standard Build Schedule")
+            context_mode = gr.Radio(choices=["full", "summary"], value="full", label="Standard Build Context")
+            context_budget = gr.Number(label="Context Token Budget (0 = default)", value=0, precision=0)
+            validation_batch_size = gr.Number(label="Dependencies per Validation (0 = one each)", value=0, precision=0)
+            correction_mode = gr.Radio(choices=["rewrite", "patch"], value="rewrite", label="Main Code Corrections")
+            validation_depth = gr.Number(label="Validation Depth in Reference Hops (0 = all files)", value=0,
+                                         precision=0)
+            static_check = gr.Checkbox(label="Static Pre-Validation (skip provably compatible dependencies)", value=False)
+            routing = gr.Radio(choices=["single", "tiered"], value=LLM_ROUTING,
+                               label="Model Routing (tiered = cheap model for verdicts)")
+            use_cache = gr.Checkbox(label="Use LLM Response Cache", value=True)
+            stream = gr.Checkbox(label="Stream Files While Generating", value=True)
+            resume = gr.Checkbox(label="Resume Previous Run", value=False)
             
             # Button to trigger file generation
             generate_files_button = gr.Button("Generate Project Files")
@@ -1011,39 +1678,51 @@ def app():
             metrics_alignment = gr.Textbox(label="Dependency Alignment (%)", lines=1, interactive=False)
             metrics_execution_time = gr.Textbox(label="Execution Time (Seconds)", lines=1, interactive=False)
 
+            # Background job of the run: its id can be used to follow or cancel it later
+            job_id = gr.Textbox(label="Job ID", lines=1)
+            follow_job_button = gr.Button("Follow Job")
+            cancel_job_button = gr.Button("Cancel Job")
+
             # Link button to step_2
-            def run_step_2(use_see_saw,save_metrics=False):
-                # Call step_2 and return metrics
-                import asyncio
-                metrics, logs = asyncio.run(step_2(use_see_saw))                 
-                if use_see_saw:
-                    metric_data = metrics["seesaw"]
-                else:
-                    metric_data = metrics["standard"]
-
-                #save_metrics=True
-                if save_metrics:
-                    try:
-                        logging.info("Saving metrics for evaluation...")
-                        evaluation(metrics)  # Call the evaluation function
-                        logging.info("Metrics saved successfully.")
-                    except Exception as e:
-                        logging.error(f"Error saving metrics: {e}")
-
-                return (
-                    "Files generated successfully!" ,
-                    logs,
-                    metric_data["token_usage_total"],
-                    metric_data["alignment"],
-                    metric_data["execution_time_total"],
+            def run_step_2(use_see_saw,save_metrics=False,concurrency=0,use_cache=True,stream=True,main_concurrency=0,
+                           schedule="sequential",context_mode="full",context_budget=0,validation_batch_size=0,
+                           correction_mode="rewrite",resume=False,static_check=False,validation_depth=0,
+                           routing=LLM_ROUTING,request: gr.Request=None):
+                # Queue step_2 as a background job in the session's workspace and stream its progress
+                submitted_id = step_2_jobs.submit(
+                    workspace=session_workspace(request).path,
+                    use_see_saw=use_see_saw, save_metrics=save_metrics, concurrency=int(concurrency or 0),
+                    use_cache=use_cache, stream=stream, main_concurrency=int(main_concurrency or 0),
+                    schedule=schedule, context_mode=context_mode, context_budget=int(context_budget or 0),
+                    validation_batch_size=int(validation_batch_size or 0), correction_mode=correction_mode,
+                    resume=resume, static_check=static_check, validation_depth=int(validation_depth or 0),
+                    routing=routing,
                 )
+                yield from follow_step_2_job(submitted_id)
+
+            def cancel_step_2_job(job_id):
+                if step_2_jobs.cancel((job_id or "").strip()):
+                    return f"Cancelling job {job_id}..."
+                return f"Job {job_id} is not queued or running."
 
             # Connect button to the updated function
             generate_files_button.click(
                 run_step_2,
-                inputs=[use_see_saw,save_metrics],
-                outputs=[files_output, log_output, metrics_token_usage, metrics_alignment, metrics_execution_time],
+                inputs=[use_see_saw,save_metrics,concurrency,use_cache,stream,main_concurrency,schedule,
+                        context_mode,context_budget,validation_batch_size,correction_mode,resume,static_check,validation_depth,
+                        routing],
+                outputs=[files_output, log_output, metrics_token_usage, metrics_alignment, metrics_execution_time,
+                         job_id],
+                concurrency_limit=None,  # Runs are bounded by the job workers, not by this event
             )
+            follow_job_button.click(
+                follow_step_2_job,
+                inputs=[job_id],
+                outputs=[files_output, log_output, metrics_token_usage, metrics_alignment, metrics_execution_time,
+                         job_id],
+                concurrency_limit=None,
+            )
+            cancel_job_button.click(cancel_step_2_job, inputs=[job_id], outputs=[files_output])
 
 
   
@@ -1057,13 +1736,15 @@ def app():
             # Button to validate files
             validate_button = gr.Button("Validate Project Files")
             validation_output = gr.DataFrame(label="Validation Results")
-            validate_button.click(step_3, outputs=validation_output)
+            def run_step_3(request: gr.Request):
+                return step_3(workspace=session_workspace(request))
+
+            validate_button.click(run_step_3, outputs=validation_output)
 
 
             explorer_button = gr.Button("Explore Project Files")
 
-            # Use gr.State for DataFrame and file list storage
-            explorer_output = gr.State()  # To store the DataFrame
+            # Only the file list is kept in the session; content is read on demand
             file_choices_output = gr.State()  # To store the file list
 
             gr.Markdown("## File Explorer for Generated Content")
@@ -1073,9 +1754,12 @@ def app():
                 file_content = gr.Textbox(label="File Content", lines=20, interactive=False)
 
             # Update file choices dynamically
+            def update_session_explorer(request: gr.Request):
+                return update_explorer(workspace=session_workspace(request))
+
             explorer_button.click(
-                update_explorer,
-                outputs=[explorer_output, file_choices_output]
+                update_session_explorer,
+                outputs=[file_choices_output]
             )
 
             # Update the file selector dropdown dynamically
@@ -1091,16 +1775,14 @@ def app():
             )
 
             # Display file content dynamically when a file is selected
-            def display_file_content_safe(file_path, df):
-                try:
-                    content = df.loc[df["path"] == file_path, "content"].values[0]
-                    return content
-                except Exception as e:
-                    return f"Error loading file content: {e}"
+            def display_file_content_safe(file_path, request: gr.Request):
+                if not file_path:
+                    return ""
+                return read_explorer_file(file_path, workspace=session_workspace(request))
 
             file_selector.change(
                 display_file_content_safe,
-                inputs=[file_selector, explorer_output],
+                inputs=[file_selector],
                 outputs=file_content
             )
 
@@ -1108,13 +1790,18 @@ def app():
 
 
         with gr.Tab("Step 4: Containerize Project"):
+            include_patterns = gr.Textbox(label="Include Patterns (comma-separated, empty = all files)", value="")
+            exclude_patterns = gr.Textbox(label="Exclude Patterns (comma-separated)", value=",".join(PACKAGE_EXCLUDE))
             containerize_button = gr.Button("Create Dockerfile and Save as Zip")
             containerize_output = gr.Textbox(label="Containerization Status")
             download_link = gr.File(label="Download Project Zip")
 
             # Wrapper function to ensure proper output handling
-            def handle_step_4():
-                status, zip_path = step_4()
+            def handle_step_4(include_patterns, exclude_patterns, request: gr.Request):
+                include = [pattern.strip() for pattern in (include_patterns or "").split(",") if pattern.strip()]
+                exclude = [pattern.strip() for pattern in (exclude_patterns or "").split(",") if pattern.strip()]
+                status, zip_path = step_4(include=include or None, exclude=exclude,
+                                          workspace=session_workspace(request))
                 if zip_path and os.path.exists(zip_path):
                     return status, zip_path
                 else:
@@ -1122,13 +1809,17 @@ def app():
 
             # Link the button to `step_4` and ensure outputs are handled correctly
             containerize_button.click(
-                handle_step_4, 
+                handle_step_4,
+                inputs=[include_patterns, exclude_patterns],
                 outputs=[containerize_output, download_link]  # Two outputs as expected
             )
 
             clean_button = gr.Button("Clean Generated Folder")
             clean_output = gr.Textbox(label="Clean Status")
-            clean_button.click(clean_generated_folder, outputs=clean_output)
+            def clean_session_workspace(request: gr.Request):
+                return clean_generated_folder(workspace=session_workspace(request))
+
+            clean_button.click(clean_session_workspace, outputs=clean_output)
 
 
     interface.launch()
@@ -1144,7 +1835,7 @@ if __name__ == "__main__":
             instruction_input = "Generate a project that says hello world"
             framework_dropdown = "Gradio"
             print("Running Step 1: Generate the Project Tree...")
-            step_1_out = asyncio.run(step_1(instruction_input, framework_dropdown))
+            step_1_out = run_with_clients(step_1(instruction_input, framework_dropdown))
             print("Step 1 Output:", step_1_out)
 
             # Initialize metrics dictionary
@@ -1156,7 +1847,7 @@ if __name__ == "__main__":
             # Step 2: Generate Project Files with See-Saw Mechanism
             print("Running Step 2 with See-Saw Mechanism...")
             try:
-                seesaw_metrics, seesaw_logs = asyncio.run(step_2(use_see_saw=True))
+                seesaw_metrics, seesaw_logs = run_with_clients(step_2(use_see_saw=True))
                 metrics["seesaw"] = seesaw_metrics.get("seesaw", {})
                 print("See-Saw Mechanism Metrics:", metrics["seesaw"])
                 print("See-Saw Mechanism Logs:\n", seesaw_logs)
@@ -1167,7 +1858,7 @@ if __name__ == "__main__":
             # Step 2: Generate Project Files with Standard Approach
             print("Running Step 2 with Standard Approach...")
             try:
-                standard_metrics, standard_logs = asyncio.run(step_2(use_see_saw=False))
+                standard_metrics, standard_logs = run_with_clients(step_2(use_see_saw=False))
                 metrics["standard"] = standard_metrics.get("standard", {})
                 print("Standard Approach Metrics:", metrics["standard"])
                 print("Standard Approach Logs:\n", standard_logs)
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+
+def pytest_configure(config):
+    # Importing the app modules creates ./generated and ./.cache under the working
+    # directory (default workspace, journals, caches): keep them out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="seesaw-tests-"))
@@ -0,0 +1,64 @@
+from tools.magic import make_validation_batches, parse_batch_verdicts
+from tools.usage import count_tokens
+
+PATHS = ["./generated/src/a.py", "./generated/src/b.py"]
+
+
+def test_batches_are_capped_by_size_in_tree_order():
+    dependencies = [(f"dep{index}.py", "x = 1") for index in range(5)]
+    batches = make_validation_batches("main = 1", dependencies, "main file", batch_size=2, token_budget=10 ** 6)
+    assert [[path for path, _ in batch] for batch in batches] == [
+        ["dep0.py", "dep1.py"], ["dep2.py", "dep3.py"], ["dep4.py"],
+    ]
+
+
+def test_batches_are_split_by_token_budget():
+    code = "value = 1\n" * 20
+    base = count_tokens("main = 1") + count_tokens("main file")
+    budget = base + 2 * count_tokens(code)  # Room for exactly two dependencies
+    dependencies = [(f"dep{index}.py", code) for index in range(3)]
+    batches = make_validation_batches("main = 1", dependencies, "main file", batch_size=10, token_budget=budget)
+    assert [len(batch) for batch in batches] == [2, 1]
+
+
+def test_oversized_dependency_gets_its_own_batch():
+    dependencies = [("small.py", "x = 1"), ("huge.py", "y = 2\n" * 500), ("tail.py", "z = 3")]
+    batches = make_validation_batches("main = 1", dependencies, "main file", batch_size=10, token_budget=50)
+    assert [[path for path, _ in batch] for batch in batches] == [["small.py"], ["huge.py"], ["tail.py"]]
+
+
+def test_all_compatible_verdicts_have_no_correction():
+    response = f"VERDICT {PATHS[0]}: True\nVERDICT {PATHS[1]}: True\n"
+    assert parse_batch_verdicts(response, PATHS) == ({PATHS[0]: True, PATHS[1]: True}, None)
+
+
+def test_incompatible_verdict_returns_the_correction():
+    response = f"VERDICT {PATHS[0]}: True\nVERDICT {PATHS[1]}: False\nMAIN CODE:\nfixed = True\n"
+    assert parse_batch_verdicts(response, PATHS) == ({PATHS[0]: True, PATHS[1]: False}, "fixed = True")
+
+
+def test_quoted_paths_and_indentation_are_accepted():
+    response = f"  VERDICT `{PATHS[0]}`: True\nVERDICT '{PATHS[1]}' : True\n"
+    assert parse_batch_verdicts(response, PATHS) == ({PATHS[0]: True, PATHS[1]: True}, None)
+
+
+def test_incomplete_verdict_list_is_rejected():
+    assert parse_batch_verdicts(f"VERDICT {PATHS[0]}: True\n", PATHS) == (None, None)
+
+
+def test_incompatible_verdict_without_correction_is_rejected():
+    response = f"VERDICT {PATHS[0]}: False\nVERDICT {PATHS[1]}: True\n"
+    assert parse_batch_verdicts(response, PATHS) == (None, None)
+    assert parse_batch_verdicts(response + "MAIN CODE:\n   \n", PATHS) == (None, None)
+
+
+def test_verdicts_of_other_files_are_ignored():
+    response = f"VERDICT {PATHS[0]}: True\nVERDICT {PATHS[1]}: True\nVERDICT other.py: False\n"
+    assert parse_batch_verdicts(response, PATHS) == ({PATHS[0]: True, PATHS[1]: True}, None)
+
+
+def test_edit_marker_introduces_patch_corrections():
+    response = f"VERDICT {PATHS[0]}: False\nVERDICT {PATHS[1]}: True\nMAIN EDITS:\n<edits>\n"
+    verdicts, correction = parse_batch_verdicts(response, PATHS, marker="MAIN EDITS:")
+    assert verdicts[PATHS[0]] is False
+    assert correction == "<edits>"
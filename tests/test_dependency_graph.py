@@ -0,0 +1,36 @@
+from tools.dependency_graph import schedule_waves
+
+
+def test_independent_files_form_one_wave():
+    assert schedule_waves({"a.py": set(), "b.py": set(), "c.py": set()}) == [["a.py", "b.py", "c.py"]]
+
+
+def test_chain_is_scheduled_one_file_per_wave():
+    graph = {"app.py": {"service.py"}, "service.py": {"models.py"}, "models.py": set()}
+    assert schedule_waves(graph) == [["models.py"], ["service.py"], ["app.py"]]
+
+
+def test_files_keep_tree_order_inside_a_wave():
+    graph = {"c.py": {"base.py"}, "a.py": {"base.py"}, "base.py": set()}
+    assert schedule_waves(graph, order=["base.py", "a.py", "c.py"]) == [["base.py"], ["a.py", "c.py"]]
+
+
+def test_order_leaves_out_unknown_paths():
+    graph = {"a.py": set(), "b.py": {"a.py"}}
+    assert schedule_waves(graph, order=["README.md", "b.py", "a.py"]) == [["a.py"], ["b.py"]]
+
+
+def test_two_file_cycle_is_broken_in_tree_order():
+    graph = {"a.py": {"b.py"}, "b.py": {"a.py"}}
+    assert schedule_waves(graph) == [["a.py"], ["b.py"]]
+    assert schedule_waves(graph, order=["b.py", "a.py"]) == [["b.py"], ["a.py"]]
+
+
+def test_cycle_is_broken_at_the_file_with_fewest_missing_prerequisites():
+    graph = {
+        "a.py": {"b.py", "c.py"},
+        "b.py": {"a.py", "c.py"},
+        "c.py": {"a.py"},
+        "d.py": {"c.py"},
+    }
+    assert schedule_waves(graph) == [["c.py"], ["d.py"], ["a.py"], ["b.py"]]
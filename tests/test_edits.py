@@ -0,0 +1,66 @@
+from tools.magic import apply_edits, parse_rewrite
+
+CODE = "def add(a, b):\n    return a - b\n\n\ndef sub(a, b):\n    return a - b\n"
+
+
+def edit(search, replace):
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+
+def test_single_edit_is_applied():
+    patched = apply_edits(CODE, edit("def add(a, b):\n    return a - b", "def add(a, b):\n    return a + b"))
+    assert patched == CODE.replace("return a - b", "return a + b", 1)
+
+
+def test_edit_blocks_are_applied_in_order():
+    edits = "\n".join([edit("def add", "def plus"), edit("def sub", "def minus")])
+    assert apply_edits(CODE, edits) == CODE.replace("def add", "def plus").replace("def sub", "def minus")
+
+
+def test_ambiguous_search_is_rejected():
+    assert apply_edits(CODE, edit("    return a - b", "    return a + b")) is None
+
+
+def test_unmatched_search_is_rejected():
+    assert apply_edits(CODE, edit("def mul(a, b):", "def times(a, b):")) is None
+
+
+def test_empty_search_is_rejected():
+    assert apply_edits(CODE, "<<<<<<< SEARCH\n=======\nx = 1\n>>>>>>> REPLACE") is None
+    assert apply_edits(CODE, edit("   ", "x = 1")) is None
+
+
+def test_answer_without_blocks_is_rejected():
+    assert apply_edits(CODE, "def add(a, b):\n    return a + b\n") is None
+
+
+def test_crlf_edits_apply_to_lf_code():
+    edits = edit("def add(a, b):\n    return a - b", "def add(a, b):\n    return a + b").replace("\n", "\r\n")
+    assert apply_edits(CODE, edits) == CODE.replace("return a - b", "return a + b", 1)
+
+
+def test_crlf_code_keeps_its_line_endings():
+    code = CODE.replace("\n", "\r\n")
+    patched = apply_edits(code, edit("def add(a, b):\n    return a - b", "def add(a, b):\n    return a + b"))
+    assert patched == code.replace("return a - b", "return a + b", 1)
+
+
+def test_python_rewrite_is_accepted():
+    assert parse_rewrite(CODE, "```python\ndef add(a, b):\n    return a + b\n```") == "def add(a, b):\n    return a + b"
+
+
+def test_rewrite_with_edit_markers_is_rejected():
+    assert parse_rewrite(CODE, "<<<<<<< SEARCH\ndef add(a, b):\n") is None
+
+
+def test_prose_or_lone_expression_is_rejected_for_python():
+    assert parse_rewrite(CODE, "fixed") is None
+    assert parse_rewrite(CODE, "The code is now fixed.") is None
+
+
+def test_non_python_rewrite_must_be_fenced_and_balanced():
+    main_code = "function add(a, b) { return a - b; }"
+    assert parse_rewrite(main_code, "```js\nfunction add(a, b) { return a + b; }\n```") == \
+        "function add(a, b) { return a + b; }"
+    assert parse_rewrite(main_code, "function add(a, b) { return a + b; }") is None
+    assert parse_rewrite(main_code, "```js\nfunction add(a, b) { return a + b;\n```") is None
@@ -0,0 +1,76 @@
+import json
+from tools.journal import RunJournal
+
+TREE = [{"path": "./generated/main.py", "description": "Entry point"},
+        {"path": "./generated/utils.py", "description": "Helpers"}]
+
+
+def lines(journal):
+    with open(journal.path, "r", encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+def test_flushed_records_are_resumed(tmp_path):
+    journal = RunJournal.open("see_saw", TREE, journal_dir=str(tmp_path))
+    scope = journal.scope("main.py")
+    scope.record_file("utils.py", "def helper(): pass")
+    scope.record_revision("import utils", metrics=[{"iteration": 1}])
+    assert journal.flush(timeout=5)
+    resumed = RunJournal.open("see_saw", TREE, resume=True, journal_dir=str(tmp_path))
+    assert resumed.records == journal.records
+    assert resumed.scope("main.py").state() == {
+        "revision": "import utils",
+        "files": {"utils.py": "def helper(): pass"},
+        "verdicts": {},
+        "iterations": [{"iteration": 1, "resumed": True}],
+    }
+
+
+def test_resume_stops_at_a_truncated_record(tmp_path):
+    journal = RunJournal.open("standard", TREE, journal_dir=str(tmp_path))
+    journal.scope().record_file("main.py", "print('hi')")
+    journal.flush(timeout=5)
+    with open(journal.path, "a", encoding="utf-8") as file:
+        file.write('{"type": "file", "main": null, "path": "utils.py", "cont')  # Crash mid-write
+    resumed = RunJournal.open("standard", TREE, resume=True, journal_dir=str(tmp_path))
+    assert [record["path"] for record in resumed.records] == ["main.py"]
+    # The truncated end is dropped from the file, so new records follow a complete line
+    assert [json.loads(line)["type"] for line in lines(resumed)] == ["run", "file"]
+    resumed.scope().record_file("utils.py", "x = 1")
+    resumed.flush(timeout=5)
+    assert [json.loads(line).get("path") for line in lines(resumed)] == [None, "main.py", "utils.py"]
+
+
+def test_a_different_tree_starts_a_new_journal(tmp_path):
+    journal = RunJournal.open("standard", TREE, journal_dir=str(tmp_path))
+    journal.scope().record_file("main.py", "print('hi')")
+    journal.flush(timeout=5)
+    other_tree = TREE[:1]
+    resumed = RunJournal.open("standard", other_tree, resume=True, journal_dir=str(tmp_path))
+    assert resumed.records == []
+    assert len(lines(resumed)) == 1
+
+
+def test_opening_without_resume_discards_the_previous_run(tmp_path):
+    journal = RunJournal.open("standard", TREE, journal_dir=str(tmp_path))
+    journal.scope().record_file("main.py", "print('hi')")
+    journal.flush(timeout=5)
+    assert RunJournal.open("standard", TREE, journal_dir=str(tmp_path)).records == []
+
+
+def test_generated_returns_the_last_content_of_its_scope(tmp_path):
+    journal = RunJournal.open("see_saw", TREE, journal_dir=str(tmp_path))
+    journal.scope("a.py").record_file("dep.py", "v1")
+    journal.scope("a.py").record_file("dep.py", "v2")
+    journal.scope("b.py").record_file("dep.py", "other")
+    assert journal.scope("a.py").generated("dep.py") == "v2"
+    assert journal.scope("b.py").generated("dep.py") == "other"
+    assert journal.scope("a.py").generated("missing.py") is None
+
+
+def test_many_appends_are_written_in_order(tmp_path):
+    journal = RunJournal.open("standard", TREE, journal_dir=str(tmp_path))
+    for number in range(200):
+        journal.scope().record_file(f"file{number}.py", str(number))
+    assert journal.flush(timeout=5)
+    assert [json.loads(line).get("path") for line in lines(journal)[1:]] == [f"file{n}.py" for n in range(200)]
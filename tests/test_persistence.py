@@ -0,0 +1,62 @@
+import os
+from tools.persistence import FileWriter, atomic_write, new_write_stats, persistence_stats
+
+
+def test_atomic_write_replaces_the_file_without_leftovers(tmp_path):
+    path = tmp_path / "nested" / "main.py"
+    assert atomic_write(str(path), "x = 1\n") == 6
+    assert atomic_write(str(path), "x = 2\n") == 6
+    assert path.read_text() == "x = 2\n"
+    assert os.listdir(path.parent) == ["main.py"]
+
+
+def test_coalesced_rewrite_keeps_its_sequence_and_position(tmp_path):
+    writer = FileWriter(batch_delay=0.5)  # Long enough for every write below to stay queued
+    first, second = str(tmp_path / "first.py"), str(tmp_path / "second.py")
+    writer.write(first, "a = 1")
+    writer.write(second, "b = 1")
+    writer.write(first, "a = 2")
+    assert [(path, sequence) for path, (sequence, *_) in writer._pending.items()] == [(first, 1), (second, 2)]
+    assert writer._sequence == 2
+    assert writer.pending(first) == "a = 2"
+    assert writer.flush(timeout=5)
+    assert open(first).read() == "a = 2"
+    assert open(second).read() == "b = 1"
+    assert writer.pending(first) is None
+
+
+def test_flush_waits_for_a_rewrite_queued_before_it(tmp_path):
+    writer = FileWriter(batch_delay=0.05)
+    path = str(tmp_path / "main.py")
+    for number in range(20):
+        writer.write(path, f"x = {number}")
+    assert writer.flush(timeout=5)
+    assert open(path).read() == "x = 19"
+
+
+def test_flush_of_an_idle_writer_returns_at_once():
+    assert FileWriter().flush(timeout=0)
+
+
+def test_flush_times_out_while_writes_are_pending(tmp_path):
+    writer = FileWriter(batch_delay=0.5)
+    writer.write(str(tmp_path / "main.py"), "x = 1")
+    assert not writer.flush(timeout=0.01)
+    assert writer.flush(timeout=5)
+
+
+def test_write_counters_count_coalesced_writes(tmp_path):
+    writer = FileWriter(batch_delay=0.2)
+    path = str(tmp_path / "main.py")
+    for number in range(3):
+        writer.write(path, f"x = {number}")
+    writer.flush(timeout=5)
+    summary = persistence_stats(writer.stats)
+    assert (summary["enqueued"], summary["coalesced"], summary["writes"], summary["errors"]) == (3, 2, 1, 0)
+    assert summary["bytes_written"] == 5
+
+
+def test_bounded_stats_keep_the_latest_latencies():
+    stats = new_write_stats(max_latencies=3)
+    stats["latencies"].extend([1.0, 2.0, 3.0, 4.0])
+    assert list(stats["latencies"]) == [2.0, 3.0, 4.0]
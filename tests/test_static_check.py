@@ -0,0 +1,77 @@
+from tools.static_check import check_compatibility
+
+PY_TREE = ["./generated/src/main.py", "./generated/src/util.py"]
+JS_TREE = ["./generated/src/main.js", "./generated/src/util.js"]
+MAIN_PY, UTIL_PY = PY_TREE
+MAIN_JS, UTIL_JS = JS_TREE
+
+
+def test_matching_python_call_is_compatible():
+    verdict, _ = check_compatibility(MAIN_PY, "from util import helper\nhelper(1)\n",
+                                     UTIL_PY, "def helper(a):\n    return a\n", PY_TREE)
+    assert verdict is True
+
+
+def test_constructor_call_is_checked_against_init():
+    verdict, _ = check_compatibility(MAIN_PY, "from util import Helper\nHelper(1)\n", UTIL_PY,
+                                     "class Helper:\n    def __init__(self, a):\n        self.a = a\n", PY_TREE)
+    assert verdict is True
+
+
+def test_wrong_argument_count_is_a_mismatch():
+    verdict, reason = check_compatibility(MAIN_PY, "from util import helper\nhelper(1, 2, 3)\n",
+                                          UTIL_PY, "def helper(a):\n    return a\n", PY_TREE)
+    assert verdict is False
+    assert "helper()" in reason
+
+
+def test_unknown_keyword_through_module_import_is_a_mismatch():
+    verdict, reason = check_compatibility(MAIN_PY, "import util\nutil.helper(1, b=2)\n",
+                                          UTIL_PY, "def helper(a):\n    pass\n", PY_TREE)
+    assert verdict is False
+    assert "'b'" in reason
+
+
+def test_missing_python_name_is_a_mismatch():
+    verdict, _ = check_compatibility(MAIN_PY, "from util import nothere\n",
+                                     UTIL_PY, "def helper(a):\n    pass\n", PY_TREE)
+    assert verdict is False
+
+
+def test_unresolved_import_is_undecided():
+    # The package path does not map to the tree: the LLM validator must still run
+    verdict, _ = check_compatibility(MAIN_PY, "from app.utils import helper\nhelper(1, 2, 3)\n",
+                                     UTIL_PY, "def helper(a):\n    return a\n", PY_TREE)
+    assert verdict is None
+
+
+def test_unpacked_arguments_are_undecided():
+    verdict, _ = check_compatibility(MAIN_PY, "from util import helper\nhelper(*args)\n",
+                                     UTIL_PY, "def helper(a):\n    pass\n", PY_TREE)
+    assert verdict is None
+
+
+def test_unparsable_code_is_undecided():
+    verdict, reason = check_compatibility(MAIN_PY, "def (", UTIL_PY, "x = 1\n", PY_TREE)
+    assert verdict is None
+    assert "does not parse" in reason
+
+
+def test_files_in_different_languages_are_undecided():
+    verdict, _ = check_compatibility(MAIN_PY, "x = 1\n", UTIL_JS, "export const x = 1;\n", PY_TREE + JS_TREE)
+    assert verdict is None
+
+
+def test_js_named_import_is_checked_against_exports():
+    dep = "export function helper() {}\n"
+    assert check_compatibility(MAIN_JS, 'import { helper } from "./util";\nhelper();\n', UTIL_JS, dep,
+                               JS_TREE)[0] is True
+    verdict, reason = check_compatibility(MAIN_JS, 'import { missing } from "./util";\nmissing();\n', UTIL_JS, dep,
+                                          JS_TREE)
+    assert verdict is False
+    assert "'missing'" in reason
+
+
+def test_unbalanced_js_is_undecided():
+    verdict, _ = check_compatibility(MAIN_JS, "const x = {", UTIL_JS, "export const y = 1;\n", JS_TREE)
+    assert verdict is None
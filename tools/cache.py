@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+
+# Cache location and eviction limits
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(os.getcwd(), ".cache", "llm"))
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_MAX_AGE = float(os.getenv("LLM_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+
+# Per-run cache switch and hit/miss counters (see start_cache_run)
+_cache_run = contextvars.ContextVar("llm_cache_run", default=None)
+
+
+class ResponseCache:
+    """
+    Disk-backed, content-addressed cache of LLM responses.
+
+    Each response is stored as a JSON file named after the SHA-256 of its request
+    (model, system prompt, user prompt and sampling parameters). Entries are evicted
+    in least-recently-used order once the cache grows beyond `max_bytes`, and entries
+    not read for more than `max_age` seconds are dropped.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 max_age: float = CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._index = None  # key -> (size, last access), in LRU order
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str, params: dict = None) -> str:
+        """
+        Build the content address of a request.
+
+        Args:
+            model: Model name.
+            system_prompt: System prompt.
+            prompt: User prompt.
+            params: Sampling parameters.
+
+        Returns:
+            str: Hex SHA-256 digest of the request.
+        """
+        payload = json.dumps(
+            {"model": model, "system": system_prompt, "prompt": prompt, "params": params or {}},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """Build the in-memory LRU index from the files on disk (once; scanned without the lock)."""
+        if self._index is not None:
+            return
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        entries.sort()
+        with self._lock:
+            if self._index is None:
+                self._index = OrderedDict((key, (size, mtime)) for mtime, key, size in entries)
+                self._size = sum(size for size, _ in self._index.values())
+
+    def _forget(self, key: str) -> bool:
+        """Drop a key from the index (lock held); returns whether it was there."""
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._size -= entry[0]
+        return entry is not None
+
+    def _delete_files(self, keys: list):
+        """Delete the files of entries dropped from the index (without the lock)."""
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _evict(self) -> list:
+        """
+        Drop expired entries, then least recently used ones until under the size limit
+        (lock held). Returns the dropped keys, whose files the caller deletes.
+        """
+        now = time.time()
+        evicted = []
+        for key, (_, last_access) in list(self._index.items()):
+            if now - last_access <= self.max_age:
+                break
+            self._forget(key)
+            evicted.append(key)
+        while self._index and self._size > self.max_bytes:
+            key = next(iter(self._index))
+            self._forget(key)
+            evicted.append(key)
+        return evicted
+
+    def get(self, key: str):
+        """
+        Return the cached response for a key, or None on a miss.
+
+        Only the in-memory index is updated under the lock; the entry is read from
+        disk outside of it. This blocks on file I/O, so async code calls it in a thread
+        (see lookup_cached).
+
+        Args:
+            key: Request key from `make_key`.
+
+        Returns:
+            The cached JSON-compatible response, or None.
+        """
+        self._load_index()
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            size, last_access = entry
+            expired = now - last_access > self.max_age
+            if expired:
+                self._forget(key)
+            else:
+                self._index[key] = (size, now)
+                self._index.move_to_end(key)
+        if expired:
+            self._delete_files([key])
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as file:
+                response = json.load(file)
+        except (OSError, ValueError):
+            with self._lock:
+                self._forget(key)
+            self._delete_files([key])
+            return None
+        try:
+            os.utime(self._path(key), (now, now))  # Persist the LRU order across restarts
+        except OSError:
+            pass
+        return response
+
+    def put(self, key: str, response):
+        """
+        Store a JSON-compatible response under a key and apply eviction.
+
+        The entry is written (and evicted files deleted) outside of the lock, which
+        only guards the index. Async code calls it in a thread (see store_cached).
+
+        Args:
+            key: Request key from `make_key`.
+            response: The response to store.
+        """
+        data = json.dumps(response, default=str).encode("utf-8")
+        path = self._path(key)
+        self._load_index()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write LLM cache entry {key}: {e}")
+            return
+        with self._lock:
+            self._forget(key)
+            self._index[key] = (len(data), time.time())
+            self._size += len(data)
+            evicted = self._evict()
+        self._delete_files(evicted)
+
+
+response_cache = ResponseCache()
+
+
+def start_cache_run(enabled: bool = True) -> dict:
+    """
+    Start a cache session for the current run (and the tasks it spawns).
+
+    Args:
+        enabled: False bypasses the cache for this run: nothing is read or written.
+
+    Returns:
+        dict: Counters updated during the run ('enabled', 'hits', 'misses').
+    """
+    stats = {"enabled": enabled, "hits": 0, "misses": 0}
+    _cache_run.set(stats)
+    return stats
+
+
+def cache_stats() -> dict:
+    """
+    Return a copy of the counters of the current cache run.
+
+    Returns:
+        dict: 'enabled', 'hits', 'misses' and 'hit_rate' (%).
+    """
+    stats = dict(_cache_run.get() or {"enabled": CACHE_ENABLED, "hits": 0, "misses": 0})
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] / lookups) * 100 if lookups > 0 else 0
+    return stats
+
+
+async def lookup_cached(model: str, system_prompt: str, prompt: str, params: dict):
+    """
+    Look up a request in the response cache, honouring the per-run switch and counters.
+
+    The entry is read in a worker thread, so the lookup never blocks the event loop.
+
+    Args:
+        model: Model name.
+        system_prompt: System prompt.
+        prompt: User prompt.
+        params: Sampling parameters.
+
+    Returns:
+        tuple: The request key (None when the cache is bypassed) and the cached
+            response (None on a miss).
+    """
+    stats = _cache_run.get()
+    enabled = stats["enabled"] if stats is not None else CACHE_ENABLED
+    if not enabled:
+        return None, None
+
+    key = ResponseCache.make_key(model, system_prompt, prompt, params)
+    response = await asyncio.to_thread(response_cache.get, key)
+    if stats is not None:
+        stats["hits" if response is not None else "misses"] += 1
+    return key, response
+
+
+async def store_cached(key: str, response):
+    """
+    Store a response under a key returned by `lookup_cached` (no-op when bypassed),
+    writing it in a worker thread.
+
+    Args:
+        key: Request key, or None when the cache is bypassed.
+        response: The JSON-compatible response.
+    """
+    if key is not None:
+        await asyncio.to_thread(response_cache.put, key, response)
+
+
+async def cached_call(model: str, system_prompt: str, prompt: str, params: dict, call):
+    """
+    Return the cached response of a request, or await `call()` and cache its result.
+
+    Args:
+        model: Model name.
+        system_prompt: System prompt.
+        prompt: User prompt.
+        params: Sampling parameters.
+        call: Zero-argument coroutine function performing the real request. It must
+            return a JSON-compatible response.
+
+    Returns:
+        tuple: The response and whether it was served from the cache.
+    """
+    key, response = await lookup_cached(model, system_prompt, prompt, params)
+    if response is not None:
+        return response, True
+    response = await call()
+    await store_cached(key, response)
+    return response, False
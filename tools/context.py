@@ -0,0 +1,202 @@
+import os
+import re
+import ast
+from functools import lru_cache
+from tools.usage import count_tokens
+
+# Default token budget of the context given to each generation prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "24000"))
+PREVIEW_LINES = 8
+
+ROUTE_DECORATORS = {"route", "get", "post", "put", "patch", "delete", "websocket"}
+JS_PATTERNS = [
+    re.compile(r"^\s*export\s+(?:default\s+)?(?:async\s+)?function\s*\*?\s*\w*\s*\([^)]*\)", re.MULTILINE),
+    re.compile(r"^\s*export\s+(?:default\s+)?class\s+\w+(?:\s+extends\s+[\w.]+)?", re.MULTILINE),
+    re.compile(r"^\s*export\s+(?:const|let|var)\s+\w+(?:\s*=\s*(?:async\s*)?\([^)]*\)\s*=>)?", re.MULTILINE),
+    re.compile(r"^\s*export\s+(?:default\s+(?!function|class|async)\w+|\{[^}]*\})", re.MULTILINE),
+    re.compile(r"^\s*module\.exports\s*=\s*(?:\{[^}]*\}|\w+)", re.MULTILINE),
+    re.compile(r"^\s*exports\.\w+\s*=", re.MULTILINE),
+    re.compile(r"^(?:async\s+)?function\s*\*?\s*\w+\s*\([^)]*\)", re.MULTILINE),
+    re.compile(r"^class\s+\w+(?:\s+extends\s+[\w.]+)?", re.MULTILINE),
+    re.compile(r"^(?:const|let)\s+\w+\s*=\s*(?:async\s*)?\([^)]*\)\s*=>", re.MULTILINE),
+    re.compile(r"""^\s*(?:app|router|server)\.(?:get|post|put|patch|delete|use|all)\s*\(\s*['"][^'"]*['"]""",
+               re.MULTILINE),
+]
+
+
+def python_signature(node) -> str:
+    """
+    Render the signature of a Python function definition.
+    """
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def python_routes(node) -> list:
+    """
+    Return the routes declared by the decorators of a function (Flask, FastAPI, ...).
+    """
+    routes = []
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute) \
+                and decorator.func.attr in ROUTE_DECORATORS and decorator.args:
+            routes.append(f"@{ast.unparse(decorator.func)}({ast.unparse(decorator.args[0])})")
+    return routes
+
+
+def summarize_python(content: str) -> str:
+    """
+    Summarize the public interface of a Python module: its top-level classes with
+    their methods, functions with signatures, routes and constants.
+
+    Args:
+        content: Python source code.
+
+    Returns:
+        str: The interface summary.
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        lines = re.findall(r"^\s*(?:async\s+def|def|class)\s+.*?:\s*$", content, re.MULTILINE)
+        return "\n".join(line.rstrip(":").strip() for line in lines)
+
+    lines = []
+    docstring = ast.get_docstring(tree)
+    if docstring:
+        lines.append(f'"""{docstring.strip().splitlines()[0]}"""')
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name.startswith("_"):
+                continue
+            lines.extend(python_routes(node))
+            lines.append(python_signature(node))
+        elif isinstance(node, ast.ClassDef):
+            bases = f"({', '.join(ast.unparse(base) for base in node.bases)})" if node.bases else ""
+            lines.append(f"class {node.name}{bases}:")
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) \
+                        and (not child.name.startswith("_") or child.name == "__init__"):
+                    lines.append(f"    {python_signature(child)}")
+                elif isinstance(child, ast.AnnAssign) and isinstance(child.target, ast.Name):
+                    lines.append(f"    {ast.unparse(child.target)}: {ast.unparse(child.annotation)}")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [ast.unparse(target) for target in targets if isinstance(target, ast.Name)]
+            for name in names:
+                if name.isupper() or name in ("app", "router", "api", "db", "blueprint", "bp"):
+                    value = ast.unparse(node.value) if node.value is not None else ""
+                    lines.append(f"{name} = {value[:80]}")
+    return "\n".join(lines)
+
+
+def summarize_js(content: str) -> str:
+    """
+    Summarize the interface of a JavaScript/TypeScript module with a lightweight
+    line scan: exports, top-level functions and classes, and Express-style routes.
+
+    Args:
+        content: JS/TS source code.
+
+    Returns:
+        str: The interface summary.
+    """
+    matches = {}  # start offset -> declaration, first matching pattern wins
+    for pattern in JS_PATTERNS:
+        for match in pattern.finditer(content):
+            matches.setdefault(match.start(), " ".join(match.group(0).split()))
+    lines = []
+    for _, line in sorted(matches.items()):
+        if line not in lines:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=2048)
+def summarize_file(path: str, content: str) -> str:
+    """
+    Summarize the interface of a generated file.
+
+    Python and JS/TS files are summarized from their definitions; other files are
+    reduced to their first lines.
+
+    Args:
+        path: Path of the file.
+        content: Content of the file.
+
+    Returns:
+        str: The summary, starting with a line saying it is one.
+    """
+    _, extension = os.path.splitext(path)
+    if extension == ".py":
+        summary = summarize_python(content)
+    elif extension in (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs"):
+        summary = summarize_js(content)
+    else:
+        summary = ""
+    if not summary:
+        lines = content.splitlines()
+        summary = "\n".join(lines[:PREVIEW_LINES])
+        if len(lines) > PREVIEW_LINES:
+            summary += f"\n... ({len(lines) - PREVIEW_LINES} more lines)"
+    return f"# Interface summary of {path}\n{summary}"
+
+
+def build_context(files: dict, full_paths=(), token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """
+    Build the context of a generation prompt from previously generated files.
+
+    Files in `full_paths` (those the new file directly imports) are given in full,
+    every other file as an interface summary. If the context exceeds the token budget,
+    full bodies are reduced to summaries first (latest first), then the oldest
+    summaries are dropped.
+
+    Args:
+        files: Mapping of path to content of the candidate files, in generation order.
+        full_paths: Paths whose full content should be included.
+        token_budget: Maximum number of context tokens (None or 0 for no limit).
+
+    Returns:
+        tuple: The context (mapping of path to text) and its stats: 'context_tokens',
+            'full_context_tokens' (tokens the full sources would have taken),
+            'summarized_files' and 'dropped_files'.
+    """
+    full_paths = set(full_paths)
+    entries = {}
+    full_context_tokens = 0
+    for path, content in files.items():
+        content_tokens = count_tokens(content)
+        full_context_tokens += content_tokens
+        summary = None if path in full_paths else summarize_file(path, content)
+        summary_tokens = count_tokens(summary) if summary is not None else 0
+        if summary is None or summary_tokens >= content_tokens:
+            # Small files are cheaper in full than summarized
+            entries[path] = (content, content_tokens)
+        else:
+            entries[path] = (summary, summary_tokens)
+
+    total = sum(tokens for _, tokens in entries.values())
+    if token_budget:
+        for path in reversed([p for p in entries if p in full_paths]):
+            if total <= token_budget:
+                break
+            summary = summarize_file(path, files[path])
+            summary_tokens = count_tokens(summary)
+            if summary_tokens >= entries[path][1]:
+                continue
+            total += summary_tokens - entries[path][1]
+            entries[path] = (summary, summary_tokens)
+        for path in list(entries):
+            if total <= token_budget:
+                break
+            total -= entries.pop(path)[1]
+
+    context = {path: text for path, (text, _) in entries.items()}
+    stats = {
+        "context_tokens": total,
+        "full_context_tokens": full_context_tokens,
+        "summarized_files": sum(1 for path, text in context.items() if text != files[path]),
+        "dropped_files": len(files) - len(context),
+    }
+    return context, stats
@@ -0,0 +1,328 @@
+import os
+import re
+import ast
+import logging
+
+# Files describing the whole project; they are written after every source file
+PROJECT_FILE_EXTENSIONS = {".md", ".txt", ".toml", ".cfg", ".ini", ".yml", ".yaml", ".json"}
+PROJECT_FILE_NAMES = {"dockerfile", "makefile", "procfile"}
+JS_EXTENSIONS = [".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs"]
+ENTRY_POINT_KEYWORDS = ("main", "entry point")
+
+JS_IMPORT_PATTERN = re.compile(
+    r"""(?:import\s[^'"]*?from\s*|import\s*\(?\s*|require\s*\(\s*|export\s[^'"]*?from\s*)['"]([^'"]+)['"]"""
+)
+
+
+def is_directory(path: str) -> bool:
+    """
+    Return True if a project tree path denotes a directory.
+    """
+    return path.endswith("/") or os.path.basename(path) == ""
+
+
+def is_entry_point(description: str) -> bool:
+    """
+    Return True if a description marks a main file or another entry point.
+    """
+    return any(keyword in description.lower() for keyword in ENTRY_POINT_KEYWORDS)
+
+
+def tested_module_name(path: str) -> str:
+    """
+    Return the name of the module a test file covers ('App' for 'App.test.js',
+    'utils' for 'test_utils.py'), or None if the path is not a test file.
+    """
+    base = os.path.basename(path)
+    name = base.split(".")[0]
+    if re.search(r"\.(test|spec)\.", base):
+        return name
+    if name.startswith("test_"):
+        return name[len("test_"):]
+    if name.endswith("_test"):
+        return name[:-len("_test")]
+    return None
+
+
+def is_project_file(path: str) -> bool:
+    """
+    Return True for documentation, configuration and packaging files.
+    """
+    name = os.path.basename(path).lower()
+    _, extension = os.path.splitext(name)
+    return extension in PROJECT_FILE_EXTENSIONS or name in PROJECT_FILE_NAMES
+
+
+def python_imports(content: str) -> list:
+    """
+    List the modules imported by a Python source, relative imports prefixed with dots.
+
+    Args:
+        content: Python source code.
+
+    Returns:
+        list: Dotted module names (e.g. 'utils.logging', '.models').
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        # Partial or invalid code: fall back to a line-based scan
+        pairs = re.findall(r"^\s*(?:from\s+([.\w]+)\s+import|import\s+([\w.]+))", content, re.MULTILINE)
+        return [module for pair in pairs for module in pair if module]
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = "." * node.level + (node.module or "")
+            modules.append(base)
+            # 'from package import module' may import a submodule
+            modules.extend(f"{base}.{alias.name}" if node.module else f"{base}{alias.name}"
+                           for alias in node.names if alias.name != "*")
+    return modules
+
+
+def js_imports(content: str) -> list:
+    """
+    List the module specifiers imported by a JavaScript/TypeScript source.
+
+    Args:
+        content: JS/TS source code.
+
+    Returns:
+        list: Import specifiers (e.g. './api', '../components/Header', 'react').
+    """
+    return JS_IMPORT_PATTERN.findall(content)
+
+
+def resolve_imports(path: str, content: str, tree_paths: list) -> set:
+    """
+    Resolve the imports of a file to other files of the project tree.
+
+    Python imports are matched against every dotted suffix of the tree's .py module
+    paths (a bare name only when unambiguous or in the importer's directory); JS/TS
+    relative specifiers are resolved against the importer's directory.
+
+    Args:
+        path: Tree path of the importing file.
+        content: Source code of the importing file.
+        tree_paths: All file paths of the project tree.
+
+    Returns:
+        set: Tree paths the file imports.
+    """
+    importer_dir = os.path.dirname(os.path.normpath(path))
+    _, extension = os.path.splitext(path)
+    resolved = set()
+
+    if extension == ".py":
+        modules = {}  # dotted suffix -> candidate paths
+        for tree_path in tree_paths:
+            if not tree_path.endswith(".py") or tree_path == path:
+                continue
+            parts = os.path.normpath(tree_path)[:-3].split(os.sep)
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            for i in range(len(parts)):
+                modules.setdefault(".".join(parts[i:]), []).append(tree_path)
+
+        for module in python_imports(content):
+            if module.startswith("."):
+                level = len(module) - len(module.lstrip("."))
+                base_dir = importer_dir
+                for _ in range(level - 1):
+                    base_dir = os.path.dirname(base_dir)
+                relative = module.lstrip(".").replace(".", os.sep)
+                target = os.path.join(base_dir, relative) if relative else base_dir
+                for tree_path in tree_paths:
+                    normalized = os.path.normpath(tree_path)
+                    if normalized in (f"{target}.py", os.path.join(target, "__init__.py")):
+                        resolved.add(tree_path)
+                continue
+            candidates = modules.get(module, [])
+            if not candidates:
+                continue
+            same_dir = [c for c in candidates if os.path.dirname(os.path.normpath(c)) == importer_dir]
+            if same_dir:
+                resolved.update(same_dir)
+            elif "." in module or len(candidates) == 1:
+                resolved.update(candidates)
+
+    elif extension in JS_EXTENSIONS or extension in (".html", ".vue", ".svelte"):
+        normalized_paths = {os.path.normpath(tree_path): tree_path for tree_path in tree_paths}
+        for specifier in js_imports(content):
+            if not specifier.startswith("."):
+                continue
+            target = os.path.normpath(os.path.join(importer_dir, specifier))
+            for candidate in [target] + [target + ext for ext in JS_EXTENSIONS] + \
+                    [os.path.join(target, "index" + ext) for ext in JS_EXTENSIONS]:
+                if candidate in normalized_paths and normalized_paths[candidate] != path:
+                    resolved.add(normalized_paths[candidate])
+                    break
+    return resolved
+
+
+def mentioned_files(description: str, paths: list) -> set:
+    """
+    Return the paths whose file name is mentioned in a description.
+
+    Args:
+        description: Description of a file.
+        paths: Candidate tree paths.
+
+    Returns:
+        set: Paths whose base name (longer than 3 characters) appears as a word.
+    """
+    mentioned = set()
+    for path in paths:
+        name = os.path.basename(path)
+        if len(name) > 3 and re.search(rf"(?<![\w.]){re.escape(name)}(?!\w)", description):
+            mentioned.add(path)
+    return mentioned
+
+
+def build_dependency_graph(tree: list, existing_files: dict = None) -> dict:
+    """
+    Build the prerequisite graph of a project tree.
+
+    A file depends on another when:
+    - its content (if it already exists) imports it;
+    - its description mentions the other file's name;
+    - it is a main file or entry point and the other is a non-entry source file of its
+      directory subtree;
+    - it is a test file and the other is the module it tests;
+    - it is a documentation/configuration file and the other is a source file.
+
+    Args:
+        tree: Project tree entries with 'path' and 'description' keys.
+        existing_files: Optional mapping of path to content of files generated earlier,
+            used to add the edges of their actual imports.
+
+    Returns:
+        dict: Mapping of each file path to the set of paths it depends on.
+    """
+    existing_files = existing_files or {}
+    items = [item for item in tree if not is_directory(item["path"])]
+    paths = [item["path"] for item in items]
+    graph = {path: set() for path in paths}
+
+    for item in items:
+        path, description = item["path"], item["description"]
+        path_dir = os.path.dirname(os.path.normpath(path))
+        tested_module = tested_module_name(path)
+
+        if path in existing_files:
+            graph[path] |= resolve_imports(path, existing_files[path], paths)
+        mentioned = mentioned_files(description, [p for p in paths if p != path])
+        graph[path] |= mentioned
+
+        for other in items:
+            other_path = other["path"]
+            if other_path == path or other_path in mentioned:
+                continue
+            name = os.path.basename(other_path)
+            if is_project_file(path) and not is_project_file(other_path):
+                graph[path].add(other_path)
+            elif tested_module and tested_module_name(other_path) is None \
+                    and os.path.splitext(name)[0] == tested_module:
+                graph[path].add(other_path)
+            elif (is_entry_point(description) and not is_entry_point(other["description"])
+                  and not is_project_file(other_path) and tested_module_name(other_path) is None
+                  and os.path.normpath(other_path).startswith(path_dir + os.sep)):
+                graph[path].add(other_path)
+    return graph
+
+
+def reference_graph(tree: list, files: dict = None) -> dict:
+    """
+    Build the reference index of a project tree: the files each file refers to.
+
+    A file refers to another when its code (once generated) imports it or names it
+    (a template, static asset or configuration file loaded by name), or when its
+    description mentions it.
+
+    Args:
+        tree: Project tree entries with 'path' and 'description' keys.
+        files: Mapping of path to the code generated so far.
+
+    Returns:
+        dict: Mapping of each file path to the set of paths it refers to.
+    """
+    files = files or {}
+    paths = [item["path"] for item in tree if not is_directory(item["path"])]
+    graph = {}
+    for item in tree:
+        path = item["path"]
+        if is_directory(path):
+            continue
+        others = [other for other in paths if other != path]
+        graph[path] = mentioned_files(item["description"], others)
+        if path in files:
+            graph[path] |= resolve_imports(path, files[path], paths) | mentioned_files(files[path], others)
+    return graph
+
+
+def related_files(path: str, graph: dict, depth: int) -> dict:
+    """
+    Find the files related to a file within a number of reference hops.
+
+    The search follows the references of each file, and also the files referring to
+    it, except documentation and configuration files (a README naming a module does
+    not make the module depend on it).
+
+    Args:
+        path: The starting file.
+        graph: Reference index (see reference_graph).
+        depth: Maximum number of hops.
+
+    Returns:
+        dict: Mapping of each related path to its distance in hops (the start excluded).
+    """
+    referrers = {}
+    for source, targets in graph.items():
+        if not is_project_file(source):
+            for target in targets:
+                referrers.setdefault(target, set()).add(source)
+    distances = {path: 0}
+    frontier = [path]
+    for hop in range(1, depth + 1):
+        next_frontier = []
+        for current in frontier:
+            for neighbour in sorted(graph.get(current, set()) | referrers.get(current, set())):
+                if neighbour not in distances:
+                    distances[neighbour] = hop
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+    del distances[path]
+    return distances
+
+
+def schedule_waves(graph: dict, order: list = None) -> list:
+    """
+    Group the files of a prerequisite graph into waves that can be generated in parallel.
+
+    Every file of a wave only depends on files of earlier waves. Files keep the
+    project tree order inside a wave. Cycles are broken by releasing the pending
+    file with the fewest unsatisfied prerequisites (first in tree order on ties).
+
+    Args:
+        graph: Mapping of path to the set of paths it depends on.
+        order: Paths in project tree order (defaults to the graph's order).
+
+    Returns:
+        list: Lists of paths, one per wave.
+    """
+    order = [path for path in (order or list(graph)) if path in graph]
+    done = set()
+    pending = list(order)
+    waves = []
+    while pending:
+        wave = [path for path in pending if graph[path] <= done]
+        if not wave:
+            path = min(pending, key=lambda p: len(graph[p] - done))
+            logging.warning(f"Dependency cycle around {path}; generating it before {sorted(graph[path] - done)}")
+            wave = [path]
+        waves.append(wave)
+        done.update(wave)
+        pending = [path for path in pending if path not in done]
+    return waves
@@ -0,0 +1,143 @@
+import os
+import mmap
+import threading
+from collections import OrderedDict
+
+# Content kept in memory per explorer, and how large files are read
+EXPLORER_CACHE_FILES = int(os.getenv("EXPLORER_CACHE_FILES", "64"))
+EXPLORER_CACHE_BYTES = int(os.getenv("EXPLORER_CACHE_BYTES", str(16 * 1024 * 1024)))
+EXPLORER_MMAP_BYTES = int(os.getenv("EXPLORER_MMAP_BYTES", str(1024 * 1024)))
+EXPLORER_MAX_DISPLAY_BYTES = int(os.getenv("EXPLORER_MAX_DISPLAY_BYTES", str(2 * 1024 * 1024)))
+MAX_EXPLORERS = 32
+
+# Explorers by root directory, least recently used first (see explorer_for)
+_explorers = OrderedDict()
+_explorers_lock = threading.Lock()
+
+
+def index_directory(root: str) -> dict:
+    """
+    Index the files under a directory from their metadata only (no content is read).
+
+    Args:
+        root: Directory to index.
+
+    Returns:
+        dict: Mapping of path relative to `root` to its (size, mtime_ns), in sorted
+            directory order.
+    """
+    index = {}
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.is_file():
+                stat = entry.stat()
+                index[os.path.relpath(entry.path, root)] = (stat.st_size, stat.st_mtime_ns)
+        pending.extend(reversed(subdirectories))
+    return index
+
+
+def read_text(path: str, size: int, max_bytes: int = EXPLORER_MAX_DISPLAY_BYTES) -> str:
+    """
+    Read a file for display, memory-mapping large files and truncating them at
+    `max_bytes`.
+    """
+    with open(path, "rb") as file:
+        if size >= EXPLORER_MMAP_BYTES:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                data = mapped[:max_bytes]
+        else:
+            data = file.read(max_bytes)
+    text = data.decode("utf-8", errors="replace")
+    if size > max_bytes:
+        text += f"\n\n[... truncated, {size - max_bytes} more bytes]"
+    return text
+
+
+class FileExplorer:
+    """
+    File explorer of a generated project that keeps only a path index in memory.
+
+    `refresh` indexes the files from their metadata; `read` looks a file up in the
+    index and loads its content on demand, keeping the most recently viewed files in
+    an LRU cache bounded by `cache_files` entries and `cache_bytes` bytes. A cached
+    file whose size or modification time changed on disk is read again.
+    """
+
+    def __init__(self, root: str, cache_files: int = EXPLORER_CACHE_FILES, cache_bytes: int = EXPLORER_CACHE_BYTES):
+        self.root = root
+        self.cache_files = cache_files
+        self.cache_bytes = cache_bytes
+        self.index = {}  # relative path -> (size, mtime_ns)
+        self._cache = OrderedDict()  # relative path -> ((size, mtime_ns), content), least recently used first
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> list:
+        """
+        Re-index the project files.
+
+        Returns:
+            list: The relative paths of the files, in directory order.
+        """
+        index = index_directory(self.root)
+        with self._lock:
+            self.index = index
+            for path in [path for path in self._cache if path not in index]:
+                self._evict(path)
+        return list(index)
+
+    def _evict(self, path: str):
+        _, content = self._cache.pop(path)
+        self._cached_bytes -= len(content)
+
+    def read(self, path: str) -> str:
+        """
+        Return the content of an indexed file.
+
+        Raises:
+            KeyError: If the file is not in the index.
+        """
+        if path not in self.index:
+            raise KeyError(f"{path} is not in the project index")
+        full_path = os.path.join(self.root, path)
+        stat = os.stat(full_path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(path)
+                return cached[1]
+        content = read_text(full_path, stat.st_size)
+        with self._lock:
+            if path in self._cache:
+                self._evict(path)
+            self.index[path] = version
+            if len(content) <= self.cache_bytes:
+                self._cache[path] = (version, content)
+                self._cached_bytes += len(content)
+                while len(self._cache) > self.cache_files or self._cached_bytes > self.cache_bytes:
+                    self._evict(next(iter(self._cache)))
+        return content
+
+
+def explorer_for(root: str) -> FileExplorer:
+    """
+    Return the explorer of a project directory, shared by the sessions viewing it.
+
+    At most MAX_EXPLORERS explorers are kept; the least recently used is dropped.
+    """
+    with _explorers_lock:
+        explorer = _explorers.pop(root, None) or FileExplorer(root)
+        _explorers[root] = explorer
+        if len(_explorers) > MAX_EXPLORERS:
+            _explorers.popitem(last=False)
+        return explorer
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import threading
+
+# Number of jobs run at once and where their state and results are kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_DIR = os.getenv("JOB_DIR", os.path.join(os.getcwd(), ".cache", "jobs"))
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+# Finished jobs kept in memory (older ones are still read back from their job file)
+JOB_TTL = float(os.getenv("JOB_TTL", "3600"))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "100"))
+
+
+class Job:
+    """
+    A submitted run and its progress.
+    """
+
+    def __init__(self, params: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.result = None
+        self.progress = {}  # path -> (characters written, done)
+        self.version = 0  # Incremented on every change, for streaming
+        self.cancel_requested = False
+        self._loop = None
+        self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "progress": dict(self.progress),
+            "version": self.version,
+        }
+
+
+class JobManager:
+    """
+    Queue of background runs served by a pool of worker threads.
+
+    Each job runs the `run` coroutine function in its own event loop on a worker
+    thread, so a long generation never blocks the caller. Callers poll `status` or
+    stream changes with `wait`, and may `cancel` a queued or running job. The state
+    and result of every job are written to `job_dir` as JSON, so finished jobs can be
+    looked up after a restart. Finished jobs are dropped from memory after `ttl`
+    seconds, or beyond the `max_finished` most recent ones, and then read back from
+    their job file.
+    """
+
+    def __init__(self, run, workers: int = JOB_WORKERS, job_dir: str = JOB_DIR, ttl: float = JOB_TTL,
+                 max_finished: int = JOB_MAX_FINISHED):
+        """
+        Args:
+            run: Coroutine function called as `run(on_progress=..., **params)`; its return
+                value (JSON-serializable) is the job result.
+            workers: Number of jobs run at once.
+            job_dir: Directory of the job files.
+            ttl: Seconds a finished job stays in memory.
+            max_finished: Maximum number of finished jobs kept in memory.
+        """
+        self.run = run
+        self.workers = max(1, workers)
+        self.job_dir = job_dir
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._changed = threading.Condition()
+        self._threads = []
+
+    def _start_workers(self):
+        """Start the worker threads on first use."""
+        if self._threads:
+            return
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{number + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, **params) -> str:
+        """
+        Queue a job.
+
+        Returns:
+            str: The job id.
+        """
+        job = Job(params)
+        with self._changed:
+            self._prune()
+            self._jobs[job.id] = job
+            self._start_workers()
+        self._save(job)
+        self._queue.put(job.id)
+        logging.info(f"Job {job.id} queued")
+        return job.id
+
+    def status(self, job_id: str) -> dict:
+        """
+        Return the state of a job ('status', 'progress', 'error', timestamps, 'version'
+        and, once finished, 'result'), or None for an unknown id.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                snapshot = job.snapshot()
+                if job.status in FINISHED_STATES:
+                    snapshot["result"] = job.result
+                elif job.status == "queued":
+                    queued = [other for other in self._jobs.values() if other.status == "queued"]
+                    snapshot["queue_position"] = sorted(queued, key=lambda other: other.created).index(job) + 1
+                return snapshot
+        return self._load(job_id)
+
+    def wait(self, job_id: str, version: int = -1, timeout: float = None) -> dict:
+        """
+        Wait until a job changes past `version` or finishes, then return its state.
+
+        Args:
+            job_id: The job id.
+            version: Last version seen by the caller.
+            timeout: Maximum time to wait, in seconds.
+
+        Returns:
+            dict: The job state (see `status`), or None for an unknown id.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._changed.wait_for(lambda: job.version > version or job.status in FINISHED_STATES, timeout)
+        return self.status(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        A running job's task is cancelled, which also cancels its LLM calls in
+        progress; they return their rate-limiter slots (see tools.rate_limit).
+
+        Returns:
+            bool: Whether the job was still queued or running.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return False
+            job.cancel_requested = True
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+            elif job._loop is not None and not job._loop.is_closed():
+                job._loop.call_soon_threadsafe(job._task.cancel)
+        logging.info(f"Job {job_id} cancellation requested")
+        return True
+
+    def _update(self, job: Job, **changes):
+        with self._changed:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _finish(self, job: Job, status: str, result=None, error: str = None):
+        self._update(job, status=status, result=result, error=error, finished=time.time())
+        self._save(job)
+        logging.info(f"Job {job.id} {status}")
+        with self._changed:
+            self._prune()
+
+    def _prune(self):
+        """Drop expired finished jobs, and the oldest beyond `max_finished` (lock held)."""
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if job.status in FINISHED_STATES),
+                          key=lambda job: job.finished)
+        for number, job in enumerate(finished):
+            if now - job.finished > self.ttl or len(finished) - number > self.max_finished:
+                del self._jobs[job.id]
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            with self._changed:
+                job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                continue  # Cancelled while queued
+            self._update(job, status="running", started=time.time())
+            self._save(job)
+
+            def on_progress(path, content, done):
+                with self._changed:
+                    job.progress[path] = (len(content), done)
+                    job.version += 1
+                    self._changed.notify_all()
+
+            async def main():
+                with self._changed:
+                    job._loop, job._task = asyncio.get_running_loop(), asyncio.current_task()
+                    if job.cancel_requested:
+                        job._task.cancel()
+                try:
+                    return await self.run(on_progress=on_progress, **job.params)
+                finally:
+                    # Detach the loop before asyncio.run closes it, so `cancel` never schedules on it
+                    with self._changed:
+                        job._loop = job._task = None
+
+            try:
+                result = asyncio.run(main())
+            except asyncio.CancelledError:
+                self._finish(job, "cancelled")
+            except Exception as e:
+                logging.error(f"Job {job.id} failed: {e}")
+                self._finish(job, "failed", error=str(e))
+            else:
+                self._finish(job, "succeeded", result=result)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _save(self, job: Job):
+        """Write the state and result of a job to its file."""
+        with self._changed:
+            data = dict(job.snapshot(), result=job.result)
+        try:
+            os.makedirs(self.job_dir, exist_ok=True)
+            temporary_path = f"{self._path(job.id)}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                json.dump(data, file, default=str)
+            os.replace(temporary_path, self._path(job.id))
+        except OSError as e:
+            logging.warning(f"Could not save job {job.id}: {e}")
+
+    def _load(self, job_id: str) -> dict:
+        """Read the state of a job of an earlier server process from its file."""
+        if not job_id or os.path.basename(job_id) != job_id or not os.path.isfile(self._path(job_id)):
+            return None
+        with open(self._path(job_id), "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data["status"] not in FINISHED_STATES:
+            # The process running it stopped before it finished
+            data.update(status="failed", error="Interrupted by a server restart")
+        return data
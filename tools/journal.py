@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+# Location of the run journals and whether each record is synced to disk
+JOURNAL_DIR = os.getenv("RUN_JOURNAL_DIR", os.path.join(os.getcwd(), ".cache", "runs"))
+JOURNAL_FSYNC = os.getenv("RUN_JOURNAL_FSYNC", "1") != "0"
+
+
+def tree_fingerprint(project_tree: list) -> str:
+    """
+    Return a hash identifying a project tree (paths and descriptions).
+    """
+    payload = json.dumps([[item["path"], item["description"]] for item in project_tree])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunJournal:
+    """
+    Append-only journal of a generation run, used to resume it after a crash.
+
+    Each line of the journal file is one JSON record. `append` returns at once: a
+    writer thread appends the queued records in order and syncs each batch with one
+    fsync, so the event loop never waits on the disk (`flush` waits for them). The
+    journal always ends at a consistent point: a record is either fully written or
+    ignored. Records belong to a scope, the path of the See-Saw main
+    file they were produced for (None for the standard build):
+
+    - 'file': a generated file (a finished file of the standard build, or a See-Saw
+      dependency before its validation);
+    - 'revision': a new version of a main file's code;
+    - 'verdicts': validator verdicts of dependencies against the latest revision. A
+      main revision is always written before the verdicts that caused it.
+
+    Records may carry the iteration metrics of the work they settle.
+    """
+
+    def __init__(self, path: str, header: dict):
+        self.path = path
+        self.header = header
+        self.records = []
+        self._lines = []  # Records queued for the writer thread, in order
+        self._appended = 0  # Number of records appended
+        self._synced = 0  # Number of records written and synced
+        self._writer = None
+        self._condition = threading.Condition()
+
+    @classmethod
+    def open(cls, name: str, project_tree: list, resume: bool = False, journal_dir: str = JOURNAL_DIR):
+        """
+        Open the journal of a run.
+
+        Args:
+            name: Name of the journal (e.g. the generation mode).
+            project_tree: Project tree of the run.
+            resume: Whether to continue the previous run. Its records are kept only if
+                it was made for the same project tree; otherwise a new journal starts.
+            journal_dir: Directory of the journal files.
+
+        Returns:
+            RunJournal: The journal, with the records of the resumed run if any.
+        """
+        journal = cls(os.path.join(journal_dir, f"{name}.jsonl"),
+                      {"type": "run", "name": name, "tree": tree_fingerprint(project_tree)})
+        if resume:
+            records = journal._read()
+            if records and records[0] == journal.header:
+                journal.records = records[1:]
+                logging.info(f"Resuming run from {journal.path} ({len(journal.records)} records)")
+            else:
+                logging.warning(f"No resumable run for this project tree in {journal.path}; starting a new one")
+        # Rewrite the journal so new records follow its last complete one
+        os.makedirs(journal_dir, exist_ok=True)
+        temporary_path = f"{journal.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            for record in [journal.header] + journal.records:
+                file.write(json.dumps(record) + "\n")
+        os.replace(temporary_path, journal.path)
+        return journal
+
+    def _read(self) -> list:
+        """Read the records on disk, stopping at the first incomplete line."""
+        records = []
+        if not os.path.isfile(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring the truncated end of {self.path}")
+                    break
+        return records
+
+    def append(self, record: dict):
+        """
+        Add a record to the journal and queue it for the writer thread.
+        """
+        line = json.dumps(record) + "\n"
+        with self._condition:
+            self.records.append(record)
+            self._lines.append(line)
+            self._appended += 1
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_queued, name="journal-writer", daemon=True)
+                self._writer.start()
+
+    def _write_queued(self):
+        """Write and sync the queued records in batches; the thread ends when the queue is empty."""
+        while True:
+            with self._condition:
+                if not self._lines:
+                    self._writer = None
+                    return
+                lines, self._lines = self._lines, []
+                batch_end = self._appended
+            try:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write("".join(lines))
+                    file.flush()
+                    if JOURNAL_FSYNC:
+                        os.fsync(file.fileno())
+            except OSError as e:
+                logging.error(f"Could not write to the run journal {self.path}: {e}")
+            with self._condition:
+                self._synced = batch_end
+                self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until the records appended so far are written and synced.
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        with self._condition:
+            target = self._appended
+            return self._condition.wait_for(lambda: self._synced >= target, timeout)
+
+    def scope(self, main: str = None) -> "JournalScope":
+        """
+        Return the view of the journal for one See-Saw main file (None for the standard build).
+        """
+        return JournalScope(self, main)
+
+
+class JournalScope:
+    """
+    Records of a run journal belonging to one scope (see RunJournal).
+    """
+
+    def __init__(self, journal: RunJournal, main: str = None):
+        self.journal = journal
+        self.main = main
+
+    def record_file(self, path: str, content: str, metrics: list = None):
+        self.journal.append({"type": "file", "main": self.main, "path": path, "content": content,
+                             "metrics": metrics or []})
+
+    def record_revision(self, content: str, metrics: list = None):
+        self.journal.append({"type": "revision", "main": self.main, "content": content, "metrics": metrics or []})
+
+    def record_verdicts(self, verdicts: dict, metrics: list = None):
+        self.journal.append({"type": "verdicts", "main": self.main, "verdicts": verdicts, "metrics": metrics or []})
+
+    def generated(self, path: str):
+        """
+        Return the last journaled content of a file of this scope, or None.
+        """
+        content = None
+        for record in self.journal.records:
+            if record["type"] == "file" and record["main"] == self.main and record["path"] == path:
+                content = record["content"]
+        return content
+
+    def state(self) -> dict:
+        """
+        Rebuild the state of this scope from its records.
+
+        Returns:
+            dict: The latest main 'revision' (or None), the 'files' generated (path to
+                content), the 'verdicts' of the settled dependencies (path to bool), and
+                the journaled iteration metrics ('iterations'), marked as resumed.
+        """
+        state = {"revision": None, "files": {}, "verdicts": {}, "iterations": []}
+        for record in self.journal.records:
+            if record["main"] != self.main:
+                continue
+            if record["type"] == "file":
+                state["files"][record["path"]] = record["content"]
+            elif record["type"] == "revision":
+                state["revision"] = record["content"]
+            elif record["type"] == "verdicts":
+                state["verdicts"].update(record["verdicts"])
+            state["iterations"].extend({**metric, "resumed": True} for metric in record["metrics"])
+        return state
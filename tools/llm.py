@@ -0,0 +1,309 @@
+import os
+import asyncio
+import weakref
+import httpx
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from huggingface_hub import AsyncInferenceClient
+import time
+from tools.cache import cached_call, lookup_cached, store_cached
+from tools.usage import record_usage, count_tokens
+from tools.rate_limit import rate_limited_call
+from tools.mock_llm import mock_llm
+from tools.tracing import span, record_span
+
+# Load API keys
+from dotenv import load_dotenv
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+HF_API_KEY = os.getenv("HF_API_KEY")
+
+# Connection pool settings shared by every LLM call of the application
+OPENAI_MODEL = "gpt-4o"
+HF_MODEL = "codellama/CodeLlama-34b-Instruct-hf"
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "600"))
+# Completion tokens reserved in the tokens-per-minute budget when max_tokens is not set
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "1024"))
+# "openai" calls the providers; "mock" answers locally with tools/mock_llm.py (offline benchmarks)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+# Async clients are bound to the event loop they were created in. Jobs and scripts
+# run each step in a fresh loop (asyncio.run), so one client is kept per loop and
+# closed before the loop ends (see close_clients).
+_openai_clients = weakref.WeakKeyDictionary()
+_hf_clients = weakref.WeakKeyDictionary()
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Return the shared async OpenAI client of the running event loop.
+
+    The client keeps its HTTP connections alive in a bounded pool, so concurrent
+    calls reuse connections instead of opening a new one per request. Its own
+    retries are disabled: retries go through the shared rate limiter.
+
+    Returns:
+        AsyncOpenAI: The pooled client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _openai_clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=REQUEST_TIMEOUT,
+        )
+        client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, max_retries=0)
+        _openai_clients[loop] = client
+    return client
+
+
+def get_hf_client() -> AsyncInferenceClient:
+    """
+    Return the shared async HuggingFace inference client of the running event loop.
+
+    Returns:
+        AsyncInferenceClient: The shared client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _hf_clients.get(loop)
+    if client is None:
+        client = AsyncInferenceClient(token=HF_API_KEY)
+        _hf_clients[loop] = client
+    return client
+
+
+async def close_clients():
+    """
+    Close the clients of the running event loop, releasing their connection pools.
+    Call it before a loop that made LLM calls ends.
+    """
+    loop = asyncio.get_running_loop()
+    openai_client = _openai_clients.pop(loop, None)
+    hf_client = _hf_clients.pop(loop, None)
+    if openai_client is not None:
+        await openai_client.close()
+    if hf_client is not None:
+        await hf_client.close()
+
+
+def run_with_clients(coroutine):
+    """
+    Run a coroutine in a new event loop (asyncio.run), closing the loop's LLM clients
+    before it ends.
+    """
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await close_clients()
+
+    return asyncio.run(main())
+
+
+def set_llm_backend(backend: str):
+    """
+    Select the backend of every LLM call: "openai" (the providers) or "mock".
+    """
+    global LLM_BACKEND
+    if backend not in ("openai", "mock"):
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    LLM_BACKEND = backend
+
+
+def cache_model(model: str) -> str:
+    """
+    Model name used in cache keys, so mock responses never answer real requests.
+    """
+    return f"mock/{model}" if LLM_BACKEND == "mock" else model
+
+
+def estimate_request_tokens(prompt: str, max_tokens: int = None) -> int:
+    """
+    Estimate the tokens a request takes from the tokens-per-minute budget.
+
+    Args:
+        prompt: Full prompt text (system and user).
+        max_tokens: Maximum completion tokens of the request, if set.
+
+    Returns:
+        int: Prompt tokens plus the expected completion tokens.
+    """
+    return count_tokens(prompt) + (max_tokens or COMPLETION_TOKENS_ESTIMATE)
+
+
+async def chat_completion(prompt: str, system_prompt: str = "You are a code generator.",
+                          model: str = OPENAI_MODEL, **params):
+    """
+    Run a chat completion on the shared OpenAI client without blocking the event loop.
+
+    Responses are served from the persistent response cache when the same request
+    was made before (see tools/cache.py). With the "mock" backend the request is
+    answered by the local stand-in instead (see tools/mock_llm.py). Requests go through the shared rate limiter,
+    which retries rate limits and transient errors (see tools/rate_limit.py). Token
+    usage and cost of the call are recorded in the active usage scopes (see tools/usage.py).
+
+    Args:
+        prompt: The user prompt.
+        system_prompt: The system prompt.
+        model: The OpenAI model name.
+        **params: Extra sampling parameters passed to the API (e.g. temperature).
+
+    Returns:
+        The OpenAI completion object.
+
+    Raises:
+        openai.OpenAIError: If the request still fails after the retries.
+    """
+    async def request():
+        with span("llm.network", model, backend=LLM_BACKEND):
+            if LLM_BACKEND == "mock":
+                response = await mock_llm.complete(model, system_prompt, prompt, params)
+                return response, None, response["usage"]["total_tokens"]
+            raw = await get_openai_client().chat.completions.with_raw_response.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                **params
+            )
+        with span("llm.parse", model):
+            completion = raw.parse()
+            return completion.model_dump(), raw.headers, completion.usage.total_tokens if completion.usage else None
+
+    async def call():
+        return await rate_limited_call(
+            request, estimate_request_tokens(f"{system_prompt}\n{prompt}", params.get("max_tokens"))
+        )
+
+    with span("llm.call", model) as attributes:
+        response, from_cache = await cached_call(cache_model(model), system_prompt, prompt, params, call)
+        attributes["from_cache"] = from_cache
+    completion = ChatCompletion.model_validate(response)
+    record_usage(
+        model, response.get("usage"), f"{system_prompt}\n{prompt}",
+        completion.choices[0].message.content or "", from_cache=from_cache
+    )
+    return completion
+
+
+async def chat_completion_stream(prompt: str, system_prompt: str = "You are a code generator.",
+                                 model: str = OPENAI_MODEL, **params):
+    """
+    Stream a chat completion from the shared OpenAI client, yielding text as it arrives.
+
+    The full completion is stored in the response cache once the stream ends, and a
+    cached response is yielded in a single piece.
+
+    Args:
+        prompt: The user prompt.
+        system_prompt: The system prompt.
+        model: The OpenAI model name.
+        **params: Extra sampling parameters passed to the API (e.g. temperature).
+
+    Yields:
+        str: Successive pieces of the generated text.
+    """
+    key, cached = await lookup_cached(cache_model(model), system_prompt, prompt, params)
+    if cached is not None:
+        content = ChatCompletion.model_validate(cached).choices[0].message.content or ""
+        record_usage(model, cached.get("usage"), f"{system_prompt}\n{prompt}", content, from_cache=True)
+        yield content
+        return
+
+    async def request():
+        # Opening the stream: time to the response headers
+        with span("llm.network", model, backend=LLM_BACKEND, stream=True):
+            if LLM_BACKEND == "mock":
+                return await mock_llm.open_stream(model, system_prompt, prompt, params), None, None
+            raw = await get_openai_client().chat.completions.with_raw_response.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                stream=True,
+                stream_options={"include_usage": True},
+                **params
+            )
+            return raw.parse(), raw.headers, None
+
+    # Only opening the stream is retried; the in-flight slot is held until it ends.
+    # Spans around the yields are recorded by hand so they do not enclose the consumer's.
+    call_start = time.perf_counter()
+    stream, release = await rate_limited_call(
+        request, estimate_request_tokens(f"{system_prompt}\n{prompt}", params.get("max_tokens")), hold=True
+    )
+    stream_start = time.perf_counter()
+    parts, usage, completion_id, finish_reason = [], None, "", "stop"
+    try:
+        async for chunk in stream:
+            completion_id = chunk.id or completion_id
+            if chunk.usage is not None:
+                usage = chunk.usage.model_dump()
+            if chunk.choices:
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    finally:
+        release(usage.get("total_tokens") if usage else None)
+        end = time.perf_counter()
+        record_span(model, "llm.stream", stream_start, end)
+        record_span(model, "llm.call", call_start, end, from_cache=False, stream=True)
+
+    record_usage(model, usage, f"{system_prompt}\n{prompt}", "".join(parts))
+
+    # Cache the stream as a regular completion so both entry points share entries
+    await store_cached(key, {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": finish_reason,
+            "message": {"role": "assistant", "content": "".join(parts)},
+        }],
+        "usage": usage,
+    })
+
+
+async def hf_generation(prompt: str, model: str = HF_MODEL, parameters: dict = None) -> dict:
+    """
+    Run a text generation on the shared HuggingFace client.
+
+    Args:
+        prompt: The prompt.
+        model: The HuggingFace model id.
+        parameters: Generation parameters (e.g. max_new_tokens).
+
+    Returns:
+        dict: The raw response, with the text under 'generated_text'.
+    """
+    async def request():
+        with span("llm.network", model, backend=LLM_BACKEND):
+            if LLM_BACKEND == "mock":
+                return await mock_llm.generate(model, prompt, parameters), None, None
+            generated_text = await get_hf_client().text_generation(prompt, model=model, **(parameters or {}))
+            return {"generated_text": generated_text}, None, None
+
+    async def call():
+        return await rate_limited_call(
+            request, estimate_request_tokens(prompt, (parameters or {}).get("max_new_tokens"))
+        )
+
+    with span("llm.call", model) as attributes:
+        response, from_cache = await cached_call(cache_model(model), "", prompt, parameters, call)
+        attributes["from_cache"] = from_cache
+    # The inference API reports no usage; count tokens offline
+    record_usage(model, None, prompt, response.get("generated_text", ""), from_cache=from_cache)
+    return response
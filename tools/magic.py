@@ -1,44 +1,46 @@
 import os
 import pandas as pd
 import asyncio
-from huggingface_hub import AsyncInferenceClient
-from openai import OpenAI
 import json
 import re
+import ast
+import time
 import logging
 
-import logging
-import os
-# Set the base folder for the generated project
-current_directory = os.getcwd()
-project_name = "generated"
-path_project = os.path.join(current_directory, project_name)
-os.makedirs(path_project, exist_ok=True)  # Ensure the folder exists
-# Set up logging
-log_file_path = os.path.join(path_project, "generation.log")
-# Set up logging
+from tools.workspace import WorkspaceLogHandler, current_workspace
+
+# Set up logging: records go to the log file of the current workspace (see tools.workspace)
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
     handlers=[
         logging.StreamHandler(),  # Log to console
-        logging.FileHandler(log_file_path, mode="a"),  # Append to the shared log file
+        WorkspaceLogHandler(),  # Log to the workspace's log file (flushed after each record)
     ],
 )
 
-# Flush log file after each logging call
-for handler in logging.getLogger().handlers:
-    if isinstance(handler, logging.FileHandler):
-        handler.flush()
-
-# Load API keys
-from dotenv import load_dotenv
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-HF_API_KEY = os.getenv("HF_API_KEY")
-
-client_hf = AsyncInferenceClient(HF_API_KEY)
-client_openai = OpenAI(api_key=OPENAI_API_KEY)
+# Shared async LLM clients (pooled, non-blocking)
+from tools.llm import chat_completion, chat_completion_stream, hf_generation
+from tools.usage import track_usage, start_usage_run, add_usage, usage_metrics, count_tokens
+from tools.tracing import span, traced
+from tools.routing import routed_call, escalates, record_verdict
+from tools.journal import RunJournal, JournalScope
+from tools.persistence import file_writer
+from tools.static_check import check_compatibility, strip_js, js_balanced
+from tools.dependency_graph import is_directory, reference_graph, related_files
+
+# Minimum delay between two partial writes of a streamed file (seconds)
+STREAM_WRITE_INTERVAL = float(os.getenv("STREAM_WRITE_INTERVAL", "0.5"))
+# Maximum prompt tokens of a batched validation request
+VALIDATION_TOKEN_BUDGET = int(os.getenv("VALIDATION_TOKEN_BUDGET", "16000"))
+
+# Edit blocks the validator returns in "patch" correction mode
+EDIT_BLOCK_PATTERN = re.compile(r"<<<<<<< SEARCH\n(.*?)\n?=======\n(.*?)\n?>>>>>>> REPLACE", re.DOTALL)
+EDIT_FORMAT_INSTRUCTIONS = (
+    "Give each edit as a block of the form:\n"
+    "<<<<<<< SEARCH\n<exact lines of the current main code>\n=======\n<replacement lines>\n>>>>>>> REPLACE\n"
+    "Each SEARCH part must match the main code exactly, once. Only include the lines that change. "
+)
 
 # --- See-Saw Mechanism Functions ---
 
@@ -48,54 +50,58 @@ async def generate_main_or_dependency_old(prompt: str, use_openai=True) -> str:
     """
     try:
         if use_openai:
-            completion = client_openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a code generator."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            completion = await chat_completion(prompt, system_prompt="You are a code generator.")
             return completion.choices[0].message.content.strip()
         else:
-            response = await client_hf.post(
-                model="codellama/CodeLlama-34b-Instruct-hf",
-                inputs=prompt,
-                parameters={"max_new_tokens": 512, "return_full_text": False},
+            response = await hf_generation(
+                prompt, parameters={"max_new_tokens": 512, "return_full_text": False}
             )
             return response.get("generated_text", "").strip()
     except Exception as e:
         logging.error(f"Error generating code: {e}")
         return f"Error: {e}"
 
-async def generate_main_or_dependency(prompt: str, use_openai=True) -> str:
+async def generate_main_or_dependency(prompt: str, use_openai=True, on_chunk=None, role: str = "dependency") -> str:
     """
     Generate code using the preferred API (OpenAI or HuggingFace) based on the prompt.
+
+    When `on_chunk` is given (OpenAI only), the completion is streamed and `on_chunk`
+    is called with every new piece of text as it arrives. The model is the one the
+    call's `role` is routed to (see tools.routing). Errors that persist after the
+    rate limiter's retries are raised.
     """
     global token_usage  # Add a global token usage tracker
     try:
-        if use_openai:
-            completion = client_openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a code generator."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+        if use_openai and on_chunk is not None:
+            parts = []
+            with routed_call(role) as model:
+                stream = chat_completion_stream(prompt, system_prompt="You are a code generator.", model=model)
+                try:
+                    async for delta in stream:
+                        parts.append(delta)
+                        on_chunk(delta)
+                finally:
+                    # Close the stream now (not at garbage collection) to free its rate-limiter slot
+                    await stream.aclose()
+            return "".join(parts).strip()
+        elif use_openai:
+            with routed_call(role) as model:
+                completion = await chat_completion(prompt, system_prompt="You are a code generator.", model=model)
             # Track token usage from OpenAI's response
             token_usage += completion.usage.total_tokens
             return completion.choices[0].message.content.strip()
         else:
-            response = await client_hf.post(
-                model="codellama/CodeLlama-34b-Instruct-hf",
-                inputs=prompt,
-                parameters={"max_new_tokens": 512, "return_full_text": False},
-            )
+            with routed_call(role, "hf") as model:
+                response = await hf_generation(
+                    prompt, model=model, parameters={"max_new_tokens": 512, "return_full_text": False}
+                )
             # Estimate token usage for Hugging Face (adjust as needed)
             token_usage += len(prompt.split()) + len(response.get("generated_text", "").split())
             return response.get("generated_text", "").strip()
     except Exception as e:
+        # Fail the call instead of returning the error message as generated code
         logging.error(f"Error generating code: {e}")
-        return f"Error: {e}"
+        raise
 
 
 
@@ -114,6 +120,7 @@ def extract_code_old(llm_output: str) -> str:
     return "\n\n".join(block.strip() for block in code_blocks if block.strip()) or "No valid code found."
 
 
+@traced("extract_code")
 def extract_code(llm_output: str) -> str:
     """
     Extract code from LLM output. If enclosed in triple backticks, strip them.
@@ -135,6 +142,56 @@ def extract_code(llm_output: str) -> str:
         return llm_output.strip()
 
 
+def extract_partial_code(llm_output: str) -> str:
+    """
+    Best-effort code extraction from an LLM output that is still being streamed.
+
+    Strips an opening triple-backtick fence and anything from the closing fence on.
+
+    Args:
+        llm_output (str): The LLM output received so far.
+
+    Returns:
+        str: The code received so far.
+    """
+    text = llm_output.lstrip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.split("```", 1)[0]
+    return text
+
+
+def make_stream_writer(path: str, write, on_progress=None, interval: float = STREAM_WRITE_INTERVAL):
+    """
+    Build an `on_chunk` callback that writes a file's partial content while it streams.
+
+    Args:
+        path: Project path of the file being generated.
+        write: Function (path, content) persisting the partial content.
+        on_progress: Optional function (path, content, done) reporting progress to the caller.
+        interval: Minimum delay between two writes, in seconds.
+
+    Returns:
+        callable: Callback taking each new piece of streamed text.
+    """
+    parts = []
+    last_write = 0.0
+
+    def on_chunk(delta: str):
+        nonlocal last_write
+        parts.append(delta)
+        now = time.monotonic()
+        if now - last_write < interval:
+            return
+        last_write = now
+        partial = extract_partial_code("".join(parts))
+        write(path, partial)
+        if on_progress:
+            on_progress(path, partial, False)
+
+    return on_chunk
+
+
 async def validator_function_old(main_code: str, dependency_code: str, original_description: str) -> (bool, str):
     """
     Validate compatibility of main code and dependency. Return True if compatible, else False with suggested main code.
@@ -157,33 +214,417 @@ async def validator_function_old(main_code: str, dependency_code: str, original_
     logging.warning(f"Validation response error: {response}")
     return False, f"Error in validation response: {response}"
 
-async def validator_function(main_code: str, dependency_code: str, original_description: str) -> (bool, str):
+def apply_edits(code: str, edits: str):
     """
-    Validate compatibility of main code and dependency. Return True if compatible, else False with suggested main code.
+    Apply SEARCH/REPLACE edit blocks to a code.
+
+    Args:
+        code: The code to patch.
+        edits: Text containing the edit blocks (see EDIT_BLOCK_PATTERN).
+
+    Returns:
+        str: The patched code, or None if there is no block or a SEARCH part does not
+            match the code exactly once. Line endings are matched regardless of CRLF/LF,
+            and a CRLF code stays CRLF.
     """
-    global dependency_checks, aligned_dependencies
-    dependency_checks += 1  # Increment the total checks
+    crlf = "\r\n" in code
+    code, edits = code.replace("\r\n", "\n"), edits.replace("\r\n", "\n")
+    blocks = EDIT_BLOCK_PATTERN.findall(edits)
+    if not blocks:
+        return None
+    for search, replace in blocks:
+        if not search.strip() or code.count(search) != 1:
+            return None
+        code = code.replace(search, replace, 1)
+    return code.replace("\n", "\r\n") if crlf else code
+
+
+def parse_rewrite(main_code: str, answer: str):
+    """
+    Read a patch-mode answer without edit blocks as a full rewrite of the main code.
+
+    Args:
+        main_code: The current main code.
+        answer: The correction returned by the validator.
+
+    Returns:
+        str: The rewritten main code, or None when the answer has edit markers or does
+            not look like code: for a Python main code it must parse and hold a statement
+            (not only expressions); otherwise it must be fenced and have balanced brackets.
+    """
+    if "<<<<<<< SEARCH" in answer or ">>>>>>> REPLACE" in answer:
+        return None
+    code = extract_code(answer)
+    if not code:
+        return None
+    try:
+        ast.parse(main_code)
+    except (SyntaxError, ValueError):
+        # Not Python: only a fenced, balanced answer is taken for code
+        return code if "```" in answer and js_balanced(strip_js(code)) else None
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    # A lone word or expression (e.g. "fixed") parses too but is no rewrite
+    return code if any(not isinstance(node, ast.Expr) for node in tree.body) else None
+
+
+def correction_metrics(corrections: list) -> dict:
+    """
+    Summarize the main code corrections recorded during an iteration.
+
+    Returns:
+        dict: 'corrections', 'patched_corrections', 'patch_fallbacks' and
+            'output_tokens_saved' (output tokens a full rewrite would have cost).
+    """
+    return {
+        "corrections": len(corrections),
+        "patched_corrections": sum(1 for correction in corrections if correction["patched"]),
+        "patch_fallbacks": sum(1 for correction in corrections if correction["fallback"]),
+        "output_tokens_saved": sum(correction["output_tokens_saved"] for correction in corrections),
+    }
+
+
+async def correct_main_code(main_code: str, answer: str, dependency_code: str, original_description: str,
+                            correction_mode: str = "rewrite", corrections: list = None) -> str:
+    """
+    Turn the correction part of a failed validation into the corrected main code.
+
+    In "rewrite" mode the answer is the corrected main code. In "patch" mode it is a
+    list of edit blocks applied locally. An answer without edit blocks that is itself
+    the corrected code (see parse_rewrite) is used as is; otherwise, when the edits do
+    not apply, the full corrected main code is requested instead.
+
+    Args:
+        main_code: The current main code.
+        answer: The correction returned by the validator.
+        dependency_code: Code of the dependencies the main code must be compatible with.
+        original_description: Original description of the main file.
+        correction_mode: "rewrite" or "patch".
+        corrections: Optional list the correction record is appended to (see correction_metrics).
+
+    Returns:
+        str: The corrected main code.
+    """
+    record = {"patched": False, "fallback": False, "output_tokens_saved": 0}
+    if corrections is not None:
+        corrections.append(record)
+    if correction_mode != "patch":
+        return answer
+
+    patched = apply_edits(main_code, answer)
+    if patched is not None:
+        record["patched"] = True
+        record["output_tokens_saved"] = count_tokens(patched) - count_tokens(answer)
+        return patched
+
+    rewritten = parse_rewrite(main_code, answer)
+    if rewritten is not None:
+        logging.info("Validator returned the full corrected main code instead of edits; using it.")
+        return rewritten
+
+    logging.warning("Validator edits do not apply to the main code; requesting a full rewrite.")
+    record["fallback"] = True
     prompt = (
         f"The following is the original project description:\n\n{original_description}\n\n"
         f"The following is the main code:\n\n{main_code}\n\n"
         f"The following is the dependency code:\n\n{dependency_code}\n\n"
-        "Check compatibility. Respond 'True' if compatible, or 'False' followed by the corrected main code."
+        "The main code is not compatible with the dependency code. Return the corrected main code."
+        "Ensure that the corrected main code adheres strictly to the original project description."
+        "Do not include comments or explanations. Only return the raw code content."
+    )
+    with track_usage() as fallback_usage:
+        corrected = extract_code(await generate_main_or_dependency(prompt, role="correction"))
+    # Both the unusable edits and the rewrite were paid for
+    record["output_tokens_saved"] = -count_tokens(answer) - fallback_usage["completion_tokens"]
+    return corrected
+
+
+def verdict_prompt(main_code: str, dependency_code: str, original_description: str) -> str:
+    """
+    Build the prompt asking only for the verdict of a single-dependency validation,
+    for the verdict tier when corrections are escalated (see validator_function).
+    """
+    return (
+        f"The following is the original project description:\n\n{original_description}\n\n"
+        f"The following is the main code:\n\n{main_code}\n\n"
+        f"The following is the dependency code:\n\n{dependency_code}\n\n"
+        "Check compatibility. Respond only 'True' if compatible or 'False' if not, without any code."
+    )
+
+
+def validation_prompt(main_code: str, dependency_code: str, original_description: str,
+                      correction_mode: str = "rewrite") -> str:
+    """
+    Build the prompt of a single-dependency validation (see validator_function).
+    """
+    if correction_mode == "patch":
+        correction_instructions = (
+            "Check compatibility. Respond 'True' if compatible, or 'False' followed by the edits that make "
+            "the main code compatible. " + EDIT_FORMAT_INSTRUCTIONS
+        )
+    else:
+        correction_instructions = (
+            "Check compatibility. Respond 'True' if compatible, or 'False' followed by the corrected main code."
+        )
+    return (
+        f"The following is the original project description:\n\n{original_description}\n\n"
+        f"The following is the main code:\n\n{main_code}\n\n"
+        f"The following is the dependency code:\n\n{dependency_code}\n\n"
+        f"{correction_instructions}"
         "Ensure that the corrected main code adheres strictly to the original project description."
         "Do not include comments or explanations, and do not wrap the code in triple backticks or any other delimiters."
         "Only return the raw code content."
     )
-    response = await generate_main_or_dependency(prompt)
+
+
+@traced("validator")
+async def validator_function(main_code: str, dependency_code: str, original_description: str,
+                             correction_mode: str = "rewrite", corrections: list = None) -> (bool, str):
+    """
+    Validate compatibility of main code and dependency. Return True if compatible, else False with suggested main code.
+
+    With `correction_mode="patch"` the validator answers with edits to the main code
+    instead of the whole corrected file (see correct_main_code).
+
+    When verdicts and corrections are routed to different tiers (see tools.routing),
+    the verdict tier only answers 'True' or 'False', and the correction tier is asked
+    for the full validation only after a 'False'.
+    """
+    global dependency_checks, aligned_dependencies
+    dependency_checks += 1  # Increment the total checks
+    prompt = validation_prompt(main_code, dependency_code, original_description, correction_mode)
+    if escalates():
+        verdict = await generate_main_or_dependency(
+            verdict_prompt(main_code, dependency_code, original_description), role="verdict"
+        )
+        record_verdict(escalated=not verdict.startswith("True"))
+        if verdict.startswith("True"):
+            aligned_dependencies += 1
+            return True, main_code
+        response = await generate_main_or_dependency(prompt, role="correction")
+    else:
+        response = await generate_main_or_dependency(prompt, role="verdict")
     if response.startswith("True"):
         aligned_dependencies += 1  # Increment aligned dependencies count
         return True, main_code
     elif response.startswith("False"):
-        corrected_code = response[5:].strip()
+        corrected_code = await correct_main_code(
+            main_code, response[5:].strip(), dependency_code, original_description, correction_mode, corrections
+        )
         return False, corrected_code
     logging.warning(f"Validation response error: {response}")
     return False, f"Error in validation response: {response}"
 
 
+def make_static_precheck(main_path: str, original_description: str, tree_paths: list,
+                         correction_mode: str = "rewrite"):
+    """
+    Build a `precheck` function that statically checks a dependency against the main
+    code (see check_compatibility) before the LLM validator is asked.
 
+    Args:
+        main_path: Tree path of the main file.
+        original_description: Original description of the main file.
+        tree_paths: All file paths of the project tree.
+        correction_mode: Correction mode of the validator, for the tokens saved.
+
+    Returns:
+        callable: Function (main_code, dep_path, dep_code, prechecks, batched=False)
+            returning True when the pair is proven compatible, so the validator can be
+            skipped. Each check is appended to `prechecks` with the validator tokens it
+            saved: the whole validation request, or the dependency's share of a batched one.
+    """
+    def precheck(main_code: str, dep_path: str, dep_code: str, prechecks: list, batched: bool = False) -> bool:
+        with span("static_check", dep_path) as attributes:
+            verdict, reason = check_compatibility(main_path, main_code, dep_path, dep_code, tree_paths)
+            attributes["verdict"] = verdict
+        tokens_saved = 0
+        if verdict:
+            if batched:
+                tokens_saved = count_tokens(f"### Dependency: {dep_path}\n{dep_code}\nVERDICT {dep_path}: True")
+            else:
+                prompt = validation_prompt(main_code, dep_code, original_description, correction_mode)
+                tokens_saved = count_tokens(prompt) + count_tokens("True")
+            logging.info(f"Static check of {dep_path}: {reason}; skipping the validator")
+        else:
+            logging.info(f"Static check of {dep_path} {'failed' if verdict is False else 'undecided'}: {reason}")
+        prechecks.append({"path": dep_path, "verdict": verdict, "reason": reason, "tokens_saved": tokens_saved})
+        return bool(verdict)
+
+    return precheck
+
+
+def precheck_metrics(prechecks: list) -> dict:
+    """
+    Summarize the static checks recorded during an iteration.
+
+    Returns:
+        dict: 'static_checks', 'static_skips' (validator calls avoided) and
+            'validator_tokens_saved'.
+    """
+    return {
+        "static_checks": len(prechecks),
+        "static_skips": sum(1 for check in prechecks if check["verdict"]),
+        "validator_tokens_saved": sum(check["tokens_saved"] for check in prechecks),
+    }
+
+
+async def validate_dependency(main_code: str, dep_path: str, dep_code: str, original_description: str,
+                              correction_mode: str = "rewrite", corrections: list = None, precheck=None,
+                              prechecks: list = None) -> (bool, str):
+    """
+    Validate a dependency against the main code, asking the LLM validator only when the
+    static `precheck` (see make_static_precheck) cannot prove the pair compatible.
+
+    Returns:
+        tuple: The verdict and the main code, corrected when incompatible.
+    """
+    if precheck is not None and precheck(main_code, dep_path, dep_code, prechecks if prechecks is not None else []):
+        return True, main_code
+    return await validator_function(main_code, dep_code, original_description, correction_mode, corrections)
+
+
+def make_validation_batches(main_code: str, dependencies: list, original_description: str,
+                            batch_size: int, token_budget: int = VALIDATION_TOKEN_BUDGET) -> list:
+    """
+    Group dependencies into validation batches.
+
+    A batch holds at most `batch_size` dependencies and, together with the main code and
+    the description, at most `token_budget` tokens. A dependency larger than the budget
+    gets a batch of its own.
+
+    Args:
+        main_code: The main code the dependencies are validated against.
+        dependencies: (path, code) pairs, in project tree order.
+        original_description: Original description of the main file.
+        batch_size: Maximum number of dependencies per batch.
+        token_budget: Maximum number of prompt tokens per batch.
+
+    Returns:
+        list: Lists of (path, code) pairs.
+    """
+    base_tokens = count_tokens(main_code) + count_tokens(original_description)
+    batches, batch, batch_tokens = [], [], base_tokens
+    for path, code in dependencies:
+        tokens = count_tokens(code)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > token_budget):
+            batches.append(batch)
+            batch, batch_tokens = [], base_tokens
+        batch.append((path, code))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_batch_verdicts(response: str, paths: list, marker: str = "MAIN CODE:"):
+    """
+    Parse the answer of a batched validation request.
+
+    Args:
+        response: The LLM answer: one 'VERDICT <path>: True|False' line per dependency,
+            then `marker` and the main code correction if any verdict is False.
+        paths: Paths of the validated dependencies.
+        marker: Line introducing the correction ('MAIN CODE:' or 'MAIN EDITS:').
+
+    Returns:
+        tuple: Mapping of path to verdict and the correction (None when every
+            dependency is compatible), or (None, None) if the answer is incomplete.
+    """
+    verdicts = {}
+    for path, verdict in re.findall(r"^\s*VERDICT\s+(.+?)\s*:\s*(True|False)\b", response, re.MULTILINE):
+        verdicts[path.strip().strip("`'\"")] = verdict == "True"
+    if any(path not in verdicts for path in paths):
+        return None, None
+    verdicts = {path: verdicts[path] for path in paths}
+    if all(verdicts.values()):
+        return verdicts, None
+    _, found, correction = response.partition(marker)
+    correction = correction.strip() if found else ""
+    if not correction:
+        return None, None
+    return verdicts, correction
+
+
+@traced("validator")
+async def batch_validator_function(main_code: str, dependencies: list, original_description: str,
+                                   correction_mode: str = "rewrite", corrections: list = None):
+    """
+    Validate a main code against several dependencies in a single request.
+
+    When verdicts and corrections are routed to different tiers (see tools.routing),
+    the verdict tier answers the verdict lines alone, and the full request goes to the
+    correction tier only when a dependency is found incompatible.
+
+    Args:
+        main_code: The main code.
+        dependencies: (path, code) pairs of the dependencies.
+        original_description: Original description of the main file.
+        correction_mode: "rewrite" for a full corrected main code, "patch" for edits
+            (see correct_main_code).
+        corrections: Optional list the correction record is appended to.
+
+    Returns:
+        tuple: Mapping of path to verdict (None if the answer could not be parsed) and
+            the main code, corrected for every incompatible dependency.
+    """
+    dependency_code = "\n\n".join(f"### Dependency: {path}\n{code}" for path, code in dependencies)
+    if correction_mode == "patch":
+        marker = "MAIN EDITS:"
+        correction_instructions = (
+            "If any dependency is incompatible, add a line 'MAIN EDITS:' followed by the edits that make the "
+            "main code compatible with all the dependencies above. " + EDIT_FORMAT_INSTRUCTIONS
+        )
+    else:
+        marker = "MAIN CODE:"
+        correction_instructions = (
+            "If any dependency is incompatible, add a line 'MAIN CODE:' followed by the corrected main code, "
+            "compatible with all the dependencies above."
+        )
+    prompt = (
+        f"The following is the original project description:\n\n{original_description}\n\n"
+        f"The following is the main code:\n\n{main_code}\n\n"
+        f"The following are the dependencies:\n\n{dependency_code}\n\n"
+        "Check the compatibility of the main code with each dependency. For each dependency, in the order "
+        "given, answer with one line 'VERDICT <path>: True' if compatible or 'VERDICT <path>: False' if not. "
+        f"{correction_instructions}"
+        "Ensure that the corrected main code adheres strictly to the original project description."
+        "Do not include comments or explanations, and do not wrap the code in triple backticks or any other delimiters."
+    )
+    paths = [path for path, _ in dependencies]
+    if escalates():
+        # The verdict tier decides alone; any 'False' (or an unusable answer) goes to the correction tier
+        verdict_answer = await generate_main_or_dependency(
+            f"The following is the original project description:\n\n{original_description}\n\n"
+            f"The following is the main code:\n\n{main_code}\n\n"
+            f"The following are the dependencies:\n\n{dependency_code}\n\n"
+            "Check the compatibility of the main code with each dependency. For each dependency, in the order "
+            "given, answer with one line 'VERDICT <path>: True' if compatible or 'VERDICT <path>: False' if not. "
+            "Do not include any code.",
+            role="verdict",
+        )
+        verdicts, _ = parse_batch_verdicts(verdict_answer, paths, marker)
+        compatible = verdicts is not None and all(verdicts.values())
+        record_verdict(escalated=not compatible)
+        if compatible:
+            return verdicts, main_code
+        response = await generate_main_or_dependency(prompt, role="correction")
+    else:
+        response = await generate_main_or_dependency(prompt, role="verdict")
+    verdicts, correction = parse_batch_verdicts(response, paths, marker)
+    if verdicts is None:
+        logging.warning(f"Batch validation response error: {response[:200]}")
+        return None, main_code
+    if correction is None:
+        return verdicts, main_code
+    if correction_mode != "patch":
+        correction = extract_code(correction)
+    corrected = await correct_main_code(
+        main_code, correction, dependency_code, original_description, correction_mode, corrections
+    )
+    return verdicts, corrected
 
 
 async def see_saw_mechanism_old(project_tree: list):
@@ -407,109 +848,650 @@ async def see_saw_mechanism_new1(project_tree: list):
 import time
 import logging
 
-async def see_saw_mechanism(project_tree: list):
+def write_partial_file(path: str, content: str):
     """
-    Implement the See-Saw mechanism for generating main and dependency files.
+    Write the partial content of a file that is still being streamed.
     """
-    # Initialize metrics
-    global token_usage, dependency_checks, aligned_dependencies
-    token_usage = 0
-    dependency_checks = 0
-    aligned_dependencies = 0
+    save_generated_files({path: content}, log=False)
 
-    generated_files = {}
-    original_descriptions = {item['path']: item['description'] for item in project_tree}
-    iteration_metrics = []  # List to store metrics for each iteration
 
-    # Start timing the process
-    start_time = time.time()
+def publish_file(path: str, content: str, on_progress=None):
+    """
+    Save a finished (or corrected) file as soon as it is ready, so an interrupted run
+    keeps it, and report it as done.
+    """
+    save_generated_files({path: content})
+    if on_progress:
+        on_progress(path, content, True)
 
-    iteration = 1  # Initialize iteration counter
 
-    for item in project_tree:
-        path, description = item['path'], item['description']
+async def generate_dependency(main_code: str, dep: dict, stream: bool = False, on_progress=None,
+                              journal: JournalScope = None) -> str:
+    """
+    Generate the code of a single dependency against a main code.
 
-        if "main" in description.lower():
-            logging.info(f"Generating main file: {path}")
+    Args:
+        main_code: The main code the dependency is generated against.
+        dep: Project tree entry of the dependency.
+        stream: Whether to stream the dependency to disk while it is generated.
+        on_progress: Optional function (path, content, done) reporting streaming progress.
+        journal: Optional journal scope of the main file. A dependency it already holds
+            is reused instead of generated again; a new one is recorded in it.
+
+    Returns:
+        str: The dependency code.
+    """
+    dep_path, dep_desc = dep['path'], dep['description']
+    if journal is not None:
+        dep_code = journal.generated(dep_path)
+        if dep_code is not None:
+            logging.info(f"Reusing the journaled code of {dep_path}")
+            return dep_code
+    logging.info(f"Generating dependency: {dep_path}")
+    dep_prompt = (
+        f"This is the main code:\n\n{main_code}\n\n"
+        f"Generate the dependency code for the file '{dep_path}':\n{dep_desc}\n\n"
+        "Do not include comments or explanations. Only return the raw code content."
+    )
+    on_chunk = make_stream_writer(dep_path, write_partial_file, on_progress) if stream else None
+    dep_code = await generate_main_or_dependency(dep_prompt, on_chunk=on_chunk, role="dependency")
+    dep_code = extract_code(dep_code)
+    publish_file(dep_path, dep_code, on_progress)
+    if journal is not None:
+        journal.record_file(dep_path, dep_code)
+    return dep_code
+
+
+async def generate_and_validate_dependency(main_code: str, dep: dict, original_description: str,
+                                           semaphore: asyncio.Semaphore, stream: bool = False,
+                                           on_progress=None, correction_mode: str = "rewrite",
+                                           journal: JournalScope = None, precheck=None) -> dict:
+    """
+    Generate a single dependency against a fixed main code and validate it.
+
+    Args:
+        main_code: The main code the dependency is generated and validated against.
+        dep: Project tree entry of the dependency.
+        original_description: Original description of the main file.
+        semaphore: Semaphore bounding the number of dependencies processed at once.
+        stream: Whether to stream the dependency to disk while it is generated.
+        on_progress: Optional function (path, content, done) reporting streaming progress.
+        correction_mode: "rewrite" or "patch" main code corrections (see correct_main_code).
+        journal: Optional journal scope of the main file (see generate_dependency).
+        precheck: Optional static check run before the validator (see make_static_precheck).
+
+    Returns:
+        dict: Dependency code, validator verdict, suggested main code, main code
+            corrections, static checks and iteration metrics.
+    """
+    dep_path = dep['path']
+    corrections = []
+    prechecks = []
+    async with semaphore:
+        iteration_start = time.perf_counter()
+        with track_usage() as dep_usage:
+            dep_code = await generate_dependency(main_code, dep, stream, on_progress, journal)
+            is_valid, updated_main_code = await validate_dependency(
+                main_code, dep_path, dep_code, original_description, correction_mode, corrections, precheck,
+                prechecks
+            )
+        logging.info(f"token_usage_dep: {dep_usage['total_tokens']}")
+
+    return {
+        "path": dep_path,
+        "code": dep_code,
+        "is_valid": is_valid,
+        "updated_main_code": updated_main_code,
+        "corrections": corrections,
+        "prechecks": prechecks,
+        "usage": dep_usage,
+        "execution_time": time.perf_counter() - iteration_start,
+    }
+
+
+async def saw_dependencies_concurrently(main_code: str, dependencies: list, original_description: str,
+                                        concurrency: int, state: dict, stream: bool = False, on_progress=None,
+                                        correction_mode: str = "rewrite", journal: JournalScope = None,
+                                        precheck=None):
+    """
+    Run the Saw phase for all dependencies of a main file in parallel.
+
+    Every dependency is generated and validated against the same main code, so the
+    wall-clock time follows the slowest dependency. The verdicts are then reconciled
+    into the main code in project tree order: the first correction is applied as-is,
+    and any later dependency that also failed is validated again against the already
+    corrected main code before its correction is applied.
+
+    Args:
+        main_code: The main code generated in the See phase.
+        dependencies: Project tree entries of the dependencies.
+        original_description: Original description of the main file.
+        concurrency: Maximum number of dependencies processed at once.
+        state: State of the main file's loop; its 'dependency_checks' and
+            'aligned_dependencies' counters are updated.
+        stream: Whether to stream each dependency to disk while it is generated.
+        on_progress: Optional function (path, content, done) reporting streaming progress.
+        correction_mode: "rewrite" or "patch" main code corrections (see correct_main_code).
+        journal: Optional journal scope of the main file; each reconciled dependency is
+            recorded with its verdict (after the main revision it caused).
+        precheck: Optional static check run before each validation (see make_static_precheck).
+
+    Returns:
+        tuple: The reconciled main code and the list of per-dependency results (with
+            their iteration 'metric'), in tree order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = await asyncio.gather(
+        *[generate_and_validate_dependency(main_code, dep, original_description, semaphore, stream, on_progress,
+                                           correction_mode, journal, precheck)
+          for dep in dependencies],
+        return_exceptions=True,
+    )
+
+    base_main_code = main_code
+    reconciled = []
+    for dep, result in zip(dependencies, results):
+        if isinstance(result, Exception):
+            logging.error(f"Error generating code for {dep['path']}: {result}")
+            continue
+
+        state["dependency_checks"] += 1
+        if not result["is_valid"] and main_code != base_main_code:
+            # The main code was already corrected for an earlier dependency; check again against it
+            recheck_start = time.perf_counter()
+            with track_usage() as recheck_usage:
+                try:
+                    result["is_valid"], result["updated_main_code"] = await validate_dependency(
+                        main_code, result["path"], result["code"], original_description, correction_mode,
+                        result["corrections"], precheck, result["prechecks"]
+                    )
+                except Exception as e:
+                    # Keep the corrected main code as it is
+                    logging.error(f"Error validating {result['path']} again: {e}")
+                    result["is_valid"], result["updated_main_code"] = False, main_code
+            add_usage(result["usage"], recheck_usage)
+            result["execution_time"] += time.perf_counter() - recheck_start
+
+        if result["is_valid"]:
+            state["aligned_dependencies"] += 1
+            logging.info(f"Dependency {result['path']} validated successfully without updating main code.")
+        else:
+            logging.warning(f"Main code updated for compatibility with {result['path']}")
+            main_code = result["updated_main_code"]
+        result["metric"] = {
+            "type": "dependency",
+            **usage_metrics(result["usage"]),
+            **correction_metrics(result["corrections"]),
+            **precheck_metrics(result["prechecks"]),
+            "execution_time": result["execution_time"]
+        }
+        if journal is not None:
+            if not result["is_valid"]:
+                journal.record_revision(main_code)
+            journal.record_verdicts({result["path"]: result["is_valid"]}, [result["metric"]])
+        reconciled.append(result)
+
+    return main_code, reconciled
+
+
+async def saw_dependencies_in_batches(main_code: str, dependencies: list, original_description: str,
+                                      concurrency: int, batch_size: int, token_budget: int, state: dict,
+                                      stream: bool = False, on_progress=None, correction_mode: str = "rewrite",
+                                      journal: JournalScope = None, precheck=None):
+    """
+    Run the Saw phase of a main file with batched validation.
+
+    Dependencies are processed in chunks of `batch_size`: the chunk is generated against
+    the current main code (up to `concurrency` at once), then validated with one request
+    per batch (see `make_validation_batches`) instead of one per dependency. A batch's
+    consolidated main revision is used for the next batches and chunks. If a batch answer
+    cannot be parsed, its dependencies are validated one by one. Dependencies the static
+    `precheck` proves compatible are left out of the batches.
+
+    Args:
+        main_code: The main code generated in the See phase.
+        dependencies: Project tree entries of the dependencies.
+        original_description: Original description of the main file.
+        concurrency: Maximum number of dependencies generated at once (None or 0 for one).
+        batch_size: Maximum number of dependencies validated per request.
+        token_budget: Maximum number of prompt tokens per validation request.
+        state: State of the main file's loop; its 'dependency_checks' and
+            'aligned_dependencies' counters are updated.
+        stream: Whether to stream each dependency to disk while it is generated.
+        on_progress: Optional function (path, content, done) reporting streaming progress.
+        correction_mode: "rewrite" or "patch" main code corrections (see correct_main_code).
+        journal: Optional journal scope of the main file; each validated batch is recorded
+            with its verdicts (after the main revision it caused).
+        precheck: Optional static check run before the validation (see make_static_precheck).
+
+    Returns:
+        tuple: The final main code, the generated dependencies (path to code) and the
+            iteration metrics ('dependency' and 'validation' entries, in order).
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or 1))
+    files = {}
+    iterations = []
+    dep_metrics = {}  # path -> generation metrics, journaled with the batch verdicts
+
+    async def generate(dep):
+        async with semaphore:
+            iteration_start = time.perf_counter()
+            with track_usage() as dep_usage:
+                dep_code = await generate_dependency(main_code, dep, stream, on_progress, journal)
+            return dep_code, dep_usage, time.perf_counter() - iteration_start
+
+    for start in range(0, len(dependencies), batch_size):
+        chunk = dependencies[start:start + batch_size]
+        outcomes = await asyncio.gather(*[generate(dep) for dep in chunk], return_exceptions=True)
+        generated = []
+        static_verdicts = {}  # Dependencies proven compatible without the validator
+        for dep, outcome in zip(chunk, outcomes):
+            if isinstance(outcome, Exception):
+                logging.error(f"Error generating code for {dep['path']}: {outcome}")
+                continue
+            dep_code, dep_usage, execution_time = outcome
+            files[dep['path']] = dep_code
+            prechecks = []
+            if precheck is not None and precheck(main_code, dep['path'], dep_code, prechecks, batched=True):
+                static_verdicts[dep['path']] = True
+            else:
+                generated.append((dep['path'], dep_code))
+            dep_metrics[dep['path']] = {"type": "dependency", **usage_metrics(dep_usage),
+                                        **precheck_metrics(prechecks), "execution_time": execution_time}
+            iterations.append(dep_metrics[dep['path']])
+
+        if static_verdicts:
+            state["dependency_checks"] += len(static_verdicts)
+            state["aligned_dependencies"] += len(static_verdicts)
+            if journal is not None:
+                journal.record_verdicts(static_verdicts, [dep_metrics[dep_path] for dep_path in static_verdicts])
+
+        for batch in make_validation_batches(main_code, generated, original_description, batch_size, token_budget):
+            validation_start = time.perf_counter()
+            corrections = []
             try:
-                main_prompt = (
-                    f"Generate the main file for the project:\n{description}\n\n"
-                    "Do not include comments or explanations. Only return the raw code content."
-                )
-                iteration_start = time.time()  # Start iteration timing
-                main_code = await generate_main_or_dependency(main_prompt)
+                with track_usage() as validation_usage:
+                    verdicts, updated_main_code = await batch_validator_function(
+                        main_code, batch, original_description, correction_mode, corrections
+                    )
+                    if verdicts is None:
+                        verdicts, updated_main_code = {}, main_code
+                        for dep_path, dep_code in batch:
+                            verdicts[dep_path], corrected = await validator_function(
+                                updated_main_code, dep_code, original_description, correction_mode, corrections
+                            )
+                            if not verdicts[dep_path]:
+                                updated_main_code = corrected
+            except Exception as e:
+                logging.error(f"Error validating {[dep_path for dep_path, _ in batch]}: {e}")
+                continue
+            logging.info(f"token_usage_validation: {validation_usage['total_tokens']} for {len(batch)} dependencies")
 
-                # Track token usage
-                token_usage_main = len(main_code.split())
-                logging.info(f"token_usage_main: {token_usage_main}")
-                main_code = extract_code(main_code)
-                generated_files[path] = main_code
+            state["dependency_checks"] += len(batch)
+            state["aligned_dependencies"] += sum(verdicts.values())
+            for dep_path, is_valid in verdicts.items():
+                if is_valid:
+                    logging.info(f"Dependency {dep_path} validated successfully without updating main code.")
+                else:
+                    logging.warning(f"Main code updated for compatibility with {dep_path}")
+            revised = updated_main_code != main_code
+            main_code = updated_main_code
+            iterations.append({
+                "type": "validation",
+                **usage_metrics(validation_usage),
+                **correction_metrics(corrections),
+                "execution_time": time.perf_counter() - validation_start
+            })
+            if journal is not None:
+                if revised:
+                    journal.record_revision(main_code)
+                journal.record_verdicts(verdicts, [dep_metrics[dep_path] for dep_path, _ in batch] + [iterations[-1]])
+
+    return main_code, files, iterations
+
+
+async def generate_unvalidated_dependencies(main_code: str, dependencies: list, concurrency: int = None,
+                                           stream: bool = False, on_progress=None, journal: JournalScope = None):
+    """
+    Generate dependencies against the main code without validating them.
+
+    Args:
+        main_code: The main code the dependencies are generated against.
+        dependencies: Project tree entries of the dependencies.
+        concurrency: Maximum number of dependencies generated at once (None or 0 for one).
+        stream: Whether to stream each dependency to disk while it is generated.
+        on_progress: Optional function (path, content, done) reporting streaming progress.
+        journal: Optional journal scope of the main file (see generate_dependency).
+
+    Returns:
+        tuple: The generated dependencies (path to code) and their iteration metrics,
+            marked as 'pruned' from validation.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or 1))
+
+    async def generate(dep):
+        async with semaphore:
+            iteration_start = time.perf_counter()
+            with track_usage() as dep_usage:
+                dep_code = await generate_dependency(main_code, dep, stream, on_progress, journal)
+            return dep_code, {"type": "dependency", **usage_metrics(dep_usage), "pruned": True,
+                              "execution_time": time.perf_counter() - iteration_start}
+
+    files, iterations = {}, []
+    outcomes = await asyncio.gather(*[generate(dep) for dep in dependencies], return_exceptions=True)
+    for dep, outcome in zip(dependencies, outcomes):
+        if isinstance(outcome, Exception):
+            logging.error(f"Error generating code for {dep['path']}: {outcome}")
+            continue
+        files[dep['path']], metric = outcome
+        iterations.append(metric)
+    return files, iterations
+
+
+async def see_saw_main_file(item: dict, project_tree: list, concurrency: int = None, stream: bool = False,
+                            on_progress=None, validation_batch_size: int = None,
+                            validation_token_budget: int = None, correction_mode: str = "rewrite",
+                            journal: RunJournal = None, static_check: bool = False,
+                            validation_depth: int = None) -> dict:
+    """
+    Run the See and Saw phases of a single main file with its own isolated state.
+
+    Args:
+        item: Project tree entry of the main file.
+        project_tree: The whole project tree (every other entry is a dependency).
+        concurrency: Maximum number of dependencies generated and validated at once.
+            When None or 0, dependencies are processed one after another.
+        stream: Whether to stream files to disk while they are generated.
+        on_progress: Optional function (path, content, done) called with streaming progress.
+        validation_batch_size: Number of dependencies validated per request. When None,
+            0 or 1, each dependency is validated with its own request.
+        validation_token_budget: Maximum prompt tokens of a batched validation request
+            (None or 0 for VALIDATION_TOKEN_BUDGET).
+        correction_mode: "rewrite" to have the validator return the whole corrected main
+            code, "patch" to have it return edits (see correct_main_code).
+        journal: Optional run journal. Main revisions, generated dependencies and verdicts
+            are recorded in it, and a main file it already holds resumes from its latest
+            revision, skipping the dependencies already validated.
+        static_check: Whether to check each dependency statically first and skip the LLM
+            validator when the pair is proven compatible (see check_compatibility).
+        validation_depth: When set, only the files within this many reference hops of the
+            main file (see related_files) go through the Saw loop, reached as their code is
+            generated; the other files are then generated against the final main code
+            without validation. None or 0 validates every other file of the tree.
+
+    Returns:
+        dict: 'path' of the main file, generated 'files', per-file 'iterations' metrics
+            and the 'dependency_checks' / 'aligned_dependencies' counters of this main.
+    """
+    path, description = item['path'], item['description']
+    state = {"path": path, "files": {}, "iterations": [], "dependency_checks": 0, "aligned_dependencies": 0}
+    generated_files = state["files"]
+    iteration_metrics = state["iterations"]
+    scope = journal.scope(path) if journal is not None else None
+    resumed = scope.state() if scope is not None else {"revision": None, "verdicts": {}}
+
+    if resumed["revision"] is not None:
+        # Continue from the last consistent point of the journal
+        main_code = resumed["revision"]
+        generated_files[path] = main_code
+        for dep_path in resumed["verdicts"]:
+            generated_files[dep_path] = resumed["files"][dep_path]
+        iteration_metrics.extend(resumed["iterations"])
+        state["dependency_checks"] += len(resumed["verdicts"])
+        state["aligned_dependencies"] += sum(resumed["verdicts"].values())
+        logging.info(f"Resuming main file {path} after {len(resumed['verdicts'])} validated dependencies")
+    else:
+        logging.info(f"Generating main file: {path}")
+        try:
+            main_prompt = (
+                f"Generate the main file for the project:\n{description}\n\n"
+                "Do not include comments or explanations. Only return the raw code content."
+            )
+            iteration_start = time.perf_counter()  # Start iteration timing
+            on_chunk = make_stream_writer(path, write_partial_file, on_progress) if stream else None
+            with track_usage() as main_usage:
+                main_code = await generate_main_or_dependency(main_prompt, on_chunk=on_chunk, role="main")
+
+            # Track token usage
+            logging.info(f"token_usage_main: {main_usage['total_tokens']}")
+            main_code = extract_code(main_code)
+            generated_files[path] = main_code
+            publish_file(path, main_code, on_progress)
+
+            # Append iteration metrics
+            iteration_metrics.append({
+                "type": "main",
+                **usage_metrics(main_usage),
+                "execution_time": time.perf_counter() - iteration_start
+            })
+            if scope is not None:
+                scope.record_revision(main_code, [iteration_metrics[-1]])
+        except Exception as e:
+            logging.error(f"Error generating code: {e}")
+            return state
+
+    dependencies = [dep for dep in project_tree if dep['path'] != path and dep['path'] not in resumed["verdicts"]]
+    precheck = make_static_precheck(
+        path, description, [dep['path'] for dep in project_tree], correction_mode
+    ) if static_check else None
+
+    async def saw(main_code: str, dependencies: list) -> str:
+        """Run the Saw phase of the main file over `dependencies` and return the main code."""
+        if validation_batch_size and validation_batch_size > 1:
+            main_code, dep_files, dep_iterations = await saw_dependencies_in_batches(
+                main_code, dependencies, description, concurrency, validation_batch_size,
+                validation_token_budget or VALIDATION_TOKEN_BUDGET, state, stream, on_progress, correction_mode, scope,
+                precheck
+            )
+            generated_files[path] = main_code
+            publish_file(path, main_code, on_progress)
+            generated_files.update(dep_files)
+            iteration_metrics.extend(dep_iterations)
+            return main_code
+
+        if concurrency:
+            main_code, results = await saw_dependencies_concurrently(
+                main_code, dependencies, description, concurrency, state, stream, on_progress, correction_mode, scope,
+                precheck
+            )
+            generated_files[path] = main_code
+            publish_file(path, main_code, on_progress)
+            for result in results:
+                generated_files[result["path"]] = result["code"]
+                iteration_metrics.append(result["metric"])
+            return main_code
+
+        for dep in dependencies:
+            dep_path = dep['path']
+            try:
+                iteration_start = time.perf_counter()  # Start iteration timing
+                corrections = []
+                prechecks = []
+                with track_usage() as dep_usage:
+                    dep_code = await generate_dependency(main_code, dep, stream, on_progress, scope)
+
+                    # Validate dependency alignment
+                    state["dependency_checks"] += 1
+                    is_valid, updated_main_code = await validate_dependency(
+                        main_code, dep_path, dep_code, description, correction_mode, corrections, precheck, prechecks
+                    )
+                # Track token usage (generation and validation)
+                logging.info(f"token_usage_dep: {dep_usage['total_tokens']}")
+                if is_valid:
+                    state["aligned_dependencies"] += 1
+                    logging.info(f"Dependency {dep_path} validated successfully without updating main code.")
+                else:
+                    logging.warning(f"Main code updated for compatibility with {dep_path}")
+                    main_code = updated_main_code
+                    generated_files[path] = main_code
+                    publish_file(path, main_code, on_progress)
+                generated_files[dep_path] = dep_code
 
                 # Append iteration metrics
                 iteration_metrics.append({
-                    "iteration": iteration,
-                    "type": "main",
-                    "token_usage": token_usage_main,
-                    "execution_time": time.time() - iteration_start
+                    "type": "dependency",
+                    **usage_metrics(dep_usage),
+                    **correction_metrics(corrections),
+                    **precheck_metrics(prechecks),
+                    "execution_time": time.perf_counter() - iteration_start
                 })
-                iteration += 1  # Increment iteration counter
+                if scope is not None:
+                    if not is_valid:
+                        scope.record_revision(main_code)
+                    scope.record_verdicts({dep_path: is_valid}, [iteration_metrics[-1]])
             except Exception as e:
                 logging.error(f"Error generating code: {e}")
                 continue
+        return main_code
+
+    if not validation_depth:
+        await saw(main_code, dependencies)
+        return state
+
+    # Validate only the files related to the main file, widening the search as their code is generated
+    pending = [dep for dep in dependencies if not is_directory(dep['path'])]
+    while True:
+        related = related_files(path, reference_graph(project_tree, generated_files), validation_depth)
+        wave = [dep for dep in pending if dep['path'] in related]
+        if not wave:
+            break
+        logging.info(f"Validating {len(wave)} files related to {path}: {[dep['path'] for dep in wave]}")
+        pending = [dep for dep in pending if dep['path'] not in related]
+        main_code = await saw(main_code, wave)
+
+    # Generate the other files against the final main code, without pairwise validation
+    if pending:
+        logging.info(f"Generating {len(pending)} files unrelated to {path} without validation")
+        dep_files, dep_iterations = await generate_unvalidated_dependencies(
+            main_code, pending, concurrency, stream, on_progress, scope
+        )
+        generated_files.update(dep_files)
+        iteration_metrics.extend(dep_iterations)
+    return state
+
+
+def merge_main_results(results: list) -> dict:
+    """
+    Merge the files generated by the See-Saw loops of several main files.
 
-            dependencies = [dep for dep in project_tree if dep['path'] != path]
-            for dep in dependencies:
-                dep_path, dep_desc = dep['path'], dep['description']
-                logging.info(f"Generating dependency: {dep_path}")
-                try:
-                    dep_prompt = (
-                        f"This is the main code:\n\n{main_code}\n\n"
-                        f"Generate the dependency code for the file '{dep_path}':\n{dep_desc}\n\n"
-                        "Do not include comments or explanations. Only return the raw code content."
-                    )
-                    iteration_start = time.time()  # Start iteration timing
-                    dep_code = await generate_main_or_dependency(dep_prompt)
+    Conflicting writes are resolved deterministically:
+    - a main file's own See-Saw output always wins for its path over the versions
+      other main loops generated for it as a dependency;
+    - any other file generated by several main loops keeps the version of the main
+      that comes last in project tree order, as in the sequential mechanism.
 
-                    # Track token usage
-                    token_usage_dep = len(dep_code.split())
-                    logging.info(f"token_usage_dep: {token_usage_dep}")
-                    dep_code = extract_code(dep_code)
+    Args:
+        results: Per-main states returned by `see_saw_main_file`, in project tree order.
 
-                    # Validate dependency alignment
-                    dependency_checks += 1
-                    is_valid, updated_main_code = await validator_function(
-                        main_code, dep_code, original_descriptions[path]
-                    )
-                    if is_valid:
-                        aligned_dependencies += 1
-                        logging.info(f"Dependency {dep_path} validated successfully without updating main code.")
-                    else:
-                        logging.warning(f"Main code updated for compatibility with {dep_path}")
-                        main_code = updated_main_code
-                        generated_files[path] = main_code
-                    generated_files[dep_path] = dep_code
+    Returns:
+        dict: The merged mapping of file path to content.
+    """
+    owners = {result["path"] for result in results if result["path"] in result["files"]}
+    merged = {}
+    for result in results:
+        for file_path, content in result["files"].items():
+            if file_path in owners and file_path != result["path"]:
+                continue  # The main loop owning this file decides its content
+            if file_path in merged and merged[file_path] != content:
+                logging.info(f"Conflicting versions of {file_path}; keeping the one from {result['path']}")
+            merged[file_path] = content
+    return merged
+
+
+async def see_saw_mechanism(project_tree: list, concurrency: int = None, stream: bool = False,
+                            on_progress=None, main_concurrency: int = None, validation_batch_size: int = None,
+                            validation_token_budget: int = None, correction_mode: str = "rewrite",
+                            journal: RunJournal = None, static_check: bool = False,
+                            validation_depth: int = None):
+    """
+    Implement the See-Saw mechanism for generating main and dependency files.
 
-                    # Append iteration metrics
-                    iteration_metrics.append({
-                        "iteration": iteration,
-                        "type": "dependency",
-                        "token_usage": token_usage_dep,
-                        "execution_time": time.time() - iteration_start
-                    })
-                    iteration += 1  # Increment iteration counter
-                except Exception as e:
-                    logging.error(f"Error generating code: {e}")
-                    continue
+    Each main file runs its See-Saw loop as an independent task with its own state;
+    the generated files are then merged with `merge_main_results`.
 
-    # End execution timer
-    execution_time_total = time.time() - start_time
+    Args:
+        project_tree: A list of dictionaries with 'path' and 'description' keys.
+        concurrency: Maximum number of dependencies of a main file generated and validated
+            at once. When None or 0, dependencies are processed one after another.
+        stream: Whether to stream files to disk while they are generated. Partial content
+            is written as tokens arrive and every file is written as soon as it is settled,
+            instead of all at once at the end.
+        on_progress: Optional function (path, content, done) called with streaming progress.
+        main_concurrency: Maximum number of main files processed at once. When None or 0,
+            main files are processed one after another.
+        validation_batch_size: Number of dependencies validated per request (None, 0 or 1
+            for one request per dependency), see `saw_dependencies_in_batches`.
+        validation_token_budget: Maximum prompt tokens of a batched validation request.
+        correction_mode: "rewrite" or "patch" main code corrections (see correct_main_code).
+        journal: Optional run journal to record progress in and resume from (see
+            see_saw_main_file).
+        static_check: Whether to check dependencies statically before the LLM validator
+            (see see_saw_main_file).
+        validation_depth: Reference hops from a main file within which dependencies are
+            validated (None or 0 for all files), see see_saw_main_file.
+    """
+    # Initialize metrics
+    global token_usage, dependency_checks, aligned_dependencies
+    token_usage = 0
+    dependency_checks = 0
+    aligned_dependencies = 0
 
-    # Calculate total token usage
-    total_token_usage = sum([metric["token_usage"] for metric in iteration_metrics])
+    run_usage = start_usage_run()  # Provider-reported usage of every call of the run
+    main_items = [item for item in project_tree if "main" in item['description'].lower()]
+    semaphore = asyncio.Semaphore(max(1, main_concurrency or 1))
 
-    # Create metrics dictionary
+    async def run_main(item):
+        async with semaphore:
+            return await see_saw_main_file(
+                item, project_tree, concurrency, stream, on_progress, validation_batch_size, validation_token_budget,
+                correction_mode, journal, static_check, validation_depth
+            )
+
+    # Start timing the process
+    start_time = time.perf_counter()
+
+    results = []
+    outcomes = await asyncio.gather(*[run_main(item) for item in main_items], return_exceptions=True)
+    for item, outcome in zip(main_items, outcomes):
+        if isinstance(outcome, Exception):
+            logging.error(f"Error in See-Saw loop of {item['path']}: {outcome}")
+            continue
+        results.append(outcome)
+
+    generated_files = merge_main_results(results)
+
+    # Number iterations in project tree order
+    iteration_metrics = []  # List to store metrics for each iteration
+    for result in results:
+        for metric in result["iterations"]:
+            iteration_metrics.append({"iteration": len(iteration_metrics) + 1, **metric})
+    dependency_checks = sum(result["dependency_checks"] for result in results)
+    aligned_dependencies = sum(result["aligned_dependencies"] for result in results)
+    static_checks = sum(metric.get("static_checks", 0) for metric in iteration_metrics)
+    static_skips = sum(metric.get("static_skips", 0) for metric in iteration_metrics)
+
+    # End execution timer
+    execution_time_total = time.perf_counter() - start_time
+
+    # Create metrics dictionary (token totals include failed calls)
     metrics = {
-        "token_usage_total": total_token_usage,
+        "token_usage_total": run_usage["total_tokens"],
+        "prompt_tokens_total": run_usage["prompt_tokens"],
+        "completion_tokens_total": run_usage["completion_tokens"],
+        "cached_tokens_total": run_usage["cached_tokens"],
+        "cost_total": run_usage["cost"],
+        "corrections_total": sum(metric.get("corrections", 0) for metric in iteration_metrics),
+        "patched_corrections_total": sum(metric.get("patched_corrections", 0) for metric in iteration_metrics),
+        "patch_fallbacks_total": sum(metric.get("patch_fallbacks", 0) for metric in iteration_metrics),
+        "output_tokens_saved_total": sum(metric.get("output_tokens_saved", 0) for metric in iteration_metrics),
+        "static_checks_total": static_checks,
+        "static_skips_total": static_skips,
+        # Share of the statically checked dependencies whose validator call was skipped
+        "static_skip_rate": (static_skips / static_checks) * 100 if static_checks > 0 else 0,
+        "validator_tokens_saved_total": sum(metric.get("validator_tokens_saved", 0) for metric in iteration_metrics),
+        "pruned_dependencies_total": sum(1 for metric in iteration_metrics if metric.get("pruned")),
+        "throttle_time_total": run_usage["throttle_time"],
+        "retries_total": run_usage["retries"],
         "alignment": (aligned_dependencies / dependency_checks) * 100 if dependency_checks > 0 else 0,
         "execution_time_total": execution_time_total,
         "iterations": iteration_metrics
@@ -521,13 +1503,25 @@ async def see_saw_mechanism(project_tree: list):
 
 
 
-def save_generated_files(generated_files: dict, base_path: str = "./generated"):
+def save_generated_files(generated_files: dict, base_path: str = None, log: bool = True):
     """
-    Save all generated files to the specified base path.
+    Save all generated files to the specified base path (defaults to the current workspace).
+
+    The writes are queued and return at once; call tools.persistence.file_writer.flush()
+    before reading the files back from disk.
+
+    Finished files (`log=True`) saved to the current workspace are also recorded as
+    generated in its project store, by its writer thread (see ProjectStore.queue_files).
     """
+    workspace = current_workspace()
+    if log and base_path is None:
+        workspace.store.queue_files(generated_files)
+    base_path = base_path or workspace.path
     for path, content in generated_files.items():
         full_path = os.path.join(base_path, path.lstrip("./"))
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, "w", encoding="utf-8") as file:
-            file.write(content)
-        logging.info(f"File saved: {full_path}")
+        # Queued for the background writer (see tools.persistence): the file is written
+        # atomically, and only its latest content if it is saved again in the meantime
+        with span("file_write", path, size=len(content), partial=not log):
+            file_writer.write(full_path, content)
+        if log:
+            logging.info(f"File saved: {full_path}")
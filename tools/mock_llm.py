@@ -0,0 +1,297 @@
+import os
+import re
+import json
+import time
+import math
+import random
+import asyncio
+import hashlib
+from openai.types.chat import ChatCompletionChunk
+from tools.usage import count_tokens
+from tools.skeleton import SKELETON_MARKER
+from tools.rate_limit import current_attempt
+
+# Behaviour of the mock backend (see MockLLM)
+MOCK_LATENCY = os.getenv("MOCK_LLM_LATENCY", "lognormal:0.6,0.4")
+MOCK_TOKENS_PER_SECOND = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "80"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+MOCK_ERROR_STATUS = int(os.getenv("MOCK_LLM_ERROR_STATUS", "429"))
+MOCK_INVALID_RATE = float(os.getenv("MOCK_LLM_INVALID_RATE", "0.2"))
+MOCK_CODE_LINES = int(os.getenv("MOCK_LLM_CODE_LINES", "40"))
+MOCK_SEED = os.getenv("MOCK_LLM_SEED", "0")
+STREAM_CHUNK_TOKENS = 8
+
+MAIN_CODE_PATTERN = re.compile(r"The following is the main code:\n\n(.*?)\n\nThe following (?:is|are) the dependenc",
+                               re.DOTALL)
+FILE_PATH_PATTERN = re.compile(r"file (?:at )?'([^']+)'")
+TREE_FILE_PATTERN = re.compile(r"^- (\S+): ", re.MULTILINE)
+INTERFACE_PATTERN = re.compile(r"Its interface is:\n\n(.*?)\n\nKeep every name", re.DOTALL)
+RECONCILE_PATTERN = re.compile(r"\) is:\n\n(.*?)\n\nIt has these mismatches:\n(.*?)\n\n", re.DOTALL)
+MISSING_NAME_PATTERN = re.compile(r"^- '(\w+)' of the skeleton is not (?:defined|exported)$", re.MULTILINE)
+WORDS = ["user", "item", "order", "config", "session", "report", "task", "event", "cache", "record"]
+
+
+class MockAPIError(Exception):
+    """
+    Error injected by the mock backend, carrying an HTTP status like the real clients.
+    """
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Mock LLM error {status_code}")
+        self.status_code = status_code
+
+
+def parse_latency(spec: str):
+    """
+    Parse a latency distribution: 'constant:S', 'uniform:MIN,MAX' or 'lognormal:MEDIAN,SIGMA'
+    (seconds).
+
+    Returns:
+        function: Sampler taking a random.Random and returning seconds.
+    """
+    kind, _, values = spec.partition(":")
+    numbers = [float(value) for value in values.split(",") if value]
+    if kind == "constant":
+        return lambda rng: numbers[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(numbers[0], numbers[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(numbers[0]), numbers[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def file_language(path: str, prompt: str) -> str:
+    """
+    Guess the language of the file a generation prompt asks for.
+    """
+    _, extension = os.path.splitext(path or "")
+    if extension:
+        return extension.lstrip(".").lower()
+    lowered = prompt.lower()
+    return "js" if any(word in lowered for word in ("react", "node", "express", "javascript")) else "py"
+
+
+def fake_code(language: str, rng: random.Random, lines: int) -> str:
+    """
+    Produce deterministic code of roughly `lines` lines shaped like the language.
+    """
+    names = [f"{rng.choice(WORDS)}_{index}" for index in range(max(1, lines // 6))]
+    if language == "py":
+        parts = ["import os", "import json", ""]
+        for name in names:
+            parts += [f"def {name}(data, limit={rng.randint(1, 99)}):",
+                      "    result = []",
+                      "    for value in data[:limit]:",
+                      f"        result.append(value * {rng.randint(2, 9)})",
+                      "    return result", ""]
+        parts.append(f"if __name__ == \"__main__\":\n    print({names[0]}([1, 2, 3]))")
+    elif language in ("js", "jsx", "ts", "tsx", "mjs", "cjs"):
+        parts = ["import fs from 'fs';", ""]
+        for name in names:
+            parts += [f"export function {name}(data, limit = {rng.randint(1, 99)}) {{",
+                      "  const result = [];",
+                      f"  data.slice(0, limit).forEach((value) => result.push(value * {rng.randint(2, 9)}));",
+                      "  return result;", "}", ""]
+    elif language == "json":
+        return json.dumps({name: rng.randint(0, 1000) for name in names}, indent=2)
+    elif language == "html":
+        parts = ["<!DOCTYPE html>", "<html>", "<body>"] + [f"  <div id=\"{name}\"></div>" for name in names] + \
+            ["</body>", "</html>"]
+    elif language == "css":
+        parts = [f"#{name} {{ margin: {rng.randint(0, 20)}px; }}" for name in names]
+    else:
+        parts = ["# Project", ""] + [f"- `{name}`: handles {name.split('_')[0]} data." for name in names]
+    return "\n".join(parts)
+
+
+def fake_skeleton(path: str, rng: random.Random) -> str:
+    """
+    Produce the deterministic interface skeleton of a Python or JavaScript file.
+    """
+    stem = re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+    names = [f"{stem}_{word}" for word in rng.sample(WORDS, 2)]
+    if path.endswith(".py"):
+        return "\n\n".join(f"def {name}(data, limit=10):\n    ..." for name in names)
+    return "\n\n".join(f"export function {name}(data, limit = 10) {{}}" for name in names)
+
+
+class MockLLM:
+    """
+    Local, deterministic stand-in for the LLM providers.
+
+    Responses depend only on the request and the seed: generation prompts get code
+    shaped like the requested file, validator prompts get 'True'/'False' verdicts
+    (with a corrected main code or edit blocks), the project tree prompt gets a
+    JSON tree, and the skeleton prompt gets a skeleton per source file. Latency is
+    drawn from a configurable distribution plus the time to emit the completion at
+    `tokens_per_second`, and errors with an HTTP status can be injected at a given
+    rate. Latency and errors depend on the request and its retry index in the rate
+    limiter (see current_attempt), never on earlier runs, so repeated runs in one
+    process draw the same values.
+    """
+
+    def __init__(self, latency: str = MOCK_LATENCY, tokens_per_second: float = MOCK_TOKENS_PER_SECOND,
+                 error_rate: float = MOCK_ERROR_RATE, error_status: int = MOCK_ERROR_STATUS,
+                 invalid_rate: float = MOCK_INVALID_RATE, code_lines: int = MOCK_CODE_LINES,
+                 seed: str = MOCK_SEED):
+        self.sample_latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.invalid_rate = invalid_rate
+        self.code_lines = code_lines
+        self.seed = seed
+
+    def _random(self, key: str, salt: str = "") -> random.Random:
+        return random.Random(hashlib.sha256(f"{self.seed}:{key}:{salt}".encode("utf-8")).digest())
+
+    def respond(self, prompt: str, rng: random.Random) -> str:
+        """
+        Return the deterministic answer to a prompt.
+        """
+        main_match = MAIN_CODE_PATTERN.search(prompt)
+        main_code = main_match.group(1) if main_match else ""
+        patch = "<<<<<<< SEARCH" in prompt
+
+        if "VERDICT <path>" in prompt:
+            paths = re.findall(r"^### Dependency: (.+)$", prompt, re.MULTILINE)
+            verdicts = [rng.random() >= self.invalid_rate for _ in paths]
+            lines = [f"VERDICT {path}: {verdict}" for path, verdict in zip(paths, verdicts)]
+            if not all(verdicts):
+                lines += ["MAIN EDITS:" if patch else "MAIN CODE:", self.correction(main_code, patch)]
+            return "\n".join(lines)
+        if "Check compatibility" in prompt:
+            if rng.random() >= self.invalid_rate:
+                return "True"
+            return f"False\n{self.correction(main_code, patch)}"
+        if "Return the corrected main code" in prompt:
+            return self.correction(main_code, False)
+        if SKELETON_MARKER in prompt:
+            sections = [f"### File: {path}\n{fake_skeleton(path, rng)}" for path in TREE_FILE_PATTERN.findall(prompt)
+                        if os.path.splitext(path)[1] in (".py", ".js")]
+            return "\n\n".join(sections)
+        reconcile_match = RECONCILE_PATTERN.search(prompt)
+        if reconcile_match:
+            # Add the names the implementation dropped back
+            code = reconcile_match.group(1)
+            js = "export " in code
+            for name in MISSING_NAME_PATTERN.findall(reconcile_match.group(2)):
+                code += f"\n\nexport function {name}(data) {{\n  return data;\n}}" if js else \
+                    f"\n\ndef {name}(data, limit=10):\n    return data[:limit]"
+            return f"```\n{code}\n```"
+        interface_match = INTERFACE_PATTERN.search(prompt)
+        if interface_match:
+            # Fill the bodies of the interface; some implementations drift from it
+            code = interface_match.group(1).replace("    ...", "    return data[:limit]")
+            code = code.replace(") {}", ") {\n  return data.slice(0, limit);\n}")
+            if rng.random() < self.invalid_rate:
+                code = re.sub(r"((?:def|function) \w+)", r"\1_impl", code, count=1)
+            return f"```\n{code}\n```"
+        if "project structure as a JSON list" in prompt:
+            language = file_language("", prompt)
+            files = [{"path": f"./src/main.{language}", "description": "Main application entry point."}]
+            files += [{"path": f"./src/{word}.{language}", "description": f"Helpers for {word} data."}
+                      for word in rng.sample(WORDS, 4)]
+            files.append({"path": "./README.md", "description": "Project documentation."})
+            return f"```json\n{json.dumps(files, indent=2)}\n```"
+
+        path_match = FILE_PATH_PATTERN.search(prompt)
+        language = file_language(path_match.group(1) if path_match else "", prompt)
+        lines = rng.randint(max(1, self.code_lines // 2), max(1, self.code_lines * 3 // 2))
+        code = fake_code(language, rng, lines)
+        return f"```{language}\n{code}\n```" if rng.random() < 0.5 else code
+
+    def correction(self, main_code: str, patch: bool) -> str:
+        """
+        Return a small correction of the main code, as edit blocks or a full rewrite.
+        """
+        lines = main_code.splitlines()
+        target = next((line for line in reversed(lines) if line.strip() and main_code.count(line) == 1), None)
+        if patch and target is not None:
+            return f"<<<<<<< SEARCH\n{target}\n=======\n{target}\n{target.split(target.strip())[0]}pass\n>>>>>>> REPLACE"
+        return main_code + "\n"
+
+    async def _start(self, key: str) -> random.Random:
+        """Wait for the first token and possibly inject an error; return the content RNG."""
+        # Retries draw new latencies and errors
+        timing = self._random(key, f"attempt-{current_attempt()}")
+        await asyncio.sleep(max(0.0, self.sample_latency(timing)))
+        if timing.random() < self.error_rate:
+            raise MockAPIError(self.error_status)
+        return self._random(key)
+
+    async def complete(self, model: str, system_prompt: str, prompt: str, params: dict = None) -> dict:
+        """
+        Return a chat completion, shaped like the OpenAI response, after a simulated delay.
+
+        Raises:
+            MockAPIError: When an error is injected.
+        """
+        key = f"{model}\n{system_prompt}\n{prompt}"
+        content = self.respond(prompt, await self._start(key))
+        completion_tokens = count_tokens(content, model)
+        await asyncio.sleep(completion_tokens / self.tokens_per_second)
+        return self.completion(key, model, f"{system_prompt}\n{prompt}", content)
+
+    async def open_stream(self, model: str, system_prompt: str, prompt: str, params: dict = None):
+        """
+        Start a streamed chat completion after the first-token delay.
+
+        Returns:
+            An async iterator of ChatCompletionChunk, the last one carrying the usage.
+
+        Raises:
+            MockAPIError: When an error is injected.
+        """
+        key = f"{model}\n{system_prompt}\n{prompt}"
+        content = self.respond(prompt, await self._start(key))
+        completion = self.completion(key, model, f"{system_prompt}\n{prompt}", content)
+
+        async def chunks():
+            pieces = re.findall(r"\S+\s*|\s+", content)
+            for start in range(0, len(pieces), STREAM_CHUNK_TOKENS):
+                await asyncio.sleep(STREAM_CHUNK_TOKENS / self.tokens_per_second)
+                yield ChatCompletionChunk.model_validate({
+                    "id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+                    "model": model, "choices": [{
+                        "index": 0, "finish_reason": None,
+                        "delta": {"content": "".join(pieces[start:start + STREAM_CHUNK_TOKENS])},
+                    }],
+                })
+            yield ChatCompletionChunk.model_validate({
+                "id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+                "model": model, "choices": [{"index": 0, "finish_reason": "stop", "delta": {}}],
+                "usage": completion["usage"],
+            })
+        return chunks()
+
+    async def generate(self, model: str, prompt: str, parameters: dict = None) -> dict:
+        """
+        Return a text generation, shaped like the HuggingFace inference response.
+        """
+        completion = await self.complete(model, "", prompt, parameters)
+        return {"generated_text": completion["choices"][0]["message"]["content"]}
+
+    @staticmethod
+    def completion(key: str, model: str, prompt: str, content: str) -> dict:
+        prompt_tokens = count_tokens(prompt, model)
+        completion_tokens = count_tokens(content, model)
+        return {
+            "id": f"mock-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+mock_llm = MockLLM()
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import zlib
+import struct
+import fnmatch
+import hashlib
+import logging
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Files left out of the project archive unless included explicitly, and compression settings
+PACKAGE_EXCLUDE = [pattern for pattern in os.getenv(
+    "PACKAGE_EXCLUDE", "generation.log,trace.json,project.db*,*.pkl,*.tmp,__pycache__/*"
+).split(",") if pattern]
+PACKAGE_WORKERS = int(os.getenv("PACKAGE_WORKERS", str(min(8, os.cpu_count() or 1))))
+PACKAGE_COMPRESS_LEVEL = int(os.getenv("PACKAGE_COMPRESS_LEVEL", "6"))
+COPY_CHUNK_BYTES = 1024 * 1024
+
+# Zip structures (without zip64: larger archives fall back to zipfile)
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+UTF8_NAMES_FLAG = 0x0800
+ZIP_DEFLATED = 8
+ZIP_LIMIT = 0xFFFFFFFF
+
+
+def matches(path: str, patterns: list) -> bool:
+    """
+    Whether a relative path matches a glob pattern, either the whole path or (for
+    patterns without '/') its file name.
+    """
+    name = os.path.basename(path)
+    return any(fnmatch.fnmatch(path, pattern) or ("/" not in pattern and fnmatch.fnmatch(name, pattern))
+               for pattern in patterns)
+
+
+def select_files(root: str, include: list = None, exclude: list = None) -> list:
+    """
+    List the files to package under `root`, in sorted order.
+
+    Args:
+        root: Directory to package.
+        include: Glob patterns a file must match (None for every file).
+        exclude: Glob patterns of files to leave out (None for PACKAGE_EXCLUDE).
+
+    Returns:
+        list: (relative path with '/' separators, size, mtime_ns) tuples.
+    """
+    exclude = PACKAGE_EXCLUDE if exclude is None else exclude
+    files = []
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries = list(iterator)
+        except OSError:
+            continue
+        for entry in entries:
+            relative = os.path.relpath(entry.path, root).replace(os.sep, "/")
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+            elif entry.is_file() and not matches(relative, exclude) and (not include or matches(relative, include)):
+                stat = entry.stat()
+                files.append((relative, stat.st_size, stat.st_mtime_ns))
+    return sorted(files)
+
+
+def dos_datetime(mtime_ns: int) -> tuple:
+    """
+    Convert a modification time to the (time, date) fields of a zip header.
+    """
+    moment = time.localtime(mtime_ns / 1e9)
+    if moment.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return (
+        (moment.tm_hour << 11) | (moment.tm_min << 5) | (moment.tm_sec // 2),
+        ((moment.tm_year - 1980) << 9) | (moment.tm_mon << 5) | moment.tm_mday,
+    )
+
+
+def compress_file(path: str, level: int = PACKAGE_COMPRESS_LEVEL) -> dict:
+    """
+    Read and deflate a file (zlib releases the GIL, so files compress in parallel).
+
+    Returns:
+        dict: Its 'sha256', 'crc', 'size' and raw deflate 'data'.
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return {
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "crc": zlib.crc32(content),
+        "size": len(content),
+        "data": compressor.compress(content) + compressor.flush(),
+    }
+
+
+def hash_file(path: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(COPY_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path: str, archive_path: str) -> dict:
+    """
+    Load the entries of the previous archive (empty if it or its manifest is missing).
+    """
+    if not (os.path.exists(manifest_path) and os.path.exists(archive_path)):
+        return {}
+    try:
+        with open(manifest_path, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+    # A manifest that does not describe the archive on disk cannot be trusted
+    if manifest.get("archive_size") != os.path.getsize(archive_path):
+        return {}
+    return manifest.get("entries", {})
+
+
+def build_archive(root: str, archive_path: str, include: list = None, exclude: list = None,
+                  workers: int = PACKAGE_WORKERS) -> dict:
+    """
+    Package a directory as a zip archive, reusing the compressed entries of the
+    previous archive.
+
+    A manifest beside the archive records each entry's size, modification time,
+    content hash and location in the archive. A file whose size and modification
+    time are unchanged, or whose content hash matches a previous entry, is copied
+    from the previous archive as is; the other files are compressed in a pool of
+    `workers` threads. The archive is written to a temporary file and renamed, so a
+    download never sees a partial archive.
+
+    Args:
+        root: Directory to package.
+        archive_path: Path of the zip archive.
+        include: Glob patterns of the files to package (None for every file).
+        exclude: Glob patterns of the files to leave out (None for PACKAGE_EXCLUDE).
+        workers: Number of compression threads.
+
+    Returns:
+        dict: Packaging counts: 'files', 'reused', 'compressed', 'bytes_in' (size of the
+            packaged files), 'bytes_out' (archive size) and 'seconds'.
+    """
+    start_time = time.perf_counter()
+    manifest_path = f"{archive_path}.manifest.json"
+    previous = load_manifest(manifest_path, archive_path)
+    by_hash = {entry["sha256"]: entry for entry in previous.values()}
+    files = select_files(root, include, exclude)
+    if len(files) >= 0xFFFF or sum(size for _, size, _ in files) >= ZIP_LIMIT:
+        return build_large_archive(root, archive_path, files, start_time)
+
+    def prepare(item):
+        relative, size, mtime_ns = item
+        old = previous.get(relative)
+        if old is not None and old["size"] == size and old["mtime_ns"] == mtime_ns:
+            return old
+        full_path = os.path.join(root, relative)
+        if size and by_hash:
+            # Identical content (e.g. a file rewritten unchanged) keeps its compressed data
+            same = by_hash.get(hash_file(full_path))
+            if same is not None:
+                return same
+        return compress_file(full_path)
+
+    entries = {}
+    stats = {"files": len(files), "reused": 0, "compressed": 0, "bytes_in": 0}
+    temporary_path = f"{archive_path}.tmp"
+    central_directory = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool, open(temporary_path, "wb") as archive:
+        old_archive = open(archive_path, "rb") if previous else None
+        try:
+            in_flight = deque()
+            for item in files:
+                in_flight.append((item, pool.submit(prepare, item)))
+                if len(in_flight) < 2 * max(1, workers):
+                    continue
+                write_entry(archive, old_archive, *in_flight.popleft(), entries, central_directory, stats)
+            while in_flight:
+                write_entry(archive, old_archive, *in_flight.popleft(), entries, central_directory, stats)
+        finally:
+            if old_archive is not None:
+                old_archive.close()
+        directory_offset = archive.tell()
+        for header in central_directory:
+            archive.write(header)
+        archive.write(END_OF_CENTRAL_DIRECTORY.pack(
+            0x06054B50, 0, 0, len(central_directory), len(central_directory),
+            archive.tell() - directory_offset, directory_offset, 0,
+        ))
+        archive_size = archive.tell()
+    os.replace(temporary_path, archive_path)
+    with open(manifest_path, "w") as manifest_file:
+        json.dump({"archive_size": archive_size, "entries": entries}, manifest_file)
+
+    stats["bytes_out"] = archive_size
+    stats["seconds"] = time.perf_counter() - start_time
+    return stats
+
+
+def write_entry(archive, old_archive, item, future, entries: dict, central_directory: list, stats: dict):
+    """
+    Append one file to the archive being written, from its fresh compression or
+    from the data of the previous archive, and record it in the new manifest.
+    """
+    relative, size, mtime_ns = item
+    prepared = future.result()
+    name = relative.encode("utf-8")
+    dos_time, dos_date = dos_datetime(mtime_ns)
+    header_offset = archive.tell()
+    compress_size = len(prepared["data"]) if "data" in prepared else prepared["compress_size"]
+    archive.write(LOCAL_HEADER.pack(
+        0x04034B50, 20, UTF8_NAMES_FLAG, ZIP_DEFLATED, dos_time, dos_date,
+        prepared["crc"], compress_size, prepared["size"], len(name), 0,
+    ))
+    archive.write(name)
+    data_offset = archive.tell()
+    if "data" in prepared:
+        archive.write(prepared["data"])
+        stats["compressed"] += 1
+    else:
+        old_archive.seek(prepared["data_offset"])
+        remaining = compress_size
+        while remaining:
+            chunk = old_archive.read(min(COPY_CHUNK_BYTES, remaining))
+            if not chunk:
+                raise IOError(f"Previous archive is truncated at {relative}")
+            archive.write(chunk)
+            remaining -= len(chunk)
+        stats["reused"] += 1
+    stats["bytes_in"] += prepared["size"]
+    central_directory.append(CENTRAL_HEADER.pack(
+        0x02014B50, (3 << 8) | 20, 20, UTF8_NAMES_FLAG, ZIP_DEFLATED, dos_time, dos_date,
+        prepared["crc"], compress_size, prepared["size"], len(name), 0, 0, 0, 0, (0o100644 << 16),
+        header_offset,
+    ) + name)
+    entries[relative] = {
+        "size": prepared["size"], "mtime_ns": mtime_ns, "sha256": prepared["sha256"], "crc": prepared["crc"],
+        "compress_size": compress_size, "data_offset": data_offset,
+    }
+
+
+def build_large_archive(root: str, archive_path: str, files: list, start_time: float) -> dict:
+    """
+    Package the files with zipfile (zip64), without reuse, for archives beyond the
+    limits of the incremental writer.
+    """
+    logging.info(f"Packaging {len(files)} files with zip64; compressed entries are not reused")
+    temporary_path = f"{archive_path}.tmp"
+    with zipfile.ZipFile(temporary_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for relative, _, _ in files:
+            archive.write(os.path.join(root, relative), relative)
+    os.replace(temporary_path, archive_path)
+    manifest_path = f"{archive_path}.manifest.json"
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    return {
+        "files": len(files), "reused": 0, "compressed": len(files),
+        "bytes_in": sum(size for _, size, _ in files), "bytes_out": os.path.getsize(archive_path),
+        "seconds": time.perf_counter() - start_time,
+    }
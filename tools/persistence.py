@@ -0,0 +1,177 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from tools.tracing import percentile
+
+# Delay the writer waits to batch (and coalesce) writes, and whether writes are fsynced
+WRITE_BATCH_DELAY = float(os.getenv("WRITE_BATCH_DELAY", "0.05"))
+WRITE_FSYNC = os.getenv("WRITE_FSYNC", "0") == "1"
+# Latency samples kept by the process-wide counters (runs keep all of theirs)
+WRITE_LATENCY_SAMPLES = 10000
+
+# Write counters of the current run (see start_persistence_run)
+_persistence_run = contextvars.ContextVar("persistence_run", default=None)
+
+
+def new_write_stats(max_latencies: int = None) -> dict:
+    """
+    Return empty write counters, keeping at most `max_latencies` latency samples
+    (None for all of them).
+    """
+    return {"enqueued": 0, "coalesced": 0, "writes": 0, "errors": 0, "bytes_written": 0, "write_time": 0.0,
+            "latencies": deque(maxlen=max_latencies)}
+
+
+def atomic_write(path: str, content: str, fsync: bool = WRITE_FSYNC) -> int:
+    """
+    Write a file through a temporary file renamed over it, so readers see either the
+    previous or the new content, never a partial file.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = content.encode("utf-8")
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    return len(data)
+
+
+class FileWriter:
+    """
+    Write-behind file persistence with a background writer thread.
+
+    `write` queues the content of a file and returns at once. The writer thread
+    writes the queued files in batches, atomically (see atomic_write); when a file
+    is queued again before it was written, only its latest content is written.
+    Every write gets a sequence number; `flush` is the barrier that waits until the
+    writes queued before it are on disk, whatever is queued after it.
+    """
+
+    def __init__(self, batch_delay: float = WRITE_BATCH_DELAY):
+        self.batch_delay = batch_delay
+        self._pending = {}  # path -> (sequence, content, first enqueue time, run counters), in sequence order
+        self._sequence = 0  # Sequence number of the last queued (not coalesced) write
+        self._written = 0  # Writes up to this sequence number are done (writes finish in order)
+        self._condition = threading.Condition()
+        self._thread = None
+        self.stats = new_write_stats(WRITE_LATENCY_SAMPLES)  # Process-wide, bounded
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="file-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, path: str, content: str):
+        """
+        Queue a file write; a pending write of the same path is replaced.
+        """
+        run = _persistence_run.get()
+        with self._condition:
+            previous = self._pending.get(path)
+            if previous is None:
+                self._sequence += 1
+                self._pending[path] = (self._sequence, content, time.perf_counter(), run)
+            else:
+                # Replaced in place: the write keeps its sequence number and queue position
+                self._pending[path] = (previous[0], content, previous[2], run)
+            for counters in {id(scope): scope for scope in (self.stats, run) if scope is not None}.values():
+                counters["enqueued"] += 1
+                counters["coalesced"] += int(previous is not None)
+            self._ensure_thread()
+            self._condition.notify_all()
+
+    def pending(self, path: str):
+        """
+        Return the queued, not yet written content of a file (None if there is none).
+        """
+        with self._condition:
+            queued = self._pending.get(path)
+        return queued[1] if queued is not None else None
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until every write queued so far is on disk. Writes queued after the call
+        (e.g. by other sessions) are not waited for.
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        with self._condition:
+            target = self._sequence
+            return self._condition.wait_for(lambda: self._written >= target, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+            # Let quick successive writes of the same files coalesce before writing
+            time.sleep(self.batch_delay)
+            with self._condition:
+                batch, self._pending = self._pending, {}
+            for path, (sequence, content, enqueued_at, run) in batch.items():
+                start_time = time.perf_counter()
+                try:
+                    written = atomic_write(path, content)
+                    error = False
+                except Exception as e:
+                    logging.error(f"Failed to write {path}: {e}")
+                    written, error = 0, True
+                end_time = time.perf_counter()
+                with self._condition:
+                    for counters in {id(scope): scope for scope in (self.stats, run) if scope is not None}.values():
+                        counters["writes"] += int(not error)
+                        counters["errors"] += int(error)
+                        counters["bytes_written"] += written
+                        counters["write_time"] += end_time - start_time
+                        counters["latencies"].append(end_time - enqueued_at)
+                    self._written = sequence
+                    self._condition.notify_all()
+
+
+# Writer shared by every session and job of the process
+file_writer = FileWriter()
+
+
+def start_persistence_run() -> dict:
+    """
+    Start counting the file writes queued by the rest of the current run (and the
+    tasks it spawns).
+
+    Returns:
+        dict: The write counters of the run (see new_write_stats).
+    """
+    run = new_write_stats()
+    _persistence_run.set(run)
+    return run
+
+
+def persistence_stats(run: dict = None) -> dict:
+    """
+    Summarize write counters (those of the current run by default).
+
+    Returns:
+        dict: Files 'enqueued', writes 'coalesced' away, 'writes', 'errors',
+            'bytes_written', total 'write_time', and the p50/p95 latency from queueing
+            to disk ('latency_p50', 'latency_p95'), in seconds.
+    """
+    run = run or _persistence_run.get() or new_write_stats()
+    summary = {key: value for key, value in run.items() if key != "latencies"}
+    summary["latency_p50"] = percentile(run["latencies"], 50)
+    summary["latency_p95"] = percentile(run["latencies"], 95)
+    return summary
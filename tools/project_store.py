@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import pandas as pd
+from contextlib import contextmanager
+
+# SQLite file of a workspace's project store and how long a writer waits for a lock
+STORE_FILE_NAME = "project.db"
+STORE_BUSY_TIMEOUT = float(os.getenv("PROJECT_STORE_BUSY_TIMEOUT", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pending',
+    content_hash TEXT,
+    size INTEGER,
+    validation INTEGER,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS files_position ON files (position);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mode TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    metrics TEXT NOT NULL
+);
+"""
+
+# Open stores by database path, shared by every session and job of the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def content_hash(content: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file content.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ProjectStore:
+    """
+    Embedded SQLite store of a workspace's project, keyed by file path.
+
+    It holds the project tree (path, description, tree order), the status of each
+    file ('pending', 'generated' or 'failed') with the hash and size of its content,
+    the validation results of Step 3 and the metrics of each run. Every update
+    touches only the rows it changes. The database runs in WAL mode and each thread
+    uses its own connection, so readers never block the writer of a running job.
+
+    Async code records file statuses with `queue_files`, which returns at once: a
+    writer thread applies the queued updates in order, a batch per transaction, so
+    the event loop never waits on a database lock. `flush` waits for them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+        self._queued = []  # (files, status) updates waiting for the writer thread
+        self._sequence = 0  # Number of updates queued
+        self._applied = 0  # Number of updates applied
+        self._condition = threading.Condition()
+        self._writer = None
+
+    @classmethod
+    def open(cls, path: str) -> "ProjectStore":
+        """
+        Return the store of a database path, shared across threads.
+        """
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = cls(path)
+            return store
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=STORE_BUSY_TIMEOUT, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        return self._connection().execute(sql, params).fetchall()
+
+    # --- Project tree ---
+
+    def set_tree(self, tree: list):
+        """
+        Replace the project tree; every file starts 'pending'.
+
+        Args:
+            tree: Project tree entries with 'path' and 'description' keys, in order.
+        """
+        self.flush()  # Queued updates must not land on the new state
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM files")
+            connection.executemany(
+                "INSERT OR REPLACE INTO files (path, position, description, updated_at) VALUES (?, ?, ?, ?)",
+                [(item["path"], position, item.get("description", ""), time.time())
+                 for position, item in enumerate(tree)],
+            )
+
+    def tree(self) -> list:
+        """
+        Return the project tree entries ('path' and 'description'), in tree order.
+        """
+        rows = self._query("SELECT path, description FROM files ORDER BY position")
+        return [{"path": row["path"], "description": row["description"]} for row in rows]
+
+    def dataframe(self) -> pd.DataFrame:
+        """
+        Return the project tree as the DataFrame the build functions take.
+
+        Raises:
+            FileNotFoundError: If no project tree was stored yet (Step 1 has not run).
+        """
+        tree = self.tree()
+        if not tree:
+            raise FileNotFoundError(f"No project tree in {self.path}; run Step 1 first")
+        return pd.DataFrame(tree)
+
+    # --- File status ---
+
+    def update_file(self, path: str, status: str, content: str = None):
+        """
+        Set the status of one file, with the hash and size of its content when given.
+        """
+        self.update_files({path: content}, status)
+
+    def update_files(self, files: dict, status: str = "generated"):
+        """
+        Set the status of several files in a single transaction.
+
+        Args:
+            files: Mapping of path to content (None keeps the stored hash and size).
+            status: New status of the files.
+        """
+        with self._transaction() as connection:
+            self._upsert_files(connection, files, status)
+
+    @staticmethod
+    def _upsert_files(connection: sqlite3.Connection, files: dict, status: str):
+        now = time.time()
+        rows = [
+            (path, status, content_hash(content) if content is not None else None,
+             len(content.encode("utf-8")) if content is not None else None, now)
+            for path, content in files.items()
+        ]
+        # Files outside the tree (e.g. added by See-Saw) are appended after it
+        connection.executemany(
+            "INSERT INTO files (path, position, status, content_hash, size, updated_at) "
+            "VALUES (?1, (SELECT COALESCE(MAX(position), -1) + 1 FROM files), ?2, ?3, ?4, ?5) "
+            "ON CONFLICT (path) DO UPDATE SET status = ?2, content_hash = COALESCE(?3, content_hash), "
+            "size = COALESCE(?4, size), updated_at = ?5",
+            rows,
+        )
+
+    def queue_files(self, files: dict, status: str = "generated"):
+        """
+        Queue a status update (see update_files) for the writer thread and return at once.
+        """
+        with self._condition:
+            self._queued.append((dict(files), status))
+            self._sequence += 1
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._apply_queued, name="store-writer", daemon=True)
+                self._writer.start()
+            self._condition.notify_all()
+
+    def _apply_queued(self):
+        """Apply the queued updates in batches, one transaction each."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queued)
+                batch, self._queued = self._queued, []
+                batch_end = self._sequence
+            try:
+                with self._transaction() as connection:
+                    for files, status in batch:
+                        self._upsert_files(connection, files, status)
+            except sqlite3.Error as e:
+                logging.error(f"Could not update the project store {self.path}: {e}")
+            with self._condition:
+                self._applied = batch_end
+                self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until the updates queued so far are applied.
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        with self._condition:
+            target = self._sequence
+            return self._condition.wait_for(lambda: self._applied >= target, timeout)
+
+    def reset_files(self):
+        """
+        Mark every file 'pending' again before a new generation run.
+        """
+        self.flush()  # Queued updates must not land on the new state
+        with self._transaction() as connection:
+            connection.execute("UPDATE files SET status = 'pending', validation = NULL, updated_at = ?",
+                               (time.time(),))
+
+    def file(self, path: str) -> dict:
+        """
+        Return the stored row of a file (None if it is not in the store).
+        """
+        rows = self._query("SELECT * FROM files WHERE path = ?", (path,))
+        return dict(rows[0]) if rows else None
+
+    def statuses(self) -> dict:
+        """
+        Return the number of files per status.
+        """
+        return {row["status"]: row["count"]
+                for row in self._query("SELECT status, COUNT(*) AS count FROM files GROUP BY status")}
+
+    # --- Validation results ---
+
+    def set_validation(self, results: dict):
+        """
+        Store the validation result of each file in a single transaction.
+
+        Args:
+            results: Mapping of path to whether the file is valid.
+        """
+        with self._transaction() as connection:
+            connection.executemany("UPDATE files SET validation = ? WHERE path = ?",
+                                   [(int(valid), path) for path, valid in results.items()])
+
+    def validation(self) -> pd.DataFrame:
+        """
+        Return the validation results as a DataFrame with 'path' and 'validation' columns.
+        """
+        rows = self._query("SELECT path, validation FROM files WHERE validation IS NOT NULL ORDER BY position")
+        return pd.DataFrame([{"path": row["path"], "validation": bool(row["validation"])} for row in rows],
+                            columns=["path", "validation"])
+
+    # --- Run metrics ---
+
+    def record_run(self, mode: str, metrics: dict) -> int:
+        """
+        Store the metrics of a finished run.
+
+        Args:
+            mode: Generation mode of the run ("seesaw" or "standard").
+            metrics: The run's metrics (JSON-serializable, other values are stringified).
+
+        Returns:
+            int: The id of the run.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (mode, finished_at, metrics) VALUES (?, ?, ?)",
+                (mode, time.time(), json.dumps(metrics, default=str)),
+            )
+            return cursor.lastrowid
+
+    def runs(self, limit: int = None) -> list:
+        """
+        Return the stored runs, most recent first, with their metrics decoded.
+        """
+        sql = "SELECT * FROM runs ORDER BY id DESC" + (" LIMIT ?" if limit else "")
+        rows = self._query(sql, (limit,) if limit else ())
+        return [{**dict(row), "metrics": json.loads(row["metrics"])} for row in rows]
+
+    def clear(self):
+        """
+        Delete the project tree, the file statuses and the runs.
+        """
+        self.flush()  # Queued updates must not land on the new state
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM files")
+            connection.execute("DELETE FROM runs")
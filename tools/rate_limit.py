@@ -0,0 +1,272 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from tools.usage import record_throttle
+from tools.tracing import span, record_span
+
+# Provider budgets and retry policy shared by every LLM call of the process
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+POLL_INTERVAL = 0.05
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 520, 522, 524, 529}
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+# Retry index of the request being sent by the current task (see current_attempt)
+_attempt = contextvars.ContextVar("llm_attempt", default=0)
+
+
+def current_attempt() -> int:
+    """
+    Return the retry index (0 for the first attempt) of the request the current task
+    is sending through `rate_limited_call`.
+    """
+    return _attempt.get()
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `capacity` units per minute.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (amounts above capacity wait for a full bucket)."""
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parse a rate-limit reset duration ('1s', '6m0s', '250ms') or a number of seconds.
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    matches = DURATION_PATTERN.findall(value)
+    return sum(float(number) * units[unit] for number, unit in matches) if matches else None
+
+
+def error_status(error: Exception):
+    """
+    Return the HTTP status code carried by a client exception, if any.
+    """
+    for source in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "status"):
+            status = getattr(source, attribute, None)
+            if isinstance(status, int):
+                return status
+    return None
+
+
+def error_headers(error: Exception) -> dict:
+    """
+    Return the response headers carried by a client exception (empty if none).
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    return dict(headers) if headers else {}
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Return True for rate limits, transient server errors, timeouts and connection errors.
+    """
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, OSError)) or \
+        type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ClientConnectionError",
+                                 "ServerDisconnectedError", "ConnectError", "ConnectTimeout", "ReadError",
+                                 "ReadTimeout", "RemoteProtocolError")
+
+
+class RateLimiter:
+    """
+    Shared controller of the LLM request rate.
+
+    Calls first wait for the requests-per-minute and tokens-per-minute token buckets,
+    then for a free in-flight slot. The in-flight limit adapts: it is halved on a 429
+    response and grows back by one slot per `limit` successful calls (AIMD), and it is
+    lowered when the provider's rate-limit headers report fewer remaining requests.
+
+    State is protected by a thread lock and waits use `asyncio.sleep`, so a single
+    controller serves every event loop of the process.
+    """
+
+    def __init__(self, requests_per_minute: float = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = TOKENS_PER_MINUTE, max_in_flight: int = MAX_IN_FLIGHT):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.limit = float(max_in_flight)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Wait until a request of `tokens` estimated tokens may be sent.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.requests.refill()
+                self.tokens.refill()
+                wait = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                    0 if self.in_flight < int(self.limit) else POLL_INTERVAL,
+                )
+                if wait <= 0:
+                    self.requests.level -= 1
+                    self.tokens.level -= min(tokens, self.tokens.capacity)
+                    self.in_flight += 1
+                    return time.monotonic() - start
+            await asyncio.sleep(min(max(wait, POLL_INTERVAL), BACKOFF_MAX))
+
+    def release(self, estimated_tokens: int = 0, used_tokens: int = None, headers: dict = None,
+                success: bool = True):
+        """
+        Free an in-flight slot and settle the token bucket with the actual usage.
+
+        Args:
+            estimated_tokens: Tokens reserved by `acquire`.
+            used_tokens: Tokens actually used (None when unknown).
+            headers: Response headers, used to follow the provider's rate-limit state.
+            success: Whether the request succeeded; successes grow the in-flight limit.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.level -= used_tokens - min(estimated_tokens, self.tokens.capacity)
+            if success:
+                self.limit = min(self.max_in_flight, self.limit + 1 / self.limit)
+            if headers:
+                self._follow_headers(headers)
+
+    def _follow_headers(self, headers: dict):
+        """Align the buckets and the in-flight limit with the provider's x-ratelimit headers."""
+        headers = {key.lower(): value for key, value in headers.items()}
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None and remaining_tokens.isdigit():
+            self.tokens.level = min(self.tokens.level, float(remaining_tokens))
+        if remaining_requests is not None and remaining_requests.isdigit():
+            self.requests.level = min(self.requests.level, float(remaining_requests))
+            self.limit = max(1.0, min(self.limit, float(remaining_requests)))
+
+    def rate_limited(self, retry_after: float):
+        """
+        React to a 429 response: halve the in-flight limit and pause new requests.
+        """
+        with self._lock:
+            self.limit = max(1.0, self.limit / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            logging.warning(f"Rate limited; in-flight limit lowered to {int(self.limit)}, "
+                            f"pausing for {retry_after:.1f}s")
+
+
+rate_limiter = RateLimiter()
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Delay before the next attempt: the provider's Retry-After / reset headers when
+    present, otherwise full-jitter exponential backoff.
+    """
+    headers = {key.lower(): value for key, value in error_headers(error).items()}
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        delay = parse_duration(headers.get(name))
+        if delay:
+            return min(delay + random.uniform(0, BACKOFF_BASE), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+async def rate_limited_call(call, estimated_tokens: int, limiter: RateLimiter = None, hold: bool = False):
+    """
+    Run an LLM request under the shared rate limiter, retrying transient failures.
+
+    Args:
+        call: Zero-argument coroutine function performing the request. It returns the
+            response, the response headers (or None) and the tokens used (or None).
+        estimated_tokens: Estimated tokens of the request (prompt and completion).
+        limiter: Controller to use (defaults to the shared `rate_limiter`).
+        hold: Keep the in-flight slot after `call` returns, for streamed responses.
+
+    Returns:
+        The response of the first successful attempt. With `hold`, a tuple of the
+        response and a function (used_tokens=None) the caller must call in a
+        `finally` once it is consumed.
+
+    Raises:
+        Exception: The last error once retries are exhausted, or a non-retryable error.
+    """
+    limiter = limiter or rate_limiter
+    for attempt in range(MAX_RETRIES + 1):
+        queue_start = time.perf_counter()
+        record_throttle(await limiter.acquire(estimated_tokens))
+        record_span("rate_limiter", "llm.queue", queue_start, time.perf_counter(), attempt=attempt)
+        attempt_token = _attempt.set(attempt)
+        try:
+            response, headers, used_tokens = await call()
+        except Exception as e:
+            # Only a 429 keeps its token reservation; other failures never reached the
+            # model, so they must not drain the token bucket of healthy calls
+            limiter.release(estimated_tokens, None if error_status(e) == 429 else 0, success=False)
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt)
+            if error_status(e) == 429:
+                limiter.rate_limited(delay)
+            logging.warning(f"LLM request failed ({e}); retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+            record_throttle(delay, retries=1)
+            with span("llm.backoff", type(e).__name__, attempt=attempt):
+                await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled (e.g. a cancelled job): return the slot and the reserved tokens
+            limiter.release(estimated_tokens, 0, success=False)
+            raise
+        finally:
+            _attempt.reset(attempt_token)
+        if hold:
+            released = False
+
+            def release(used=None):
+                # Safe to call more than once (e.g. from a `finally` and on cancellation)
+                nonlocal released
+                if not released:
+                    released = True
+                    limiter.release(estimated_tokens, used, headers)
+
+            return response, release
+        limiter.release(estimated_tokens, used_tokens, headers)
+        return response
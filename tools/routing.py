@@ -0,0 +1,188 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from tools.usage import track_usage
+from tools.tracing import percentile
+
+# Roles of the LLM calls and the model tiers they can be routed to
+ROLES = ("planning", "main", "dependency", "verdict", "correction")
+TIER_MODELS = {
+    "openai": {
+        "strong": os.getenv("LLM_STRONG_MODEL", "gpt-4o"),
+        "cheap": os.getenv("LLM_CHEAP_MODEL", "gpt-4o-mini"),
+    },
+    "hf": {
+        "strong": os.getenv("HF_STRONG_MODEL", "codellama/CodeLlama-34b-Instruct-hf"),
+        "cheap": os.getenv("HF_CHEAP_MODEL", "codellama/CodeLlama-7b-Instruct-hf"),
+    },
+}
+# "single" sends every call to the strong tier. "tiered" lets the cheap tier decide
+# validation verdicts and escalates to the strong tier only to correct the main code.
+ROUTING_PROFILES = {
+    "single": {role: "strong" for role in ROLES},
+    "tiered": {**{role: "strong" for role in ROLES}, "verdict": "cheap"},
+}
+LLM_ROUTING = os.getenv("LLM_ROUTING", "single")
+# Per-role overrides of the profile, e.g. "dependency=cheap,verdict=cheap"
+LLM_ROLE_TIERS = os.getenv("LLM_ROLE_TIERS", "")
+
+# Routes and per-tier counters of the current run (see start_routing_run)
+_routing_run = contextvars.ContextVar("llm_routing_run", default=None)
+
+
+def parse_role_tiers(spec: str) -> dict:
+    """
+    Parse per-role tier overrides written as 'role=tier' pairs separated by commas.
+
+    Raises:
+        ValueError: If a role or tier is unknown.
+    """
+    routes = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        role, _, tier = pair.partition("=")
+        role, tier = role.strip(), tier.strip()
+        if role not in ROLES or tier not in TIER_MODELS["openai"]:
+            raise ValueError(f"Invalid role routing: {pair!r}")
+        routes[role] = tier
+    return routes
+
+
+def make_routes(profile: str = None, overrides: str = None) -> dict:
+    """
+    Build the role-to-tier routes of a profile, with per-role overrides applied.
+
+    Args:
+        profile: Routing profile (see ROUTING_PROFILES); None for LLM_ROUTING.
+        overrides: 'role=tier' pairs (see parse_role_tiers); None for LLM_ROLE_TIERS.
+
+    Returns:
+        dict: Mapping of role to tier.
+    """
+    profile = profile or LLM_ROUTING
+    if profile not in ROUTING_PROFILES:
+        raise ValueError(f"Unknown routing profile: {profile}")
+    return {**ROUTING_PROFILES[profile], **parse_role_tiers(LLM_ROLE_TIERS if overrides is None else overrides)}
+
+
+def start_routing_run(profile: str = None, overrides: str = None) -> dict:
+    """
+    Route the LLM calls of the rest of the current run (and the tasks it spawns)
+    and count their usage and latency per tier.
+
+    Args:
+        profile: Routing profile; None for LLM_ROUTING.
+        overrides: Per-role tier overrides; None for LLM_ROLE_TIERS.
+
+    Returns:
+        dict: The run's 'routes', per-tier counters ('tiers') and 'escalations'.
+    """
+    run = {"routes": make_routes(profile, overrides), "tiers": {}, "verdicts": 0, "escalations": 0}
+    _routing_run.set(run)
+    return run
+
+
+def current_routes() -> dict:
+    """
+    Return the role-to-tier routes of the current run (the default profile outside of one).
+    """
+    run = _routing_run.get()
+    return run["routes"] if run is not None else make_routes()
+
+
+def route_model(role: str, provider: str = "openai") -> str:
+    """
+    Return the model a call of `role` is routed to.
+
+    Args:
+        role: Role of the call (see ROLES).
+        provider: "openai" or "hf".
+    """
+    return TIER_MODELS[provider][current_routes()[role]]
+
+
+def escalates() -> bool:
+    """
+    Whether validation verdicts and main code corrections go to different tiers, so
+    verdicts are asked alone first and the correction only after a 'False'.
+    """
+    routes = current_routes()
+    return routes["verdict"] != routes["correction"]
+
+
+def record_verdict(escalated: bool):
+    """
+    Count a validation decided by the verdict tier, and whether it was escalated.
+    """
+    run = _routing_run.get()
+    if run is not None:
+        run["verdicts"] += 1
+        run["escalations"] += int(escalated)
+
+
+@contextmanager
+def routed_call(role: str, provider: str = "openai"):
+    """
+    Route the LLM call made inside the block and record its usage and latency
+    under its tier, including calls that fail or are cancelled (counted as errors).
+
+    Args:
+        role: Role of the call (see ROLES).
+        provider: "openai" or "hf".
+
+    Yields:
+        str: The model to call.
+    """
+    tier = current_routes()[role]
+    model = TIER_MODELS[provider][tier]
+    start_time = time.perf_counter()
+    failed = True
+    try:
+        with track_usage() as usage:
+            yield model
+        failed = False
+    finally:
+        run = _routing_run.get()
+        if run is not None:
+            stats = run["tiers"].setdefault(tier, {
+                "models": set(), "roles": set(), "calls": 0, "errors": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "total_tokens": 0, "cost": 0.0, "latencies": [],
+            })
+            stats["models"].add(model)
+            stats["roles"].add(role)
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens", "cost"):
+                stats[key] += usage[key]
+            stats["latencies"].append(time.perf_counter() - start_time)
+
+
+def routing_stats() -> dict:
+    """
+    Summarize the routing of the current run.
+
+    Returns:
+        dict: The 'routes', the number of 'verdicts' and of 'escalations' to the
+            correction tier, and per tier ('tiers') its models, roles, calls (with the
+            failed or cancelled ones as 'errors'), tokens, cost and latency (total, p50, p95).
+    """
+    run = _routing_run.get()
+    if run is None:
+        return {"routes": current_routes(), "verdicts": 0, "escalations": 0, "tiers": {}}
+    tiers = {}
+    for tier, stats in run["tiers"].items():
+        tiers[tier] = {
+            "models": sorted(stats["models"]),
+            "roles": sorted(stats["roles"]),
+            "calls": stats["calls"],
+            "errors": stats["errors"],
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["completion_tokens"],
+            "token_usage": stats["total_tokens"],
+            "cost": stats["cost"],
+            "latency_total": sum(stats["latencies"]),
+            "latency_p50": percentile(stats["latencies"], 50),
+            "latency_p95": percentile(stats["latencies"], 95),
+        }
+    return {"routes": dict(run["routes"]), "verdicts": run["verdicts"], "escalations": run["escalations"],
+            "tiers": tiers}
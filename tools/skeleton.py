@@ -0,0 +1,119 @@
+import re
+from tools.dependency_graph import is_directory, is_project_file
+
+# Journal scope of the skeleton (a run journal keeps it as the revision of this scope)
+SKELETON_SCOPE = "<skeleton>"
+
+# Marker of the skeleton request, and the section header of each file in its answer
+SKELETON_MARKER = "INTERFACE SKELETON"
+SKELETON_FILE_PATTERN = re.compile(r"^#{2,4}\s*File:\s*`?([^`\n]+?)`?\s*$", re.MULTILINE)
+CODE_FENCE_PATTERN = re.compile(r"^```[\w+-]*\n(.*?)\n?```\s*$", re.DOTALL)
+
+
+def build_skeleton_prompt(tree: list) -> str:
+    """
+    Create the prompt asking for the interface skeleton of a whole project tree.
+
+    Args:
+        tree: Project tree entries with 'path' and 'description' keys.
+
+    Returns:
+        The prompt.
+    """
+    files = "\n".join(f"- {item['path']}: {item['description']}" for item in tree if not is_directory(item["path"]))
+    return (
+        f"{SKELETON_MARKER}\n"
+        f"You are designing a project before it is implemented. These are its files:\n\n{files}\n\n"
+        "Write the interface skeleton of the whole project: for every source file, the imports between project "
+        "files, the function and method signatures, the classes and data models with their fields, the routes "
+        "and the exported names. Leave every body empty ('...' in Python, '{}' in JavaScript). "
+        "Skip documentation and configuration files.\n"
+        "Answer with one section per file: a line '### File: <path>' followed by its skeleton code. "
+        "Do not include explanations."
+    )
+
+
+def parse_skeleton(response: str, paths: list) -> dict:
+    """
+    Split the skeleton answer into the skeleton of each file.
+
+    Args:
+        response: The LLM answer, one '### File: <path>' section per file.
+        paths: Paths of the project tree; sections for other paths are ignored.
+
+    Returns:
+        dict: Mapping of path to skeleton code, for the files the answer covers.
+    """
+    known = set(paths)
+    skeletons = {}
+    matches = list(SKELETON_FILE_PATTERN.finditer(response))
+    for match, following in zip(matches, matches[1:] + [None]):
+        path = match.group(1).strip()
+        if path not in known:
+            # The model may drop the './generated/' prefix the tree paths carry
+            path = next((known_path for known_path in paths if known_path.endswith("/" + path.lstrip("./"))), None)
+            if path is None:
+                continue
+        body = response[match.end():following.start() if following else len(response)].strip()
+        fenced = CODE_FENCE_PATTERN.match(body)
+        skeletons[path] = fenced.group(1) if fenced else body
+    return skeletons
+
+
+def build_implementation_prompt(path: str, description: str, skeleton: str, context: dict) -> str:
+    """
+    Create the prompt implementing one file against the frozen project skeleton.
+
+    Args:
+        path: Path of the file to implement.
+        description: Purpose of the file.
+        skeleton: Interface skeleton of the file (may be empty, e.g. for documentation).
+        context: Mapping of path to skeleton (or summary) of the other files.
+
+    Returns:
+        The prompt.
+    """
+    interfaces = "\n".join(f"### Interface: {other}\n{code}" for other, code in context.items())
+    prompt = (
+        f"You are implementing one file of a project whose interfaces are fixed. "
+        f"The interfaces of the other files are:\n\n{interfaces}\n\n"
+        f"Now implement the file at '{path}' based on its purpose:\n{description}\n\n"
+    )
+    if skeleton:
+        prompt += (
+            f"Its interface is:\n\n{skeleton}\n\n"
+            "Keep every name, signature, route and data model of this interface exactly as given. "
+        )
+    prompt += (
+        "Use the other files only through their interfaces above. "
+        "Output only the code required for this file. Do not include explanations, comments, or additional context. "
+        "Simply return the raw code content."
+    )
+    if is_project_file(path) and path.endswith(".md"):
+        prompt += " Please create a professional README of this project."
+    return prompt
+
+
+def build_reconciliation_prompt(path: str, description: str, code: str, issues: list, context: dict) -> str:
+    """
+    Create the prompt fixing a file whose implementation drifted from the contract.
+
+    Args:
+        path: Path of the file.
+        description: Purpose of the file.
+        code: Current code of the file.
+        issues: Mismatches found with its skeleton and the files it uses.
+        context: Mapping of path to code (or summary) of the files it uses, and its skeleton.
+
+    Returns:
+        The prompt.
+    """
+    references = "\n".join(f"### {other}\n{text}" for other, text in context.items())
+    problems = "\n".join(f"- {issue}" for issue in issues)
+    return (
+        f"The following files and interfaces are final:\n\n{references}\n\n"
+        f"The file at '{path}' ({description}) is:\n\n{code}\n\n"
+        f"It has these mismatches:\n{problems}\n\n"
+        "Return the corrected code of this file, compatible with the files above and its interface. "
+        "Output only the code. Do not include explanations, comments, or additional context."
+    )
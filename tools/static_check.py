@@ -0,0 +1,487 @@
+import os
+import re
+import ast
+from tools.dependency_graph import resolve_imports, JS_EXTENSIONS
+
+# Whether two files of the same language that do not import each other count as compatible.
+# Off by default: an import that fails to resolve (e.g. a package path the tree does not
+# map) would otherwise pass unchecked, so such pairs are left to the LLM validator.
+STATIC_CHECK_UNCOUPLED = os.getenv("STATIC_CHECK_UNCOUPLED", "0") == "1"
+
+JS_COMMENT_PATTERN = re.compile(r"/\*.*?\*/|(?<![:'\"\\])//[^\n]*", re.DOTALL)
+JS_STRING_PATTERN = re.compile(r"'(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\"|`(?:\\.|[^`\\])*`", re.DOTALL)
+JS_IMPORT_STATEMENT = re.compile(r"""\bimport\s+(?:type\s+)?([\w$*{}\s,]+?)\s+from\s*['"]([^'"]+)['"]""")
+JS_SIDE_EFFECT_IMPORT = re.compile(r"""\bimport\s*['"]([^'"]+)['"]""")
+JS_DYNAMIC_IMPORT = re.compile(r"""\bimport\s*\(\s*['"]([^'"]+)['"]""")
+JS_REQUIRE = re.compile(r"""\b(?:const|let|var)\s+(\{[^}]*\}|[\w$]+)\s*=\s*require\s*\(\s*['"]([^'"]+)['"]\s*\)""")
+JS_EXPORT_DECLARATION = re.compile(
+    r"\bexport\s+(?:declare\s+)?(?:async\s+)?(?:function\s*\*?|class|const|let|var|interface|type|enum|abstract\s+class)"
+    r"\s+([\w$]+)"
+)
+JS_EXPORT_DEFAULT = re.compile(r"\bexport\s+default\b")
+JS_EXPORT_LIST = re.compile(r"\bexport\s+(?:type\s+)?\{([^}]*)\}")
+JS_EXPORT_STAR = re.compile(r"\bexport\s+\*\s+(?:as\s+([\w$]+)\s+)?from\b")
+JS_COMMONJS_OBJECT = re.compile(r"\bmodule\.exports\s*=\s*\{")
+JS_COMMONJS_VALUE = re.compile(r"\bmodule\.exports\s*=\s*(?!\{)")
+JS_COMMONJS_PROPERTY = re.compile(r"\b(?:module\.)?exports\.([\w$]+)\s*=")
+
+
+def file_language(path: str) -> str:
+    """
+    Return 'py' or 'js' for the files the checker understands, None otherwise.
+    """
+    _, extension = os.path.splitext(path)
+    if extension == ".py":
+        return "py"
+    if extension in JS_EXTENSIONS:
+        return "js"
+    return None
+
+
+def python_signature(args: ast.arguments, skip_first: bool = False) -> dict:
+    """
+    Describe the parameters of a Python function for call checks.
+    """
+    positional = [arg.arg for arg in args.posonlyargs + args.args]
+    required = len(positional) - len(args.defaults)
+    posonly = len(args.posonlyargs)
+    if skip_first and positional:
+        positional, required, posonly = positional[1:], max(0, required - 1), max(0, posonly - 1)
+    return {
+        "positional": positional,
+        "required": required,
+        "posonly": posonly,
+        "kwonly": [arg.arg for arg in args.kwonlyargs],
+        "required_kwonly": {arg.arg for arg, default in zip(args.kwonlyargs, args.kw_defaults) if default is None},
+        "varargs": args.vararg is not None,
+        "varkw": args.kwarg is not None,
+    }
+
+
+def python_class_signature(node: ast.ClassDef):
+    """
+    Describe the constructor of a class, or return None when it cannot be known
+    (inherited constructor, metaclass or decorator magic).
+    """
+    for child in node.body:
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) and child.name == "__init__":
+            return python_signature(child.args, skip_first=True)
+    decorators = [ast.unparse(decorator.func if isinstance(decorator, ast.Call) else decorator)
+                  for decorator in node.decorator_list]
+    if decorators == ["dataclass"] or decorators == ["dataclasses.dataclass"]:
+        fields = [child for child in node.body if isinstance(child, ast.AnnAssign)
+                  and isinstance(child.target, ast.Name) and "ClassVar" not in ast.unparse(child.annotation)]
+        positional = [field.target.id for field in fields]
+        required = 0
+        while required < len(fields) and fields[required].value is None:
+            required += 1
+        if any(field.value is None for field in fields[required:]):
+            return None
+        return {"positional": positional, "required": required, "posonly": 0, "kwonly": [],
+                "required_kwonly": set(), "varargs": False, "varkw": False}
+    if node.decorator_list or node.keywords or any(ast.unparse(base) != "object" for base in node.bases):
+        return None
+    return python_signature(ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[]))
+
+
+def top_level_statements(body: list):
+    """
+    Yield the module-level statements, including those nested in if/try/with blocks.
+    """
+    for node in body:
+        yield node
+        if isinstance(node, (ast.If, ast.Try, ast.With)):
+            yield from top_level_statements(node.body)
+            yield from top_level_statements(getattr(node, "orelse", []))
+            yield from top_level_statements(getattr(node, "finalbody", []))
+            for handler in getattr(node, "handlers", []):
+                yield from top_level_statements(handler.body)
+
+
+def python_definitions(tree: ast.Module):
+    """
+    List the names a Python module defines at top level.
+
+    Returns:
+        tuple: Mapping of name to call signature (None when unknown or not callable)
+            and whether the module may define other names dynamically (star import,
+            module `__getattr__`).
+    """
+    definitions = {}
+    dynamic = False
+    for node in top_level_statements(tree.body):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            definitions[node.name] = python_signature(node.args)
+            dynamic = dynamic or node.name == "__getattr__"
+        elif isinstance(node, ast.ClassDef):
+            definitions[node.name] = python_class_signature(node)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for name in ast.walk(target):
+                    if isinstance(name, ast.Name):
+                        definitions[name.id] = None
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    dynamic = True
+                else:
+                    definitions[alias.asname or alias.name.split(".")[0]] = None
+    return definitions, dynamic
+
+
+def check_call(signature: dict, call: ast.Call, name: str):
+    """
+    Compare a call with the signature of the function it calls.
+
+    Returns:
+        str: The mismatch, '' when the call matches, or None when the call passes
+            unpacked arguments that cannot be checked.
+    """
+    if any(isinstance(arg, ast.Starred) for arg in call.args) or any(kw.arg is None for kw in call.keywords):
+        return None
+    positional = signature["positional"]
+    keywords = [kw.arg for kw in call.keywords]
+    if len(call.args) > len(positional) and not signature["varargs"]:
+        return f"{name}() takes {len(positional)} positional arguments but {len(call.args)} were given"
+    bound = positional[:len(call.args)]
+    for keyword in keywords:
+        if keyword in bound:
+            return f"{name}() got multiple values for argument '{keyword}'"
+        if keyword in positional[:signature["posonly"]]:
+            return f"{name}() got positional-only argument '{keyword}' as a keyword"
+        if keyword not in positional and keyword not in signature["kwonly"] and not signature["varkw"]:
+            return f"{name}() got an unexpected keyword argument '{keyword}'"
+    missing = [param for param in positional[:signature["required"]] if param not in bound and param not in keywords]
+    missing += sorted(signature["required_kwonly"] - set(keywords))
+    if missing:
+        return f"{name}() is missing required arguments {missing}"
+    return ""
+
+
+def python_import_bindings(importer_path: str, tree: ast.Module, target_path: str, tree_paths: list):
+    """
+    Find the names a Python module binds from the imports of a target file.
+
+    Returns:
+        tuple: Mapping of local name to the imported name, the local names bound to the
+            target module itself, and whether the target is star-imported.
+    """
+    def resolves(module: str) -> bool:
+        if module.startswith("."):
+            code = f"from {module} import _"
+        else:
+            code = f"import {module}"
+        return target_path in resolve_imports(importer_path, code, tree_paths)
+
+    symbols, modules, star = {}, set(), False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom):
+            base = "." * node.level + (node.module or "")
+            for alias in node.names:
+                if alias.name == "*":
+                    star = star or resolves(base)
+                elif resolves(f"{base}.{alias.name}" if node.module else f"{base}{alias.name}"):
+                    modules.add(alias.asname or alias.name)
+                elif resolves(base):
+                    symbols[alias.asname or alias.name] = alias.name
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if resolves(alias.name):
+                    modules.add(alias.asname or alias.name)
+    return symbols, modules, star
+
+
+def check_python_imports(importer_path: str, importer: ast.Module, target_path: str, target: ast.Module,
+                         tree_paths: list) -> dict:
+    """
+    Check the names a Python module uses from a target module against its definitions.
+
+    Returns:
+        dict: Whether the importer imports the target ('coupled'), the 'mismatches'
+            found, and what could not be 'undecided'.
+    """
+    symbols, modules, star = python_import_bindings(importer_path, importer, target_path, tree_paths)
+    result = {"coupled": bool(symbols or modules or star), "mismatches": [], "undecided": []}
+    if star:
+        result["undecided"].append(f"{importer_path} star-imports {target_path}")
+    if not (symbols or modules):
+        return result
+    definitions, dynamic = python_definitions(target)
+
+    def lookup(name: str, where: str):
+        if name in definitions:
+            return True
+        if dynamic:
+            result["undecided"].append(f"{name} may be defined dynamically in {target_path}")
+        else:
+            result["mismatches"].append(f"{where} uses '{name}', which {target_path} does not define")
+        return False
+
+    for local, name in symbols.items():
+        lookup(name, importer_path)
+    for node in ast.walk(importer):
+        if isinstance(node, ast.Attribute) and ast.unparse(node.value) in modules:
+            lookup(node.attr, importer_path)
+        if not isinstance(node, ast.Call):
+            continue
+        if isinstance(node.func, ast.Name) and node.func.id in symbols:
+            called = symbols[node.func.id]
+        elif isinstance(node.func, ast.Attribute) and ast.unparse(node.func.value) in modules:
+            called = node.func.attr
+        else:
+            continue
+        signature = definitions.get(called)
+        if signature is None:
+            continue  # Undefined (reported above), not callable, or a constructor that cannot be known
+        mismatch = check_call(signature, node, called)
+        if mismatch is None:
+            result["undecided"].append(f"{importer_path} calls {called}() with unpacked arguments")
+        elif mismatch:
+            result["mismatches"].append(f"{importer_path} line {node.lineno}: {mismatch}")
+    return result
+
+
+def strip_js(content: str) -> str:
+    """Remove the comments of a JS/TS source."""
+    return JS_COMMENT_PATTERN.sub("", content)
+
+
+def js_balanced(content: str) -> bool:
+    """
+    Return whether the brackets of a JS/TS source (strings removed) are balanced,
+    a cheap sign that the code is complete.
+    """
+    pairs = {")": "(", "]": "[", "}": "{"}
+    stack = []
+    for character in JS_STRING_PATTERN.sub("''", content):
+        if character in "([{":
+            stack.append(character)
+        elif character in pairs:
+            if not stack or stack.pop() != pairs[character]:
+                return False
+    return not stack
+
+
+def js_exports(content: str):
+    """
+    List the names a JS/TS module exports ('default' for its default export).
+
+    Returns:
+        tuple: The exported names and whether the module may export other names
+            (re-exported modules, `module.exports` set to a value).
+    """
+    names = set(JS_EXPORT_DECLARATION.findall(content))
+    dynamic = bool(JS_COMMONJS_VALUE.search(content))
+    if JS_EXPORT_DEFAULT.search(content) or dynamic:
+        names.add("default")
+    for clause in JS_EXPORT_LIST.findall(content):
+        for item in clause.split(","):
+            item = item.strip().removeprefix("type ").strip()
+            if item:
+                names.add(item.split(" as ")[-1].strip())
+    for namespace in JS_EXPORT_STAR.findall(content):
+        if namespace:
+            names.add(namespace)
+        else:
+            dynamic = True
+    for match in JS_COMMONJS_OBJECT.finditer(content):
+        names.add("default")
+        depth, start = 1, match.end()
+        end = start
+        while end < len(content) and depth:
+            depth += {"{": 1, "}": -1}.get(content[end], 0)
+            end += 1
+        body, depth, keys = content[start:end - 1], 0, [""]
+        for character in body:
+            depth += {"{": 1, "(": 1, "[": 1, "}": -1, ")": -1, "]": -1}.get(character, 0)
+            if character == "," and depth == 0:
+                keys.append("")
+            else:
+                keys[-1] += character
+        for key in keys:
+            found = re.match(r"\s*(?:async\s+)?([\w$]+)", key)
+            if found:
+                names.add(found.group(1))
+    names.update(JS_COMMONJS_PROPERTY.findall(content))
+    return names, dynamic
+
+
+def js_import_bindings(importer_path: str, content: str, target_path: str, tree_paths: list):
+    """
+    Find the names a JS/TS module imports from a target file.
+
+    Returns:
+        tuple: Mapping of local name to the imported name ('default' for a default
+            import), the namespace bindings, and whether the target is imported in a
+            way that cannot be checked (side effects only count as coupling).
+    """
+    def resolves(specifier: str) -> bool:
+        return target_path in resolve_imports(importer_path, f"import x from '{specifier}'", tree_paths)
+
+    symbols, namespaces, coupled, dynamic = {}, set(), False, False
+    for clause, specifier in JS_IMPORT_STATEMENT.findall(content):
+        if not resolves(specifier):
+            continue
+        coupled = True
+        named = re.search(r"\{([^}]*)\}", clause)
+        if named:
+            for item in named.group(1).split(","):
+                item = item.strip().removeprefix("type ").strip()
+                if item:
+                    imported, _, local = item.partition(" as ")
+                    symbols[(local or imported).strip()] = imported.strip()
+        rest = re.sub(r"\{[^}]*\}", "", clause)
+        namespace = re.search(r"\*\s*as\s+([\w$]+)", rest)
+        if namespace:
+            namespaces.add(namespace.group(1))
+            rest = rest.replace(namespace.group(0), "")
+        default = rest.strip(" ,")
+        if default:
+            symbols[default] = "default"
+    for pattern in (JS_SIDE_EFFECT_IMPORT, JS_DYNAMIC_IMPORT):
+        for specifier in pattern.findall(content):
+            if resolves(specifier):
+                coupled = True
+                dynamic = dynamic or pattern is JS_DYNAMIC_IMPORT
+    for binding, specifier in JS_REQUIRE.findall(content):
+        if not resolves(specifier):
+            continue
+        coupled = True
+        if binding.startswith("{"):
+            for item in binding.strip("{}").split(","):
+                imported, _, local = item.partition(":")
+                if imported.strip():
+                    symbols[(local or imported).strip()] = imported.strip()
+        else:
+            namespaces.add(binding)
+    return symbols, namespaces, coupled, dynamic
+
+
+def check_js_imports(importer_path: str, importer: str, target_path: str, target: str, tree_paths: list) -> dict:
+    """
+    Check the names a JS/TS module imports from a target module against its exports.
+
+    Only names are checked: JavaScript calls accept any number of arguments.
+
+    Returns:
+        dict: Whether the importer imports the target ('coupled'), the 'mismatches'
+            found, and what could not be 'undecided'.
+    """
+    symbols, namespaces, coupled, dynamic = js_import_bindings(importer_path, importer, target_path, tree_paths)
+    result = {"coupled": coupled, "mismatches": [], "undecided": []}
+    if dynamic:
+        result["undecided"].append(f"{importer_path} imports {target_path} dynamically")
+    if not (symbols or namespaces):
+        return result
+    exports, reexports = js_exports(target)
+    used = set(symbols.values())
+    for namespace in namespaces:
+        used.update(re.findall(rf"(?<![\w$.]){re.escape(namespace)}\.([\w$]+)", importer))
+    for name in sorted(used):
+        if name in exports:
+            continue
+        if reexports:
+            result["undecided"].append(f"{name} may be re-exported by {target_path}")
+        else:
+            result["mismatches"].append(f"{importer_path} imports '{name}', which {target_path} does not export")
+    return result
+
+
+def check_compatibility(main_path: str, main_code: str, dep_path: str, dep_code: str, tree_paths: list):
+    """
+    Statically check a main file and a dependency before asking the LLM validator.
+
+    Both files are parsed (`ast` for Python, a lightweight scan for JS/TS), the imports
+    between them are resolved with `resolve_imports`, and the names each uses from the
+    other are compared with the definitions; Python calls are also checked against the
+    signatures of the functions and classes they call.
+
+    Args:
+        main_path: Tree path of the main file.
+        main_code: Code of the main file.
+        dep_path: Tree path of the dependency.
+        dep_code: Code of the dependency.
+        tree_paths: All file paths of the project tree.
+
+    Returns:
+        tuple: The verdict (True when the pair is compatible, False on a mismatch,
+            None when the check cannot decide) and the reason.
+    """
+    language = file_language(main_path)
+    if language is None or file_language(dep_path) is None:
+        return None, "unsupported file type"
+    if file_language(dep_path) != language:
+        return None, "files in different languages"
+
+    if language == "py":
+        try:
+            main_tree, dep_tree = ast.parse(main_code), ast.parse(dep_code)
+        except (SyntaxError, ValueError) as e:
+            return None, f"code does not parse: {e}"
+        results = [check_python_imports(main_path, main_tree, dep_path, dep_tree, tree_paths),
+                   check_python_imports(dep_path, dep_tree, main_path, main_tree, tree_paths)]
+    else:
+        main_code, dep_code = strip_js(main_code), strip_js(dep_code)
+        if not js_balanced(main_code) or not js_balanced(dep_code):
+            return None, "code has unbalanced brackets"
+        results = [check_js_imports(main_path, main_code, dep_path, dep_code, tree_paths),
+                   check_js_imports(dep_path, dep_code, main_path, main_code, tree_paths)]
+
+    mismatches = [mismatch for result in results for mismatch in result["mismatches"]]
+    undecided = [reason for result in results for reason in result["undecided"]]
+    if mismatches:
+        return False, "; ".join(mismatches)
+    if undecided:
+        return None, "; ".join(undecided)
+    if any(result["coupled"] for result in results):
+        return True, "imported names match their definitions"
+    if STATIC_CHECK_UNCOUPLED:
+        return True, "the files do not import each other"
+    return None, "the files do not import each other"
+
+
+def check_contract(path: str, skeleton: str, code: str):
+    """
+    Compare the implementation of a file with its interface skeleton.
+
+    Args:
+        path: Tree path of the file.
+        skeleton: Interface skeleton of the file (signatures, classes, exports).
+        code: Implemented code of the file.
+
+    Returns:
+        list: The deviations (missing names, changed Python parameters), or None when
+            the file type is not supported or either version does not parse.
+    """
+    language = file_language(path)
+    if language == "py":
+        try:
+            skeleton_tree = ast.parse(skeleton)
+            expected, _ = python_definitions(skeleton_tree)
+            actual, dynamic = python_definitions(ast.parse(code))
+        except (SyntaxError, ValueError):
+            return None
+        # Imports of the skeleton are not part of the file's own interface
+        for node in top_level_statements(skeleton_tree.body):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    expected.pop(alias.asname or alias.name.split(".")[0], None)
+        issues = []
+        for name, signature in expected.items():
+            if name not in actual:
+                if not dynamic:
+                    issues.append(f"'{name}' of the skeleton is not defined")
+            elif signature is not None and actual[name] is not None and \
+                    (signature["positional"], signature["kwonly"]) != (actual[name]["positional"], actual[name]["kwonly"]):
+                issues.append(f"parameters of '{name}' changed from {signature['positional'] + signature['kwonly']} "
+                              f"to {actual[name]['positional'] + actual[name]['kwonly']}")
+        return issues
+    if language == "js":
+        skeleton, code = strip_js(skeleton), strip_js(code)
+        if not js_balanced(code):
+            return None
+        expected, _ = js_exports(skeleton)
+        actual, dynamic = js_exports(code)
+        return [] if dynamic else [f"'{name}' of the skeleton is not exported" for name in sorted(expected - actual)]
+    return None
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import atexit
+import asyncio
+import logging
+import itertools
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Where the Chrome trace of the session is written at exit, and how many spans it keeps
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.getcwd(), "traces", "trace.json"))
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "200000"))
+PERCENTILES = (50, 95, 99)
+
+# Run traces the current task records into (see start_trace_run) and the enclosing span
+_trace_scopes = contextvars.ContextVar("trace_scopes", default=())
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Return the q-th percentile of values, linearly interpolated between ranks.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Trace:
+    """
+    Collection of timed spans.
+
+    Span times come from `time.perf_counter`, a monotonic clock, and are stored
+    relative to the creation of the trace.
+    """
+
+    def __init__(self, name: str = "trace", max_spans: int = None):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add(self, span: dict):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        """
+        Summarize span durations per span type.
+
+        Returns:
+            dict: For each kind, the 'count', 'total' and p50/p95/p99 durations in seconds.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        durations = {}
+        for span in spans:
+            durations.setdefault(span["kind"], []).append(span["duration"])
+        summary = {}
+        for kind, values in sorted(durations.items()):
+            summary[kind] = {"count": len(values), "total": sum(values)}
+            for q in PERCENTILES:
+                summary[kind][f"p{q}"] = percentile(values, q)
+        return summary
+
+    def to_chrome(self) -> dict:
+        """
+        Convert the spans to the Chrome trace event format (chrome://tracing, Perfetto).
+
+        Each asyncio task or thread becomes a track; span attributes go to 'args'.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        tracks = {}
+        events = []
+        for span in spans:
+            tid = tracks.setdefault(span["track"], len(tracks) + 1)
+            events.append({
+                "name": span["name"],
+                "cat": span["kind"],
+                "ph": "X",
+                "ts": round((span["start"] - self.origin) * 1e6, 3),
+                "dur": round(span["duration"] * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+                "args": dict(span["attributes"], span_id=span["id"], parent_id=span["parent"]),
+            })
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": track}}
+                   for track, tid in tracks.items()]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace": self.name}}
+
+    def export(self, path: str = TRACE_FILE) -> str:
+        """
+        Write the trace to a Chrome trace JSON file.
+
+        Returns:
+            str: The path written.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A temporary file per writer, so concurrent exports never share one
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                json.dump(self.to_chrome(), file)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return path
+
+
+def export_trace(trace: Trace, path: str = TRACE_FILE):
+    """
+    Export a trace, logging instead of raising when the file cannot be written.
+    """
+    try:
+        trace.export(path)
+    except OSError as e:
+        logging.warning(f"Could not export the trace to {path}: {e}")
+
+
+# Spans of the whole process, whatever run they belong to; exported once, at exit
+session_trace = Trace("session", max_spans=TRACE_MAX_SPANS)
+atexit.register(lambda: export_trace(session_trace) if session_trace.spans else None)
+
+
+def current_track() -> str:
+    """
+    Name of the track of the running code: its asyncio task, or its thread.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    thread = threading.current_thread().name
+    return f"{thread}/{task.get_name()}" if task is not None else thread
+
+
+def record_span(name: str, kind: str, start: float, end: float, parent: int = None, span_id: int = None,
+                **attributes) -> dict:
+    """
+    Record a span measured by the caller into the session trace and the active run traces.
+
+    Args:
+        name: Name of the span (e.g. the file or model concerned).
+        kind: Span type, used to group spans in summaries.
+        start: Start time from `time.perf_counter`.
+        end: End time from `time.perf_counter`.
+        parent: Id of the enclosing span (defaults to the current span).
+        span_id: Id of the span (defaults to a new id).
+        **attributes: Extra data shown with the span.
+
+    Returns:
+        dict: The span.
+    """
+    span = {
+        "id": span_id or next(_span_ids),
+        "parent": parent if parent is not None else _current_span.get(),
+        "name": name,
+        "kind": kind,
+        "start": start,
+        "duration": end - start,
+        "track": current_track(),
+        "attributes": attributes,
+    }
+    session_trace.add(span)
+    for trace in _trace_scopes.get():
+        trace.add(span)
+    return span
+
+
+@contextmanager
+def span(kind: str, name: str = None, **attributes):
+    """
+    Time the block as a span of the given type.
+
+    Spans nest: spans started inside the block (including in tasks it spawns) get
+    this span as their parent.
+
+    Args:
+        kind: Span type (e.g. 'llm.network', 'file_write').
+        name: Name of the span (defaults to the kind).
+        **attributes: Extra data shown with the span.
+
+    Yields:
+        dict: The span attributes, which the block may complete.
+    """
+    span_id = next(_span_ids)
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        _current_span.reset(token)
+        record_span(name or kind, kind, start, end, parent=parent, span_id=span_id, **attributes)
+
+
+def traced(kind: str, name=None):
+    """
+    Decorate a function (sync or async) so each call is recorded as a span.
+
+    Args:
+        kind: Span type.
+        name: Name of the spans, or a function of the call arguments returning it
+            (defaults to the function name).
+    """
+    def decorator(function):
+        def span_name(args, kwargs):
+            return name(*args, **kwargs) if callable(name) else name or function.__name__
+
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                with span(kind, span_name(args, kwargs)):
+                    return await function(*args, **kwargs)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with span(kind, span_name(args, kwargs)):
+                    return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_step(function):
+    """
+    Decorate a step function: trace it as a 'step' span.
+
+    Traces are not exported per step: a run exports its own trace when it ends (see
+    export_trace), and the session trace is exported at exit.
+    """
+    if asyncio.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with span("step", function.__name__):
+                return await function(*args, **kwargs)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span("step", function.__name__):
+                return function(*args, **kwargs)
+    return wrapper
+
+
+def start_trace_run(name: str = "run") -> Trace:
+    """
+    Start collecting the spans of the rest of the current run (and the tasks it spawns).
+
+    Like `start_usage_run`, the trace stays active until the current task ends.
+
+    Returns:
+        Trace: The trace of the run.
+    """
+    trace = Trace(name)
+    _trace_scopes.set(_trace_scopes.get() + (trace,))
+    return trace
@@ -0,0 +1,200 @@
+import os
+import logging
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+# Prices in USD per million tokens: (prompt, cached prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+
+# Stack of usage accumulators the current task records into (see track_usage)
+_usage_scopes = contextvars.ContextVar("llm_usage_scopes", default=())
+_encoders = {}
+_fallback_logged = False
+
+
+def new_usage() -> dict:
+    """
+    Return an empty usage accumulator.
+    """
+    return {
+        "calls": 0,
+        "estimated_calls": 0,
+        "response_cache_hits": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "total_tokens": 0,
+        "cost": 0.0,
+        "retries": 0,
+        "throttle_time": 0.0,
+    }
+
+
+def add_usage(target: dict, usage: dict):
+    """
+    Add the counters of one usage accumulator into another.
+    """
+    for key, value in usage.items():
+        target[key] = target.get(key, 0) + value
+
+
+@contextmanager
+def track_usage():
+    """
+    Accumulate the usage of every LLM call made inside the block.
+
+    Scopes nest: a call is recorded into every enclosing scope of the current task,
+    so a run-level scope and a per-iteration scope can be tracked at the same time.
+    Tasks spawned inside the block inherit the enclosing scopes.
+
+    Yields:
+        dict: The usage accumulator of the block (see `new_usage`).
+    """
+    usage = new_usage()
+    token = _usage_scopes.set(_usage_scopes.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _usage_scopes.reset(token)
+
+
+def start_usage_run() -> dict:
+    """
+    Start accumulating usage for the rest of the current run (and the tasks it spawns).
+
+    Unlike `track_usage`, no block is needed: the accumulator stays active until the
+    current task ends. Enclosing scopes keep receiving records.
+
+    Returns:
+        dict: The usage accumulator of the run (see `new_usage`).
+    """
+    usage = new_usage()
+    _usage_scopes.set(_usage_scopes.get() + (usage,))
+    return usage
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count tokens offline with tiktoken when available, otherwise estimate from length.
+
+    Args:
+        text: The text to count.
+        model: Model whose tokenizer should be used.
+
+    Returns:
+        int: Number of tokens.
+    """
+    global _fallback_logged
+    if not text:
+        return 0
+    if tiktoken is not None:
+        encoder = _encoders.get(model)
+        if encoder is None:
+            try:
+                try:
+                    encoder = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoder = tiktoken.get_encoding("o200k_base")
+            except Exception as e:  # e.g. the encoding cannot be downloaded offline
+                encoder = False
+                logging.warning(f"Could not load the tiktoken encoding of {model} ({e})")
+            _encoders[model] = encoder
+        if encoder:
+            return len(encoder.encode(text, disallowed_special=()))
+    if not _fallback_logged:
+        _fallback_logged = True
+        logging.warning(f"Estimating token counts as {CHARS_PER_TOKEN:g} characters per token; "
+                        "install tiktoken for exact offline counts")
+    return max(1, int(len(text) / CHARS_PER_TOKEN))
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    Compute the cost of a call in USD from MODEL_PRICES (0 for unknown models).
+    """
+    prompt_price, cached_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0, 0.0))
+    return (
+        (prompt_tokens - cached_tokens) * prompt_price
+        + cached_tokens * cached_price
+        + completion_tokens * completion_price
+    ) / 1_000_000
+
+
+def record_usage(model: str, usage: dict, prompt: str, completion: str, from_cache: bool = False) -> dict:
+    """
+    Record the usage of one LLM call into every active `track_usage` scope.
+
+    Provider usage data is used when available; otherwise prompt and completion
+    tokens are counted offline with `count_tokens`. Responses served from the local
+    response cache cost nothing and are only counted as cache hits.
+
+    Args:
+        model: Model name.
+        usage: The provider 'usage' field as a dict, or None when not reported.
+        prompt: Full prompt text (system and user), for the offline estimate.
+        completion: Generated text, for the offline estimate.
+        from_cache: Whether the response came from the local response cache.
+
+    Returns:
+        dict: The usage of this call.
+    """
+    call = new_usage()
+    call["calls"] = 1
+    if from_cache:
+        call["response_cache_hits"] = 1
+    elif usage:
+        call["prompt_tokens"] = usage.get("prompt_tokens") or 0
+        call["completion_tokens"] = usage.get("completion_tokens") or 0
+        details = usage.get("prompt_tokens_details") or {}
+        call["cached_tokens"] = details.get("cached_tokens") or 0
+    else:
+        call["estimated_calls"] = 1
+        call["prompt_tokens"] = count_tokens(prompt, model)
+        call["completion_tokens"] = count_tokens(completion, model)
+    call["total_tokens"] = call["prompt_tokens"] + call["completion_tokens"]
+    call["cost"] = call_cost(model, call["prompt_tokens"], call["completion_tokens"], call["cached_tokens"])
+
+    for scope in _usage_scopes.get():
+        add_usage(scope, call)
+    return call
+
+
+def record_throttle(seconds: float, retries: int = 0):
+    """
+    Record time spent waiting for the rate limiter or a retry into every active scope.
+
+    Args:
+        seconds: Time spent waiting.
+        retries: Number of retries this wait precedes.
+    """
+    for scope in _usage_scopes.get():
+        scope["throttle_time"] = scope.get("throttle_time", 0.0) + seconds
+        scope["retries"] = scope.get("retries", 0) + retries
+
+
+def usage_metrics(usage: dict) -> dict:
+    """
+    Flatten a usage accumulator into the per-iteration metric fields.
+
+    Returns:
+        dict: 'token_usage' (total tokens) plus prompt, completion, cached tokens, cost,
+            and the rate-limit 'throttle_time' and 'retries'.
+    """
+    return {
+        "token_usage": usage["total_tokens"],
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "cached_tokens": usage["cached_tokens"],
+        "cost": usage["cost"],
+        "throttle_time": usage["throttle_time"],
+        "retries": usage["retries"],
+    }
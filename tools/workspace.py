@@ -0,0 +1,196 @@
+import os
+import re
+import shutil
+import asyncio
+import logging
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from tools.project_store import ProjectStore, STORE_FILE_NAME
+from tools.persistence import file_writer
+
+# Root of the per-session workspaces and layout of a workspace
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", os.path.join(os.getcwd(), "workspaces"))
+PROJECT_NAME = "generated"
+LOG_FILE_NAME = "generation.log"
+TRACE_FILE_NAME = "trace.json"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+MAX_OPEN_LOGS = 64
+WORKSPACE_ID_PATTERN = re.compile(r"^[\w-]{1,64}$")
+
+# Workspace of the current session or job (see use_workspace)
+_current_workspace = contextvars.ContextVar("workspace", default=None)
+
+
+class Workspace:
+    """
+    Directory holding everything one session or job produces.
+
+    The generated files live under `PROJECT_NAME` (project tree paths start with
+    './generated/'), next to the project store (tree, file statuses, validation and
+    run metrics) and the generation log. The zip archive of the workspace is written
+    beside its directory.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.id = os.path.basename(self.path)
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def for_session(cls, workspace_id: str, root: str = WORKSPACE_ROOT) -> "Workspace":
+        """
+        Return the workspace of a session or job id, under `root`.
+
+        Raises:
+            ValueError: If the id is not a plain name (letters, digits, '_' and '-').
+        """
+        if not workspace_id or not WORKSPACE_ID_PATTERN.match(workspace_id):
+            raise ValueError(f"Invalid workspace id: {workspace_id!r}")
+        return cls(os.path.join(root, workspace_id))
+
+    @property
+    def store_path(self) -> str:
+        return os.path.join(self.path, STORE_FILE_NAME)
+
+    @property
+    def store(self) -> ProjectStore:
+        """The project store of the workspace (see tools.project_store)."""
+        return ProjectStore.open(self.store_path)
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.path, LOG_FILE_NAME)
+
+    @property
+    def trace_path(self) -> str:
+        """Chrome trace of the workspace's last Step 2 run."""
+        return os.path.join(self.path, TRACE_FILE_NAME)
+
+    @property
+    def files_root(self) -> str:
+        """Directory of the generated project files."""
+        return os.path.join(self.path, PROJECT_NAME)
+
+    @property
+    def archive_path(self) -> str:
+        return f"{self.path}.zip"
+
+    def file_path(self, tree_path: str) -> str:
+        """
+        Return the location in the workspace of a project tree path.
+        """
+        return os.path.join(self.path, tree_path.lstrip("./"))
+
+    def read_log(self) -> str:
+        """
+        Return the content of the generation log (empty if there is none yet).
+        """
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r") as log_file:
+                return log_file.read()
+        return ""
+
+    def clean(self):
+        """
+        Delete everything in the workspace except the log file, which is truncated,
+        and the project store, which is emptied (its connections stay open).
+        """
+        # Queued writes would otherwise recreate files after the cleanup
+        file_writer.flush()
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "w") as log_file:
+                log_file.truncate(0)
+        self.store.clear()
+        for item in os.listdir(self.path):
+            item_path = os.path.join(self.path, item)
+            if item_path == self.log_path or item.startswith(STORE_FILE_NAME):
+                continue
+            if os.path.isdir(item_path):
+                shutil.rmtree(item_path)
+            else:
+                os.remove(item_path)
+
+
+# Workspace used outside of any session or job (command line, single user)
+default_workspace = Workspace(os.path.join(os.getcwd(), PROJECT_NAME))
+
+
+def current_workspace() -> Workspace:
+    """
+    Return the workspace of the current session or job, or the default workspace.
+    """
+    return _current_workspace.get() or default_workspace
+
+
+@contextmanager
+def use_workspace(workspace: Workspace):
+    """
+    Make `workspace` the current workspace inside the block (and the tasks it spawns).
+    """
+    token = _current_workspace.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _current_workspace.reset(token)
+
+
+def in_workspace(function):
+    """
+    Decorate a function (sync or async) to accept a `workspace` keyword argument it
+    runs in; without it, the function runs in the current workspace.
+    """
+    if asyncio.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, workspace: Workspace = None, **kwargs):
+            with use_workspace(workspace or current_workspace()):
+                return await function(*args, **kwargs)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, workspace: Workspace = None, **kwargs):
+            with use_workspace(workspace or current_workspace()):
+                return function(*args, **kwargs)
+    return wrapper
+
+
+class WorkspaceLogHandler(logging.Handler):
+    """
+    Logging handler writing each record to the log file of the current workspace.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+        self._handlers = OrderedDict()  # log path -> file handler, least recently used first
+        self._handlers_lock = threading.Lock()
+
+    def _file_handler(self, path: str) -> logging.FileHandler:
+        with self._handlers_lock:
+            handler = self._handlers.pop(path, None)
+            if handler is None:
+                handler = logging.FileHandler(path, mode="a")
+                handler.setFormatter(self.formatter)
+                if len(self._handlers) >= MAX_OPEN_LOGS:
+                    _, oldest = self._handlers.popitem(last=False)
+                    oldest.close()
+            self._handlers[path] = handler
+            return handler
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            workspace = current_workspace()
+            os.makedirs(workspace.path, exist_ok=True)
+            handler = self._file_handler(workspace.log_path)
+            handler.emit(record)
+            handler.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        with self._handlers_lock:
+            for handler in self._handlers.values():
+                handler.close()
+            self._handlers.clear()
+        super().close()
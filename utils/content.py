@@ -15,7 +15,7 @@ def load_generated_data(base_path, output_pickle):
         pd.DataFrame: DataFrame containing the paths and content.
     """
     # Run the display_and_store_directory_content utility
-    display_and_store_directory_content(base_path)
+    display_and_store_directory_content(base_path, quiet=True)
 
     # Load the generated pickle file into a DataFrame
     try:
@@ -1,62 +1,169 @@
 import os
 import sys
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
-def display_and_store_directory_content(base_path):
+# Threads reading changed files during a scan
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "8"))
+
+
+def scan_directory(base_path):
+    """
+    List the directories and files under a directory with os.scandir, in os.walk
+    (top-down) order, without reading any content.
+
+    Args:
+        base_path (str): The root directory path to scan.
+
+    Returns:
+        list: (path, is_directory, size, mtime_ns) tuples; directories have size and mtime 0.
+    """
+    entries = []
+
+    def scan(directory):
+        try:
+            with os.scandir(directory) as iterator:
+                children = list(iterator)
+        except OSError:
+            return
+        subdirectories = [entry for entry in children if entry.is_dir()]
+        for entry in subdirectories:
+            entries.append((entry.path, True, 0, 0))
+        for entry in children:
+            if not entry.is_dir():
+                try:
+                    stat = entry.stat()
+                    size, mtime_ns = stat.st_size, stat.st_mtime_ns
+                except OSError:
+                    # e.g. a broken symlink: reading it reports the error
+                    size, mtime_ns = 0, 0
+                entries.append((entry.path, False, size, mtime_ns))
+        for entry in subdirectories:
+            if not entry.is_symlink():
+                scan(entry.path)
+
+    scan(base_path)
+    return entries
+
+
+def read_file_content(file_path):
+    """
+    Read a file as UTF-8 text, or describe the error that prevented it.
+
+    Returns:
+        tuple: The content (or the error description) and whether the read succeeded.
     """
-    Display all paths with directories and files along with their content, 
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read(), True
+    except Exception as e:
+        return f"Error reading file: {e}", False
+
+
+def load_manifest(output_file):
+    """
+    Load the content and the size/mtime manifest of a previous scan.
+
+    Returns:
+        dict: Mapping of path to (size, mtime_ns, content); empty if there is no
+            previous scan or it has no manifest columns.
+    """
+    if not os.path.exists(output_file):
+        return {}
+    try:
+        df = pd.read_pickle(output_file)
+    except Exception:
+        return {}
+    if not {"path", "content", "size", "mtime_ns"}.issubset(df.columns):
+        return {}
+    return {
+        path: (size, mtime_ns, content)
+        for path, size, mtime_ns, content in zip(df["path"], df["size"], df["mtime_ns"], df["content"])
+    }
+
+
+def display_and_store_directory_content(base_path, output_file=None, quiet=False, workers=SCAN_WORKERS):
+    """
+    Display all paths with directories and files along with their content,
     and store the information in a Pandas DataFrame.
 
+    The DataFrame keeps the size and modification time of each file. When the pickle
+    file already holds a previous scan, only the files that were added or whose size
+    or modification time changed are read again, in a pool of `workers` threads, and
+    the pickle is rewritten only if something changed.
+
     Args:
         base_path (str): The root directory path to scan.
+        output_file (str): Path of the pickle file. Defaults to
+            'extraction/<last component of base_path>.pkl'.
+        quiet (bool): Whether to skip printing the paths and contents.
+        workers (int): Number of threads reading the changed files.
 
     Returns:
-        None: Prints paths and content, and saves the DataFrame as a pickle file.
+        dict: Scan counts: 'files', 'read' (new or changed), 'reused', 'removed' and
+            'failed' (unreadable files, read again by the next scan).
     """
+    if output_file is None:
+        # Create the 'extraction' directory if it doesn't exist
+        extraction_dir = "extraction"
+        if not os.path.exists(extraction_dir):
+            os.makedirs(extraction_dir)
+
+        # Use the last component of the base path as the file name
+        base_name = os.path.basename(os.path.normpath(base_path))
+        output_file = os.path.join(extraction_dir, f"{base_name}.pkl")
+
+    previous = load_manifest(output_file)
+    entries = scan_directory(base_path)
+
+    # Read only the files that are new or changed since the previous scan
+    changed = [
+        path for path, is_directory, size, mtime_ns in entries
+        if not is_directory and previous.get(path, (None, None))[:2] != (size, mtime_ns)
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        contents = dict(zip(changed, pool.map(read_file_content, changed)))
+    # Failed reads get no size/mtime in the manifest, so the next scan tries them again
+    failed = {path for path, (_, ok) in contents.items() if not ok}
+
     data = []  # To store path and content as rows for the DataFrame
+    for path, is_directory, size, mtime_ns in entries:
+        if is_directory:
+            # Store directories (no content)
+            content = ""
+            if not quiet:
+                print(f"Directory: {path}")
+        else:
+            # Store files and their content
+            content = contents[path][0] if path in contents else previous[path][2]
+            if path in failed:
+                size, mtime_ns = -1, -1
+            if not quiet:
+                print(f"\nFile: {path}")
+                print("-" * 40)
+                print(content)
+                print("-" * 40)
+        data.append({"path": path, "content": content, "size": size, "mtime_ns": mtime_ns})
+
+    current_paths = {path for path, _, _, _ in entries}
+    removed = sum(1 for path in previous if path not in current_paths)
+    file_count = sum(1 for _, is_directory, _, _ in entries if not is_directory)
+    stats = {"files": file_count, "read": len(changed), "reused": file_count - len(changed), "removed": removed,
+             "failed": len(failed)}
 
-    for root, dirs, files in os.walk(base_path):
-        # Store directories (no content)
-        for d in dirs:
-            dir_path = os.path.join(root, d)
-            data.append({"path": dir_path, "content": ""})
-            print(f"Directory: {dir_path}")
-
-        # Store files and their content
-        for f in files:
-            file_path = os.path.join(root, f)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
-            except Exception as e:
-                content = f"Error reading file: {e}"
-            
-            data.append({"path": file_path, "content": content})
-            print(f"\nFile: {file_path}")
-            print("-" * 40)
-            print(content)
-            print("-" * 40)
-
-    # Create a DataFrame
-    df = pd.DataFrame(data)
-
-    # Create the 'extraction' directory if it doesn't exist
-    extraction_dir = "extraction"
-    if not os.path.exists(extraction_dir):
-        os.makedirs(extraction_dir)
-
-    # Use the last component of the base path as the file name
-    base_name = os.path.basename(os.path.normpath(base_path))
-    output_file = os.path.join(extraction_dir, f"{base_name}.pkl")
-
-    # Save the DataFrame to a pickle file
-    df.to_pickle(output_file)
-    print(f"\nDataFrame saved to {output_file}")
+    # Save the DataFrame to a pickle file, unless the previous scan is still current
+    new_directories = any(is_directory and path not in previous for path, is_directory, _, _ in entries)
+    if changed or removed or new_directories or not os.path.exists(output_file):
+        df = pd.DataFrame(data, columns=["path", "content", "size", "mtime_ns"])
+        df.to_pickle(output_file)
+        if not quiet:
+            print(f"\nDataFrame saved to {output_file}")
+    return stats
 
 if __name__ == "__main__":
     # Ensure a directory path is provided as an argument
     if len(sys.argv) < 2:
-        print("Usage: python utils\\extract_all_content.py <directory>")
+        print("Usage: python utils\\extract_all_content.py <directory> [--quiet]")
         sys.exit(1)
 
     # Get the directory path from the command-line arguments
@@ -64,6 +171,6 @@ if __name__ == "__main__":
 
     # Execute the function
     if os.path.exists(directory_path):
-        display_and_store_directory_content(directory_path)
+        display_and_store_directory_content(directory_path, quiet="--quiet" in sys.argv[2:])
     else:
         print(f"Error: The path '{directory_path}' does not exist.")
@@ -29,12 +29,20 @@ def generate_evaluation_csv(eval_path, metrics):
         eval_path: Path to save the evaluation files.
         metrics: A dictionary containing evaluation metrics.
     """
-    # Data for token usage
+    # Data for token usage (prompt, completion and cached breakdown when recorded)
     token_usage_data = [
-        ["Method", "Token Usage (Tokens)"],
-        ["See-Saw", metrics["seesaw"]["token_usage_total"]],
-        ["Standard", metrics["standard"]["token_usage_total"]]
+        ["Method", "Token Usage (Tokens)", "Prompt Tokens", "Completion Tokens", "Cached Tokens", "Cost (USD)"]
     ]
+    for method, label in (("seesaw", "See-Saw"), ("standard", "Standard")):
+        method_data = metrics[method]
+        token_usage_data.append([
+            label,
+            method_data["token_usage_total"],
+            method_data.get("prompt_tokens_total", ""),
+            method_data.get("completion_tokens_total", ""),
+            method_data.get("cached_tokens_total", ""),
+            method_data.get("cost_total", ""),
+        ])
     write_csv(os.path.join(eval_path, "token_usage.csv"), token_usage_data[1:], token_usage_data[0])
 
     # Data for dependency alignment
@@ -54,7 +62,9 @@ def generate_evaluation_csv(eval_path, metrics):
     write_csv(os.path.join(eval_path, "execution_time.csv"), execution_time_data[1:], execution_time_data[0])
 
     # Data for iterations (token usage and execution time per iteration)
-    tokens_data = [["Method", "Iteration", "Type", "Token Usage", "Execution Time"]]
+    tokens_data = [["Method", "Iteration", "Type", "Token Usage", "Execution Time",
+                    "Prompt Tokens", "Completion Tokens", "Cached Tokens", "Cost (USD)",
+                    "Context Tokens", "Full Context Tokens", "Output Tokens Saved", "Throttle Time", "Retries"]]
     for method, method_data in metrics.items():
         for iteration in method_data["iterations"]:
             tokens_data.append([
@@ -62,10 +72,68 @@ def generate_evaluation_csv(eval_path, metrics):
                 iteration["iteration"],
                 iteration["type"],
                 iteration["token_usage"],
-                iteration["execution_time"]
+                iteration["execution_time"],
+                iteration.get("prompt_tokens", ""),
+                iteration.get("completion_tokens", ""),
+                iteration.get("cached_tokens", ""),
+                iteration.get("cost", ""),
+                iteration.get("context_tokens", ""),
+                iteration.get("full_context_tokens", ""),
+                iteration.get("output_tokens_saved", ""),
+                iteration.get("throttle_time", ""),
+                iteration.get("retries", ""),
             ])
     write_csv(os.path.join(eval_path, "tokens.csv"), tokens_data[1:], tokens_data[0])
 
+    # Data for latency (duration percentiles per span type, when traced)
+    latency_data = [["Method", "Span Type", "Count", "Total (Seconds)", "p50 (Seconds)", "p95 (Seconds)",
+                     "p99 (Seconds)"]]
+    for method, method_data in metrics.items():
+        for kind, stats in method_data.get("latency", {}).items():
+            latency_data.append([
+                "See-Saw" if method == "seesaw" else "Standard",
+                kind, stats["count"], stats["total"], stats["p50"], stats["p95"], stats["p99"],
+            ])
+    write_csv(os.path.join(eval_path, "latency.csv"), latency_data[1:], latency_data[0])
+
+    # Data for static pre-validation (validator calls skipped, when enabled)
+    static_check_data = [["Method", "Static Checks", "Static Skips", "Skip Rate (%)", "Validator Tokens Saved"]]
+    for method, method_data in metrics.items():
+        if method_data.get("static_checks_total"):
+            static_check_data.append([
+                "See-Saw" if method == "seesaw" else "Standard",
+                method_data["static_checks_total"], method_data["static_skips_total"],
+                method_data["static_skip_rate"], method_data["validator_tokens_saved_total"],
+            ])
+    write_csv(os.path.join(eval_path, "static_checks.csv"), static_check_data[1:], static_check_data[0])
+
+    # Data for model routing (usage and latency per model tier)
+    routing_data = [["Method", "Tier", "Models", "Roles", "Calls", "Errors", "Tokens", "Cost (USD)",
+                     "Latency (Seconds)", "p50 (Seconds)", "p95 (Seconds)", "Escalations"]]
+    for method, method_data in metrics.items():
+        routing = method_data.get("routing", {})
+        for tier, stats in routing.get("tiers", {}).items():
+            routing_data.append([
+                "See-Saw" if method == "seesaw" else "Standard",
+                tier, " ".join(stats["models"]), " ".join(stats["roles"]), stats["calls"], stats["errors"],
+                stats["token_usage"], stats["cost"], stats["latency_total"], stats["latency_p50"], stats["latency_p95"],
+                routing["escalations"],
+            ])
+    write_csv(os.path.join(eval_path, "routing.csv"), routing_data[1:], routing_data[0])
+
+    # Data for file persistence (write-behind writes and their latency)
+    persistence_data = [["Method", "Enqueued", "Coalesced", "Writes", "Errors", "Bytes Written",
+                         "Write Time (Seconds)", "p50 (Seconds)", "p95 (Seconds)"]]
+    for method, method_data in metrics.items():
+        stats = method_data.get("persistence")
+        if stats:
+            persistence_data.append([
+                "See-Saw" if method == "seesaw" else "Standard",
+                stats["enqueued"], stats["coalesced"], stats["writes"], stats["errors"], stats["bytes_written"],
+                stats["write_time"], stats["latency_p50"], stats["latency_p95"],
+            ])
+    write_csv(os.path.join(eval_path, "persistence.csv"), persistence_data[1:], persistence_data[0])
+
 def main(metrics):
     """
     Main function to generate evaluation CSV files.